@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 
 from flask import Flask
@@ -9,11 +10,38 @@ def create_app():
     app = Flask(__name__, static_folder=os.path.join(BASE_DIR, "static"))
     CORS(app)
 
+    from .config import config
+    from .services.registry import ServiceRegistry
+    from .utils.metrics import metrics
+
+    metrics.enabled = config.METRICS_ENABLED
+
+    services = ServiceRegistry(config)
+    app.extensions["services"] = services
+
     from .routes.chat import chat_bp
     from .routes.calls import calls_bp
     from .routes.voice import voice_bp
+    from .routes.health import health_bp
+    from .routes.metrics import metrics_bp
 
     app.register_blueprint(chat_bp)
     app.register_blueprint(voice_bp)
     app.register_blueprint(calls_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(metrics_bp)
+
+    # PDF extraction workers are spawned and import the main module (run.py)
+    # again, under their own process name; only the server loads knowledge
+    if multiprocessing.current_process().name != "MainProcess":
+        return app
+
+    # Subscribe the FAQ precompute to knowledge loads before the first one starts
+    if config.FAQ_ENABLED:
+        services.faq
+    # Load the manual and website context without blocking startup
+    if config.KNOWLEDGE_PRELOAD:
+        services.knowledge.start_background_load()
+    if config.WEB_REFRESH_TTL > 0:
+        services.knowledge.start_background_refresh(config.WEB_REFRESH_TTL)
     return app
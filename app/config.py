@@ -12,20 +12,142 @@ class Config:
     # Gemini AI
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    # "rest" or "grpc"; empty keeps the library default (gRPC), which blocks
+    # gevent's hub, so SERVER_MODE=gevent defaults to REST
+    GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT", "rest" if os.getenv("SERVER_MODE") == "gevent" else "")
+    # Server-side caching of the static knowledge prefix (full-prompt mode, RAG_ENABLED=false)
+    GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "False").lower() == "true"
+    GEMINI_CONTEXT_CACHE_TTL = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+    # Identical prompts in flight at the same time share one Gemini call;
+    # requests joining one give up after GEMINI_COALESCE_TIMEOUT seconds
+    GEMINI_COALESCE = os.getenv("GEMINI_COALESCE", "True").lower() == "true"
+    GEMINI_COALESCE_TIMEOUT = float(os.getenv("GEMINI_COALESCE_TIMEOUT", "60"))
+    # Per-attempt timeout and overall deadline (seconds, retries included)
+    GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "20"))
+    GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", "30"))
+    # Quota, overload and network errors are retried with jittered exponential backoff
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+    GEMINI_RETRY_BASE = float(os.getenv("GEMINI_RETRY_BASE", "0.5"))
+    GEMINI_RETRY_MAX = float(os.getenv("GEMINI_RETRY_MAX", "4"))
+    # Calls running at once, and calls allowed to wait for a free slot
+    GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", "32"))
+    GEMINI_MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", "64"))
+    # After this many consecutive failures calls fail at once for GEMINI_BREAKER_RESET seconds
+    GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+    GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
 
     # Twilio
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
     TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER", "")
+    # Twilio drops a webhook after 15 s: answer within the budget or put the
+    # caller on hold and poll /voice/answer for up to VOICE_MAX_WAIT seconds
+    VOICE_RESPONSE_BUDGET = float(os.getenv("VOICE_RESPONSE_BUDGET", "8"))
+    VOICE_POLL_WAIT = float(os.getenv("VOICE_POLL_WAIT", "8"))
+    VOICE_MAX_WAIT = float(os.getenv("VOICE_MAX_WAIT", "45"))
+    VOICE_WORKERS = int(os.getenv("VOICE_WORKERS", "16"))
+    # Spoken answers: output token cap and length of the <Say> text
+    VOICE_MAX_OUTPUT_TOKENS = int(os.getenv("VOICE_MAX_OUTPUT_TOKENS", "160"))
+    VOICE_MAX_CHARS = int(os.getenv("VOICE_MAX_CHARS", "500"))
+    # Speculative answers from Twilio's partial speech results: a transcript
+    # unchanged for VOICE_PREFETCH_STABLE_SECONDS starts generating, and the
+    # final result reuses it when similar enough (character trigrams, and no
+    # word that differs other than in spelling). Off by default: each turn can
+    # cost up to VOICE_PREFETCH_MAX extra Gemini calls
+    VOICE_PREFETCH_ENABLED = os.getenv("VOICE_PREFETCH_ENABLED", "False").lower() == "true"
+    VOICE_PREFETCH_STABLE_SECONDS = float(os.getenv("VOICE_PREFETCH_STABLE_SECONDS", "0.5"))
+    VOICE_PREFETCH_MIN_WORDS = int(os.getenv("VOICE_PREFETCH_MIN_WORDS", "3"))
+    VOICE_PREFETCH_SIMILARITY = float(os.getenv("VOICE_PREFETCH_SIMILARITY", "0.9"))
+    VOICE_PREFETCH_MAX = int(os.getenv("VOICE_PREFETCH_MAX", "2"))
+    VOICE_PREFETCH_WORKERS = int(os.getenv("VOICE_PREFETCH_WORKERS", "8"))
+
+    # Local state shared by all worker processes (caches)
+    INSTANCE_DIR = os.getenv("INSTANCE_DIR", "instance")
 
     # PDF
     PDF_PATH = os.getenv("PDF_PATH", "files/metropolia_manual.pdf")
+    PDF_CACHE_PATH = os.getenv("PDF_CACHE_PATH", os.path.join(INSTANCE_DIR, "pdf_cache.sqlite3"))
+    # Every PDF in this directory is loaded as well as PDF_PATH
+    PDF_DIR = os.getenv("PDF_DIR", "files")
+    # Extraction processes, leaving one core to the server; 0 extracts in the
+    # server process (the default on one core and under gevent)
+    PDF_WORKERS = int(os.getenv(
+        "PDF_WORKERS", "0" if os.getenv("SERVER_MODE") == "gevent" else str(min(4, (os.cpu_count() or 1) - 1))
+    ))
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
 
     # Website URLs
     WEBSITE_URLS: List[str] = os.getenv("WEBSITE_URLS", "https://www.metropolia.fi/en").split(",")
 
+    # Web scraping: concurrent fetches, limited per host
+    SCRAPER_MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "8"))
+    SCRAPER_PER_HOST_CONCURRENCY = int(os.getenv("SCRAPER_PER_HOST_CONCURRENCY", "2"))
+    SCRAPER_REQUESTS_PER_SECOND = float(os.getenv("SCRAPER_REQUESTS_PER_SECOND", "2"))
+    SCRAPER_REQUEST_TIMEOUT = float(os.getenv("SCRAPER_REQUEST_TIMEOUT", "10"))
+    SCRAPER_DEADLINE = float(os.getenv("SCRAPER_DEADLINE", "60"))
+    # "lxml" (single-pass, default) or "soup" (BeautifulSoup html.parser)
+    HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "lxml")
+
+    # Conditional-GET cache of scraped pages and periodic knowledge refresh
+    HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join(INSTANCE_DIR, "http_cache.sqlite3"))
+    HTTP_CACHE_FRESH_SECONDS = float(os.getenv("HTTP_CACHE_FRESH_SECONDS", "0"))
+    WEB_REFRESH_TTL = float(os.getenv("WEB_REFRESH_TTL", "3600"))
+
+    # Load knowledge in a background thread when the app starts
+    KNOWLEDGE_PRELOAD = os.getenv("KNOWLEDGE_PRELOAD", "True").lower() == "true"
+
+    # Retrieval: send only the top-k relevant knowledge chunks with each turn
+    RAG_ENABLED = os.getenv("RAG_ENABLED", "True").lower() == "true"
+    RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+    RAG_CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "800"))
+    RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "100"))
+
+    # Cached answers to standalone questions (first question of a session)
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    # Cosine similarity of hashed trigram vectors for near-duplicate hits; 0
+    # (the default) serves exact normalized matches only
+    ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+    # Answers precomputed after every knowledge load: the questions in FAQ_PATH
+    # (one per line) plus question headings mined from the manual and websites.
+    # Off by default: each new knowledge version, including a website refresh
+    # that changed the text, costs up to FAQ_MAX_QUESTIONS Gemini calls
+    FAQ_ENABLED = os.getenv("FAQ_ENABLED", "False").lower() == "true"
+    FAQ_PATH = os.getenv("FAQ_PATH", "files/faq.txt")
+    FAQ_MINE_HEADINGS = os.getenv("FAQ_MINE_HEADINGS", "True").lower() == "true"
+    FAQ_MAX_QUESTIONS = int(os.getenv("FAQ_MAX_QUESTIONS", "100"))
+    # Questions generated at once, and Gemini calls per second for the whole run
+    FAQ_BATCH_SIZE = int(os.getenv("FAQ_BATCH_SIZE", "4"))
+    FAQ_REQUESTS_PER_SECOND = float(os.getenv("FAQ_REQUESTS_PER_SECOND", "1"))
+
+    # Conversation history: bounded number of sessions, expiry and per-session window
+    CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+    CONVERSATION_SESSION_TTL = float(os.getenv("CONVERSATION_SESSION_TTL", "86400"))
+    CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "1800"))
+    CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "20"))
+    CONVERSATION_MAX_TOKENS = int(os.getenv("CONVERSATION_MAX_TOKENS", "2000"))
+    # Summarize turns that leave the window with Gemini instead of dropping them
+    CONVERSATION_SUMMARIZE = os.getenv("CONVERSATION_SUMMARIZE", "False").lower() == "true"
+    # Where sessions live: "memory" (this process), "sqlite" (all workers on this
+    # host) or "redis" (all workers and hosts)
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(INSTANCE_DIR, "sessions.sqlite3"))
+    SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+
     # Server
     PORT = int(os.getenv("PORT", "3000"))
+    # "dev" (Flask development server), "threads" (SERVER_THREADS request threads)
+    # or "gevent" (up to SERVER_CONNECTIONS concurrent requests as greenlets)
+    SERVER_MODE = os.getenv("SERVER_MODE", "dev")
+    SERVER_THREADS = int(os.getenv("SERVER_THREADS", "16"))
+    SERVER_CONNECTIONS = int(os.getenv("SERVER_CONNECTIONS", "1000"))
+
+    # Instrumentation: Prometheus counters at /metrics, and a one-line trace of
+    # stage timings for this fraction of requests (0 disables tracing)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
 
 
 config = Config()
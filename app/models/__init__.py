@@ -1,3 +1,4 @@
 from .conversation import ConversationStore
+from .session_backends import MemoryBackend, SQLiteBackend, RedisBackend
 
-__all__ = ['ConversationStore']
\ No newline at end of file
+__all__ = ['ConversationStore', 'MemoryBackend', 'SQLiteBackend', 'RedisBackend']
\ No newline at end of file
@@ -1,27 +1,134 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from app.models.session_backends import MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Earlier in this conversation: "
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English and Finnish text
+    return len(text) // 4 + 1
+
+
 class ConversationStore:
-    def __init__(self):
-        self.conversations = {}
+    # Conversation history on top of a session backend (memory, sqlite or
+    # redis; see session_backends). Only the newest `max_turns` messages are
+    # stored and at most `max_tokens` of them are returned; older ones are
+    # either dropped or, with a summarizer(summary, messages) -> str, folded
+    # into a rolling summary in the background.
+    def __init__(self, backend=None, max_turns: int = 20, max_tokens: int = 2000,
+                 summarizer: Optional[Callable[[str, List[dict]], str]] = None):
+        self.backend = backend or MemoryBackend()
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarizer") if summarizer else None
+        self._lock = threading.Lock()
+        self._summarizing = set()
+        self._stats = {"trimmed_messages": 0, "summaries": 0, "summary_failures": 0}
+
+    def _record(self, event: str, count: int = 1):
+        with self._lock:
+            self._stats[event] += count
 
     def create_session(self, session_id: str):
-        self.conversations[session_id] = []
+        self.backend.create(session_id)
+
+    def add_message(self, session_id: str, role: str, content: str) -> int:
+        # Returns the number of messages stored with this one, before any
+        # trimming: 1 for the first message of a session
+        length = self.backend.append(session_id, role, content)
+        overflow = length - self.max_turns
+        if overflow <= 0:
+            return length
+        if not self.summarizer:
+            self.backend.compact(session_id, overflow)
+            self._record("trimmed_messages", overflow)
+            return length
+        with self._lock:
+            if session_id in self._summarizing:
+                return length
+            self._summarizing.add(session_id)
+        self._executor.submit(self._summarize, session_id)
+        return length
+
+    def message_count(self, session_id: str) -> int:
+        # Stored messages, whatever get_messages() would fit in its window; a
+        # summary stands for at least one earlier turn
+        stored = self.backend.fetch(session_id)
+        if stored is None:
+            return 0
+        summary, messages = stored
+        return len(messages) + (1 if summary else 0)
 
-    def add_message(self, session_id: str, role: str, content: str):
-        if session_id not in self.conversations:
-            self.create_session(session_id)
-        self.conversations[session_id].append({"role": role, "content": content})
+    def _summarize(self, session_id: str):
+        # One job per session in this process; it re-reads the session until
+        # the stored history fits the window again.
+        try:
+            while True:
+                stored = self.backend.fetch(session_id)
+                if stored is None:
+                    return
+                summary, messages = stored
+                overflow = len(messages) - self.max_turns
+                if overflow <= 0:
+                    return
+                dropped = [{"role": role, "content": content} for role, content in messages[:overflow]]
+                try:
+                    summary = self.summarizer(summary, dropped)
+                    self._record("summaries")
+                except Exception as e:
+                    logger.warning("Conversation summary failed: %s", e)
+                    self._record("summary_failures")
+                self.backend.compact(session_id, overflow, summary)
+                self._record("trimmed_messages", overflow)
+        except Exception as e:
+            logger.error("Conversation compaction failed for %s: %s", session_id, e)
+        finally:
+            with self._lock:
+                self._summarizing.discard(session_id)
 
-    def get_messages(self, session_id: str):
-        return self.conversations.get(session_id, [])
+    def get_messages(self, session_id: str) -> List[dict]:
+        stored = self.backend.fetch(session_id)
+        if stored is None:
+            return []
+        summary, messages = stored
+
+        # Newest messages within the token budget, keeping at least the last one
+        start, tokens = len(messages), 0
+        while start > 0:
+            tokens += estimate_tokens(messages[start - 1][1])
+            if tokens > self.max_tokens and start < len(messages):
+                break
+            start -= 1
+
+        history = [{"role": role, "content": content} for role, content in messages[start:]]
+        # The summary leads the turns rather than joining the system prompt, so
+        # the system instruction stays the same for every session
+        if summary:
+            history.insert(0, {"role": "user", "content": SUMMARY_PREFIX + summary, "summary": True})
+        return history
 
     def end_session(self, session_id: str):
-        if session_id in self.conversations:
-            del self.conversations[session_id]
-            return True
-        return False
+        return self.backend.delete(session_id)
 
     def session_exists(self, session_id: str):
-        return session_id in self.conversations
+        return self.backend.exists(session_id)
 
     def setdefault(self, session_id: str):
-        if session_id not in self.conversations:
-            self.create_session(session_id)
\ No newline at end of file
+        if not self.backend.exists(session_id):
+            self.backend.create(session_id)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.backend.stats)
+        stats["backend"] = self.backend.name
+        return stats
@@ -0,0 +1,454 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Messages are stored as one role byte followed by the UTF-8 content
+ROLE_CODES = {"user": b"u", "assistant": b"a", "system": b"s"}
+ROLE_NAMES = {code[0]: role for role, code in ROLE_CODES.items()}
+
+Message = Tuple[str, str]
+
+
+def encode_message(role: str, content: str) -> bytes:
+    return ROLE_CODES[role] + content.encode("utf-8")
+
+
+def decode_message(data: bytes) -> Message:
+    return ROLE_NAMES[data[0]], data[1:].decode("utf-8")
+
+
+class MemorySession:
+    __slots__ = ("messages", "chars", "summary", "created_at", "last_access", "lock")
+
+    def __init__(self, now: float):
+        self.messages = deque()
+        self.chars = 0
+        self.summary = ""
+        self.created_at = now
+        self.last_access = now
+        self.lock = threading.Lock()
+
+
+class MemoryBackend:
+    # Sessions of this process only, in LRU order. Each session expires
+    # `session_ttl` seconds after it was created or `idle_ttl` seconds after
+    # its last use; beyond `max_sessions` the least recently used is evicted.
+    name = "memory"
+
+    def __init__(self, max_sessions: int = 10000, session_ttl: float = 86400, idle_ttl: float = 1800,
+                 sweep_interval: float = 60, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._next_sweep = clock() + sweep_interval
+        self._chars = 0
+        self._stats = {
+            "high_water_sessions": 0, "high_water_chars": 0,
+            "lru_evictions": 0, "idle_expirations": 0, "ttl_expirations": 0,
+        }
+
+    def _expired(self, session: MemorySession, now: float) -> Optional[str]:
+        if now - session.created_at > self.session_ttl:
+            return "ttl_expirations"
+        if now - session.last_access > self.idle_ttl:
+            return "idle_expirations"
+        return None
+
+    def _remove(self, session_id: str, reason: str = None):
+        # Caller holds self._lock
+        session = self._sessions.pop(session_id)
+        self._chars -= session.chars
+        if reason:
+            self._stats[reason] += 1
+
+    def _sweep(self, now: float):
+        # Caller holds self._lock. Idle sessions sit at the LRU end, so only
+        # expired ones are visited.
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            reason = self._expired(session, now)
+            if reason is None:
+                break
+            self._remove(session_id, reason)
+        self._next_sweep = now + self.sweep_interval
+
+    def _session(self, session_id: str, create: bool) -> Optional[MemorySession]:
+        now = self.clock()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                reason = self._expired(session, now)
+                if reason:
+                    self._remove(session_id, reason)
+                    session = None
+            if session is None:
+                if not create:
+                    return None
+                session = self._sessions[session_id] = MemorySession(now)
+                while len(self._sessions) > self.max_sessions:
+                    self._remove(next(iter(self._sessions)), "lru_evictions")
+                self._stats["high_water_sessions"] = max(self._stats["high_water_sessions"], len(self._sessions))
+            else:
+                session.last_access = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def _account(self, session_id: str, session: MemorySession, chars: int):
+        # Caller holds session.lock. Stored sizes only change under both locks,
+        # so eviction (global lock only) always subtracts the current size.
+        with self._lock:
+            session.chars += chars
+            if self._sessions.get(session_id) is session:
+                self._chars += chars
+                self._stats["high_water_chars"] = max(self._stats["high_water_chars"], self._chars)
+
+    def create(self, session_id: str):
+        session = self._session(session_id, create=True)
+        with session.lock:
+            session.messages.clear()
+            session.summary = ""
+            self._account(session_id, session, -session.chars)
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        session = self._session(session_id, create=True)
+        with session.lock:
+            session.messages.append((role, content))
+            self._account(session_id, session, len(content))
+            return len(session.messages)
+
+    def fetch(self, session_id: str) -> Optional[Tuple[str, List[Message]]]:
+        session = self._session(session_id, create=False)
+        if session is None:
+            return None
+        with session.lock:
+            return session.summary, list(session.messages)
+
+    def compact(self, session_id: str, drop: int, summary: str = None):
+        session = self._session(session_id, create=False)
+        if session is None:
+            return
+        with session.lock:
+            removed = 0
+            for _ in range(min(drop, len(session.messages))):
+                removed += len(session.messages.popleft()[1])
+            if summary is not None:
+                session.summary = summary
+            self._account(session_id, session, -removed)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+                return True
+        return False
+
+    def exists(self, session_id: str) -> bool:
+        return self._session(session_id, create=False) is not None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._sessions)
+            stats["stored_chars"] = self._chars
+        return stats
+
+
+class SQLiteBackend:
+    # Sessions shared by all worker processes on one host through a WAL-mode
+    # database. Appending is one INSERT plus a counter update; a fetch is one
+    # joined SELECT. Expired and surplus sessions are swept periodically.
+    name = "sqlite"
+
+    def __init__(self, db_path: str, max_sessions: int = 10000, session_ttl: float = 86400,
+                 idle_ttl: float = 1800, sweep_interval: float = 60, clock=time.time):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self._local = threading.local()
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = clock() + sweep_interval
+        self._stats_lock = threading.Lock()
+        self._stats = {"lru_evictions": 0, "expirations": 0}
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, created_at REAL NOT NULL, last_access REAL NOT NULL, "
+                "length INTEGER NOT NULL DEFAULT 0, summary TEXT NOT NULL DEFAULT '')"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, data BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        # One connection per thread, kept open: session reads and writes happen
+        # on every request, and closing the last connection checkpoints the WAL.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writers take the lock up front with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            # In WAL mode a commit only needs to reach the log, not be synced
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        yield conn
+
+    @contextmanager
+    def _write(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _live(self, now: float) -> Tuple[float, float]:
+        return now - self.session_ttl, now - self.idle_ttl
+
+    def _drop(self, conn, session_ids: List[str]):
+        conn.executemany("DELETE FROM messages WHERE session_id = ?", [(s,) for s in session_ids])
+        conn.executemany("DELETE FROM sessions WHERE id = ?", [(s,) for s in session_ids])
+
+    def _maybe_sweep(self, now: float):
+        if now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = now + self.sweep_interval
+            created_before, accessed_before = self._live(now)
+            with self._write() as conn:
+                expired = [row[0] for row in conn.execute(
+                    "SELECT id FROM sessions WHERE created_at < ? OR last_access < ?",
+                    (created_before, accessed_before)
+                )]
+                surplus = [row[0] for row in conn.execute(
+                    "SELECT id FROM sessions WHERE created_at >= ? AND last_access >= ? "
+                    "ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                    (created_before, accessed_before, self.max_sessions)
+                )]
+                self._drop(conn, expired + surplus)
+            with self._stats_lock:
+                self._stats["expirations"] += len(expired)
+                self._stats["lru_evictions"] += len(surplus)
+        except sqlite3.Error as e:
+            logger.warning("Session sweep failed: %s", e)
+        finally:
+            self._sweep_lock.release()
+
+    def _ensure(self, conn, session_id: str, now: float) -> int:
+        # Returns the session's current length, (re)creating it when missing or expired
+        row = conn.execute(
+            "SELECT created_at, last_access, length FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        created_before, accessed_before = self._live(now)
+        if row and row[0] >= created_before and row[1] >= accessed_before:
+            return row[2]
+        if row:
+            self._drop(conn, [session_id])
+            with self._stats_lock:
+                self._stats["expirations"] += 1
+        conn.execute(
+            "INSERT INTO sessions (id, created_at, last_access) VALUES (?, ?, ?)", (session_id, now, now)
+        )
+        return 0
+
+    def create(self, session_id: str):
+        now = self.clock()
+        self._maybe_sweep(now)
+        with self._write() as conn:
+            self._drop(conn, [session_id])
+            conn.execute(
+                "INSERT INTO sessions (id, created_at, last_access) VALUES (?, ?, ?)", (session_id, now, now)
+            )
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        now = self.clock()
+        self._maybe_sweep(now)
+        with self._write() as conn:
+            length = self._ensure(conn, session_id, now) + 1
+            conn.execute(
+                "INSERT INTO messages (session_id, data) VALUES (?, ?)",
+                (session_id, encode_message(role, content))
+            )
+            conn.execute(
+                "UPDATE sessions SET length = ?, last_access = ? WHERE id = ?", (length, now, session_id)
+            )
+        return length
+
+    def fetch(self, session_id: str) -> Optional[Tuple[str, List[Message]]]:
+        now = self.clock()
+        created_before, accessed_before = self._live(now)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT s.summary, m.data FROM sessions s LEFT JOIN messages m ON m.session_id = s.id "
+                "WHERE s.id = ? AND s.created_at >= ? AND s.last_access >= ? ORDER BY m.seq",
+                (session_id, created_before, accessed_before)
+            ).fetchall()
+            if rows:
+                conn.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+        if not rows:
+            return None
+        return rows[0][0], [decode_message(data) for _, data in rows if data is not None]
+
+    def compact(self, session_id: str, drop: int, summary: str = None):
+        with self._write() as conn:
+            if drop > 0:
+                conn.execute(
+                    "DELETE FROM messages WHERE seq IN "
+                    "(SELECT seq FROM messages WHERE session_id = ? ORDER BY seq LIMIT ?)",
+                    (session_id, drop)
+                )
+                conn.execute(
+                    "UPDATE sessions SET length = MAX(length - ?, 0) WHERE id = ?", (drop, session_id)
+                )
+            if summary is not None:
+                conn.execute("UPDATE sessions SET summary = ? WHERE id = ?", (summary, session_id))
+
+    def delete(self, session_id: str) -> bool:
+        with self._write() as conn:
+            found = conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            self._drop(conn, [session_id])
+        return found is not None
+
+    def exists(self, session_id: str) -> bool:
+        created_before, accessed_before = self._live(self.clock())
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT 1 FROM sessions WHERE id = ? AND created_at >= ? AND last_access >= ?",
+                (session_id, created_before, accessed_before)
+            ).fetchone() is not None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            sessions, messages = conn.execute(
+                "SELECT (SELECT COUNT(*) FROM sessions), (SELECT COUNT(*) FROM messages)"
+            ).fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(sessions=sessions, stored_messages=messages)
+        return stats
+
+
+class RedisBackend:
+    # Sessions shared by every worker and host through Redis (or anything that
+    # speaks its protocol). A session is a list of encoded messages plus a hash
+    # with its creation time and summary; both carry an idle expiry that every
+    # access renews. Appending is RPUSH and a fetch is one pipelined round
+    # trip. The session cap is left to Redis' own maxmemory eviction policy.
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "session:", session_ttl: float = 86400,
+                 idle_ttl: float = 1800, clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self.session_ttl = session_ttl
+        self.idle_ttl = int(idle_ttl)
+        self.clock = clock
+        self._stats_lock = threading.Lock()
+        self._stats = {"expirations": 0, "round_trips": 0}
+
+    def _keys(self, session_id: str) -> Tuple[str, str]:
+        return f"{self.prefix}{session_id}:messages", f"{self.prefix}{session_id}:meta"
+
+    def _execute(self, pipe) -> list:
+        with self._stats_lock:
+            self._stats["round_trips"] += 1
+        return pipe.execute()
+
+    def _expired(self, created) -> bool:
+        return created is not None and self.clock() - float(created) > self.session_ttl
+
+    def _reset(self, pipe, session_id: str):
+        messages_key, meta_key = self._keys(session_id)
+        pipe.delete(messages_key, meta_key)
+        pipe.hset(meta_key, mapping={"created_at": self.clock(), "summary": ""})
+        pipe.expire(meta_key, self.idle_ttl)
+
+    def create(self, session_id: str):
+        pipe = self.client.pipeline()
+        self._reset(pipe, session_id)
+        self._execute(pipe)
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        messages_key, meta_key = self._keys(session_id)
+        data = encode_message(role, content)
+        pipe = self.client.pipeline()
+        pipe.hget(meta_key, "created_at")
+        pipe.rpush(messages_key, data)
+        pipe.hsetnx(meta_key, "created_at", self.clock())
+        pipe.expire(messages_key, self.idle_ttl)
+        pipe.expire(meta_key, self.idle_ttl)
+        created, length = self._execute(pipe)[:2]
+        if not self._expired(created):
+            return length
+
+        # Past its absolute lifetime: start over with just this message
+        pipe = self.client.pipeline()
+        self._reset(pipe, session_id)
+        pipe.rpush(messages_key, data)
+        pipe.expire(messages_key, self.idle_ttl)
+        self._execute(pipe)
+        with self._stats_lock:
+            self._stats["expirations"] += 1
+        return 1
+
+    def fetch(self, session_id: str) -> Optional[Tuple[str, List[Message]]]:
+        messages_key, meta_key = self._keys(session_id)
+        pipe = self.client.pipeline()
+        pipe.hmget(meta_key, ["created_at", "summary"])
+        pipe.lrange(messages_key, 0, -1)
+        pipe.expire(messages_key, self.idle_ttl)
+        pipe.expire(meta_key, self.idle_ttl)
+        (created, summary), messages = self._execute(pipe)[:2]
+        if created is None or self._expired(created):
+            return None
+        if isinstance(summary, bytes):
+            summary = summary.decode("utf-8")
+        return summary or "", [decode_message(data) for data in messages]
+
+    def compact(self, session_id: str, drop: int, summary: str = None):
+        messages_key, meta_key = self._keys(session_id)
+        pipe = self.client.pipeline()
+        if drop > 0:
+            pipe.ltrim(messages_key, drop, -1)
+        if summary is not None:
+            pipe.hset(meta_key, "summary", summary)
+        self._execute(pipe)
+
+    def delete(self, session_id: str) -> bool:
+        return self.client.delete(*self._keys(session_id)) > 0
+
+    def exists(self, session_id: str) -> bool:
+        created = self.client.hget(self._keys(session_id)[1], "created_at")
+        return created is not None and not self._expired(created)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
@@ -1,99 +1,94 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, url_for
+import json
 import logging
-from app.services.ai_service import AIService
-from app.services.pdf_service import PDFService
-from app.services.web_scraper import WebScraper
-from app.models.conversation import ConversationStore
+from app.services.ai_service import FALLBACK_RESPONSES
+from app.services.registry import get_services
+from app.utils.helper import is_standalone_question, url_list_error
+from app.utils.metrics import metrics
 from app.config import config
 
 logger = logging.getLogger(__name__)
 chat_bp = Blueprint('chat', __name__)
 
-try:
-    pdf_service = PDFService(config.PDF_PATH)
-    web_scraper = WebScraper()
+FALLBACK_REPLY = "Sorry, I'm having trouble generating a response right now. Please try again."
 
-    pdf_text = pdf_service.extract_text()
-    if not pdf_text:
-        logger.warning("PDF content empty — manual context unavailable.")
-        pdf_text = "No PDF content available."
 
-    # Scraping website content
-    web_content = ""
+#Building messages with conversation history
+def build_messages(session_id: str, snapshot=None):
+    services = get_services()
+    snapshot = snapshot or services.knowledge.snapshot
     try:
-        if hasattr(config, 'WEBSITE_URLS') and config.WEBSITE_URLS:
-            web_content = web_scraper.scrape_multiple_urls(config.WEBSITE_URLS)
-            logger.info(f"Successfully scraped {len(web_content)} characters from websites")
-        else:
-            web_content = "No website URLs configured."
-            logger.warning("No WEBSITE_URLS configured in config")
-    except Exception as e:
-        web_content = f"Could not retrieve web content: {str(e)}"
-        logger.error(f"Web scraping failed: {e}")
-
-    # Build comprehensive system prompt
-    SYSTEM_PROMPT = (
-        "You are a Student Assistant AI for Metropolia University. Use the information below "
-        "from both the PDF manual and official websites to answer questions accurately. "
-        "If the answer is not found in the provided information, politely say so and suggest "
-        "checking the official Metropolia website.\n\n"
-        "PDF MANUAL CONTENT:\n"
-        f"{pdf_text}\n\n"
-        "WEBSITE CONTENT:\n"
-        f"{web_content}\n\n"
-        "Keep responses helpful, accurate, and student-focused."
-    )
+        with metrics.stage("history"):
+            history = services.conversation_store.get_messages(session_id)
+        with metrics.stage("prompt"):
+            return services.prompts.build_messages(snapshot, "chat", history)
+    except Exception as ex:
+        logger.error(f"Error building messages for session {session_id}: {ex}")
+        return services.prompts.build_messages(snapshot, "chat", [])
 
-    ai_service = AIService(config.GEMINI_API_KEY, config.GEMINI_MODEL)
-    conversation_store = ConversationStore()
 
-    logger.info("Chat services initialized successfully")
-    logger.info(f"PDF content: {len(pdf_text)} characters")
-    logger.info(f"Web content: {len(web_content)} characters")
+def parse_chat_request():
+    data = request.json or {}
+    user_message = data.get("message", "").strip()
+    session_id = data.get("session_id", "default")
 
-except Exception as e:
-    logger.error(f"Chat service initialization failed: {e}")
-    SYSTEM_PROMPT = "You are a Student Assistant AI for Metropolia University. Answer questions helpfully."
-    ai_service = None
-    conversation_store = ConversationStore()
+    if not user_message:
+        return user_message, session_id, (jsonify({"error": "Empty message"}), 400)
 
+    if len(user_message) > 1000:
+        return user_message, session_id, (jsonify({"error": "Message too long (max 1000 characters)"}), 400)
 
-#Building messages with conversation history
-def build_messages(session_id: str):
-    try:
-        history = conversation_store.get_messages(session_id)
-        return [{"role": "system", "content": SYSTEM_PROMPT}] + history
-    except Exception as ex:
-        logger.error(f"Error building messages for session {session_id}: {ex}")
-        return [{"role": "system", "content": SYSTEM_PROMPT}]
+    return user_message, session_id, None
 
 
-# Chat endpoint
-@chat_bp.route("/chat", methods=["POST"])
-def chat():
-    try:
-        data = request.json or {}
-        user_message = data.get("message", "").strip()
-        session_id = data.get("session_id", "default")
+def get_cached_answer(services, snapshot, standalone: bool, user_message: str):
+    if not snapshot.loaded or not standalone:
+        return None
+    if config.FAQ_ENABLED:
+        ai_text = services.faq.get("chat", snapshot.version, user_message)
+        if ai_text is not None:
+            return ai_text
+    if not config.ANSWER_CACHE_ENABLED:
+        return None
+    return services.answer_cache.get("chat", snapshot.version, user_message)
+
+
+def store_answer(services, snapshot, standalone: bool, user_message: str, ai_text: str):
+    if (config.ANSWER_CACHE_ENABLED and snapshot.loaded and standalone
+            and ai_text and ai_text not in FALLBACK_RESPONSES and ai_text != FALLBACK_REPLY):
+        services.answer_cache.put("chat", snapshot.version, user_message, ai_text)
 
-        if not user_message:
-            return jsonify({"error": "Empty message"}), 400
 
-        if len(user_message) > 1000:
-            return jsonify({"error": "Message too long (max 1000 characters)"}), 400
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-        conversation_store.add_message(session_id, "user", user_message)
-        messages = build_messages(session_id)
 
-        # Generating AI response
-        if ai_service:
+# Chat endpoint
+@chat_bp.route("/chat", methods=["POST"])
+def chat():
+    if request.args.get("stream") == "1":
+        return chat_stream()
+    try:
+        user_message, session_id, error = parse_chat_request()
+        if error:
+            return error
+
+        services = get_services()
+        snapshot = services.knowledge.snapshot
+        conversation_store = services.conversation_store
+        standalone = is_standalone_question(conversation_store.add_message(session_id, "user", user_message))
+        messages = build_messages(session_id, snapshot)
+
+        # Generating AI response, unless the same question was answered before
+        ai_text = get_cached_answer(services, snapshot, standalone, user_message)
+        if ai_text is None:
             try:
-                ai_text = ai_service.generate_response(messages)
+                ai_text = services.ai_service.generate_response(messages)
             except Exception as ex:
                 logger.error(f"AIService error: {ex}")
-                ai_text = "Sorry, I'm having trouble generating a response right now. Please try again."
-        else:
-            ai_text = "AI service is currently unavailable. Please try again later."
+                ai_text = FALLBACK_REPLY
+            store_answer(services, snapshot, standalone, user_message, ai_text)
 
         # Adding AI response to conversation
         conversation_store.add_message(session_id, "assistant", ai_text)
@@ -108,13 +103,78 @@ def chat():
         return jsonify({"error": "Internal server error"}), 500
 
 
+# Streaming chat endpoint: tokens are sent as Server-Sent Events while Gemini
+# generates them, and the assembled reply is stored once the stream completes
+# (or what was sent, when the client disconnects first).
+@chat_bp.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    try:
+        user_message, session_id, error = parse_chat_request()
+        if error:
+            return error
+
+        services = get_services()
+        snapshot = services.knowledge.snapshot
+        conversation_store = services.conversation_store
+        standalone = is_standalone_question(conversation_store.add_message(session_id, "user", user_message))
+        messages = build_messages(session_id, snapshot)
+        ai_service = services.ai_service
+        cached_answer = get_cached_answer(services, snapshot, standalone, user_message)
+    except Exception as ex:
+        logger.error(f"Chat stream endpoint error: {ex}")
+        return jsonify({"error": "Internal server error"}), 500
+
+    def generate():
+        parts = []
+        completed = stored = False
+        stream = None
+        try:
+            try:
+                if cached_answer is not None:
+                    parts.append(cached_answer)
+                    yield sse_event({"delta": cached_answer})
+                else:
+                    stream = ai_service.stream_response(messages)
+                    for delta in stream:
+                        parts.append(delta)
+                        yield sse_event({"delta": delta})
+                    completed = True
+            except Exception as ex:
+                logger.error(f"AIService streaming error: {ex}")
+                if not parts:
+                    parts.append(FALLBACK_REPLY)
+                    yield sse_event({"delta": FALLBACK_REPLY})
+
+            ai_text = "".join(parts).strip()
+            if completed:
+                store_answer(services, snapshot, standalone, user_message, ai_text)
+            conversation_store.add_message(session_id, "assistant", ai_text)
+            stored = True
+            yield sse_event({"response": ai_text, "session_id": session_id}, event="done")
+        finally:
+            if stream is not None:
+                # Ends the Gemini stream and frees its slot when the client went away
+                stream.close()
+            if not stored:
+                # Disconnected mid-stream: keep the part that was sent so the
+                # user turn is not left without a reply
+                logger.info(f"Chat stream for session {session_id} closed by the client")
+                conversation_store.add_message(session_id, "assistant", "".join(parts).strip() or FALLBACK_REPLY)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # Getting conversation history
 @chat_bp.route("/conversation/<session_id>", methods=["GET"])
 def get_conversation(session_id):
     try:
-        messages = conversation_store.get_messages(session_id)
-        # Filter out system prompt for frontend display
-        user_messages = [msg for msg in messages if msg.get("role") != "system"]
+        messages = get_services().conversation_store.get_messages(session_id)
+        # Filter out system prompt and summary for frontend display
+        user_messages = [msg for msg in messages if msg.get("role") != "system" and not msg.get("summary")]
         return jsonify({
             "session_id": session_id,
             "messages": user_messages
@@ -128,7 +188,7 @@ def get_conversation(session_id):
 @chat_bp.route("/conversation/<session_id>", methods=["DELETE"])
 def clear_conversation(session_id):
     try:
-        if conversation_store.end_session(session_id):
+        if get_services().conversation_store.end_session(session_id):
             return jsonify({"message": "Conversation cleared"})
         else:
             return jsonify({"message": "Session not found"}), 404
@@ -144,25 +204,21 @@ def update_websites():
         data = request.get_json()
         if not data or 'urls' not in data:
             return jsonify({"error": "No URLs provided"}), 400
+        error = url_list_error(data['urls'])
+        if error:
+            return jsonify({"error": error}), 400
 
-        global SYSTEM_PROMPT
-        website_content = web_scraper.scrape_multiple_urls(data['urls'])
-        SYSTEM_PROMPT = (
-            "You are a Student Assistant AI for Metropolia University. Use the information below "
-            "from both the PDF manual and official websites to answer questions accurately.\n\n"
-            "PDF MANUAL CONTENT:\n"
-            f"{pdf_text}\n\n"
-            "WEBSITE CONTENT:\n"
-            f"{website_content}\n\n"
-            "Keep responses helpful and accurate."
-        )
+        # Scraped in the background, then swapped in for every channel at once
+        job = get_services().knowledge.submit_update(data['urls'])
+        status_url = url_for('health.knowledge_job', job_id=job.id)
 
         return jsonify({
-            "message": f"Updated with {len(data['urls'])} URLs",
-            "content_length": len(web_content),
+            "message": f"Updating with {len(data['urls'])} URLs",
+            "job": job.to_dict(),
+            "status_url": status_url,
             "urls": data['urls']
-        })
+        }), 202, {"Location": status_url}
 
     except Exception as ex:
         logger.error(f"Error updating websites: {ex}")
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": str(ex)}), 500
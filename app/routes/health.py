@@ -0,0 +1,62 @@
+from flask import Blueprint, jsonify
+from app.services.registry import get_services
+from app.config import config
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route("/health", methods=["GET"])
+def health():
+    return jsonify({"status": "ok"})
+
+
+# Ready once the manual and website context have been loaded
+@health_bp.route("/ready", methods=["GET"])
+def ready():
+    knowledge = get_services().knowledge
+    snapshot = knowledge.snapshot
+    body = {
+        "ready": knowledge.is_ready,
+        "knowledge_version": snapshot.version,
+        "pdf_characters": len(snapshot.pdf_text),
+        "web_characters": len(snapshot.web_content),
+    }
+    return jsonify(body), 200 if knowledge.is_ready else 503
+
+
+# Runtime counters of the shared caches
+@health_bp.route("/stats", methods=["GET"])
+def stats():
+    services = get_services()
+    web_scraper = services.web_scraper
+    ai_service = services.ai_service
+    context_cache = ai_service.context_cache
+    return jsonify({
+        "http_cache": web_scraper.cache.stats if web_scraper.cache else None,
+        "context_cache": context_cache.stats if context_cache else None,
+        "gemini": ai_service.client.stats if ai_service.client else None,
+        "coalescing": ai_service.coalescer.stats if ai_service.coalescer else None,
+        "answer_cache": services.answer_cache.stats,
+        "faq": services.faq.stats if config.FAQ_ENABLED else None,
+        "conversations": services.conversation_store.stats,
+        "voice": services.voice_turns.stats,
+        "voice_prefetch": services.voice_prefetch.stats if config.VOICE_PREFETCH_ENABLED else None,
+    })
+
+
+# Background knowledge jobs (loads, /update-websites, periodic refreshes)
+@health_bp.route("/knowledge/jobs", methods=["GET"])
+def knowledge_jobs():
+    knowledge = get_services().knowledge
+    return jsonify({
+        "knowledge_version": knowledge.snapshot.version,
+        "jobs": [job.to_dict() for job in reversed(knowledge.jobs())],
+    })
+
+
+@health_bp.route("/knowledge/jobs/<job_id>", methods=["GET"])
+def knowledge_job(job_id):
+    job = get_services().knowledge.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
@@ -0,0 +1,91 @@
+from flask import Blueprint, Response, g, request
+import json
+import logging
+import random
+import time
+from app.services.registry import get_services
+from app.utils.metrics import RequestTrace, current_trace, metrics, render_histogram, render_stats
+from app.config import config
+
+logger = logging.getLogger(__name__)
+# Sampled request traces, one JSON line each; route this logger separately if needed
+trace_logger = logging.getLogger("app.trace")
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.before_app_request
+def start_request():
+    if not metrics.enabled:
+        return
+    g.request_started = time.perf_counter()
+    if config.TRACE_SAMPLE_RATE > 0 and random.random() < config.TRACE_SAMPLE_RATE:
+        g.trace_token = current_trace.set(RequestTrace())
+
+
+@metrics_bp.after_app_request
+def record_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    seconds = time.perf_counter() - started
+    endpoint = request.endpoint or "unmatched"
+    metrics.observe("assistant_request_seconds", seconds, endpoint=endpoint, status=str(response.status_code))
+
+    trace = current_trace.get()
+    if trace is not None:
+        # Streamed replies are still being generated here; their model stages are not included
+        trace_logger.info(json.dumps({
+            "method": request.method,
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "ms": round(seconds * 1000, 3),
+            **trace.to_dict(),
+        }))
+    return response
+
+
+@metrics_bp.teardown_app_request
+def end_trace(exc):
+    token = g.pop("trace_token", None)
+    if token is not None:
+        current_trace.reset(token)
+
+
+# Prometheus text format: request stages, Gemini tokens, sizes and cache counters
+@metrics_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    services = get_services()
+    lines = metrics.render()
+
+    for name, histogram in services.voice_turns.histograms.items():
+        lines.append(f"# TYPE assistant_voice_{name} histogram")
+        lines.extend(render_histogram(f"assistant_voice_{name}", histogram.snapshot()))
+    lines.extend(render_stats("assistant_voice", services.voice_turns.stats, gauges={"pending"}))
+    if config.VOICE_PREFETCH_ENABLED:
+        lines.extend(render_stats("assistant_voice_prefetch", services.voice_prefetch.stats, gauges={"pending"}))
+    lines.extend(render_stats("assistant_answer_cache", services.answer_cache.stats, gauges={"entries", "hit_rate"}))
+    if config.FAQ_ENABLED:
+        # Everything but the lookups and runs describes the current version's run
+        lines.extend(render_stats("assistant_faq", services.faq.stats, gauges={
+            "configured", "mined", "failed", "run_seconds", "version", "questions", "answered", "pending",
+            "coverage", "hit_rate"}))
+    lines.extend(render_stats("assistant_conversations", services.conversation_store.stats, gauges={
+        "sessions", "stored_chars", "stored_messages", "high_water_sessions", "high_water_chars"}))
+
+    web_scraper = services.web_scraper
+    if web_scraper.cache:
+        lines.extend(render_stats("assistant_http_cache", web_scraper.cache.stats))
+    ai_service = services.ai_service
+    if ai_service.context_cache:
+        lines.extend(render_stats("assistant_context_cache", ai_service.context_cache.stats, gauges={
+            "last_tokens_saved", "tokens_saved_per_request"}))
+    if ai_service.client:
+        lines.extend(render_stats("assistant_gemini_client", ai_service.client.stats, gauges={
+            "active", "waiting", "max_active", "consecutive_failures", "circuit_open", "circuit_half_open"}))
+    if ai_service.coalescer:
+        lines.extend(render_stats("assistant_coalescing", ai_service.coalescer.stats, gauges={
+            "in_flight", "max_followers"}))
+    lines.extend(render_stats("assistant_knowledge", {"version": services.knowledge.snapshot.version},
+                              gauges={"version"}))
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
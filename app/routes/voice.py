@@ -1,74 +1,42 @@
 from flask import Blueprint, request, Response, url_for
+import hashlib
 import logging
+import time
 from twilio.twiml.voice_response import VoiceResponse, Gather
-from app.services.ai_service import AIService
-from app.services.pdf_service import PDFService
-from app.services.voice_service import VoiceService
-from app.models.conversation import ConversationStore
+from app.services.ai_service import FALLBACK_RESPONSES
+from app.services.registry import get_services
+from app.services.twiml import TwimlTemplate
+from app.utils.helper import is_standalone_question, url_list_error
+from app.utils.metrics import metrics
 from app.config import config
-from app.services.web_scraper import WebScraper
 
 logger = logging.getLogger(__name__)
 voice_bp = Blueprint('voice', __name__)
 
-conversation_store = ConversationStore()
+VOICE_ERROR_REPLY = "I'm currently having trouble accessing information. Please try again later."
+VOICE_HOLD_MESSAGE = "One moment while I look that up."
+VOICE_TIMEOUT_REPLY = "Sorry, that is taking too long. Please ask your question again."
 
-try:
-    pdf_service = PDFService(config.PDF_PATH)
-    pdf_text = pdf_service.extract_text()[:15000]
-    web_scraper = WebScraper()
 
-    # Scraping website content
-    web_content = ""
+def build_messages(session_id: str, snapshot=None):
+    services = get_services()
+    snapshot = snapshot or services.knowledge.snapshot
     try:
-        if hasattr(config, 'WEBSITE_URLS') and config.WEBSITE_URLS:
-            web_content = web_scraper.scrape_multiple_urls(config.WEBSITE_URLS)
-            logger.info(f"Successfully scraped {len(web_content)} characters from websites")
-        else:
-            web_content = "No website URLs configured. Using PDF content only."
-            logger.warning("No WEBSITE_URLS configured in config")
-    except Exception as e:
-        web_content = f"Could not retrieve web content: {str(e)}"
-        logger.error(f"Web scraping failed: {e}")
-
-    SYSTEM_PROMPT = (
-        "You are a Student Assistant AI for Metropolia University. Use the information below "
-        "from both the PDF manual and official websites to answer questions accurately. "
-        "If the answer is not found in the provided information, politely say so and suggest "
-        "checking the official Metropolia website.\n\n"
-        "PDF MANUAL CONTENT:\n"
-        f"{pdf_text}\n\n"
-        "WEBSITE CONTENT:\n"
-        f"{web_content}\n\n"
-        "Keep voice responses concise, natural for speech, and helpful."
-    )
-
-    ai_service = AIService(config.GEMINI_API_KEY, config.GEMINI_MODEL)
-    voice_service = VoiceService(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN, config.TWILIO_PHONE_NUMBER)
-    logger.info("All services initialized successfully")
-
-except Exception as e:
-    logger.error(f"Service initialization failed: {e}")
-    SYSTEM_PROMPT = "You are a Student Assistant AI for Metropolia University. Answer questions helpfully."
-    ai_service = None
-    web_scraper = None
-    voice_service = None
-
-def build_messages(session_id: str):
-    try:
-        history = conversation_store.get_messages(session_id)
-        return [{"role": "system", "content": SYSTEM_PROMPT}] + history
+        with metrics.stage("history"):
+            history = services.conversation_store.get_messages(session_id)
+        with metrics.stage("prompt"):
+            return services.prompts.build_messages(snapshot, "voice", history)
     except Exception as e:
         logger.error(f"Error building messages for session {session_id}: {e}")
-        return [{"role": "system", "content": SYSTEM_PROMPT}]
+        return services.prompts.build_messages(snapshot, "voice", [])
 
 
-def create_fallback_voice_response(prompt="Please ask your question."):
+def build_fallback_response(action: str, prompt: str) -> VoiceResponse:
     resp = VoiceResponse()
     resp.say(prompt, voice='alice')
     gather = Gather(
         input='speech',
-        action=url_for('voice.process_speech'),
+        action=action,
         method='POST',
         speech_timeout=5,
         speech_model='phone_call',
@@ -78,29 +46,41 @@ def create_fallback_voice_response(prompt="Please ask your question."):
     resp.append(gather)
     resp.say("Thank you for calling. Goodbye!")
     resp.hangup()
-    return str(resp)
+    return resp
+
+
+# One precompiled template per Gather action (it depends on the script root)
+fallback_templates = {}
+
+
+def create_fallback_voice_response(prompt="Please ask your question."):
+    action = url_for('voice.process_speech')
+    template = fallback_templates.get(action)
+    if template is None:
+        template = TwimlTemplate(lambda prompt: build_fallback_response(action, prompt), "prompt")
+        fallback_templates[action] = template
+    with metrics.stage("twiml"):
+        return template.render(prompt=prompt)
 
 
 # Routes
 @voice_bp.route("/voice", methods=["GET","POST"])
 def voice():
     try:
+        services = get_services()
         session_id = request.form.get("CallSid", f"voice_{request.remote_addr}")
-        if not conversation_store.session_exists(session_id):
-            conversation_store.create_session(session_id)
+        if not services.conversation_store.session_exists(session_id):
+            services.conversation_store.create_session(session_id)
 
         resp = VoiceResponse()
         if request.method == "GET":
             resp.say("Metropolia Student Assistant is ready for your call!")
             return Response(str(resp), mimetype='text/xml')
 
-        if voice_service:
-            try:
-                twiml_response = voice_service.create_voice_response()
-            except Exception as e:
-                logger.error(f"VoiceService error: {e}")
-                twiml_response = create_fallback_voice_response()
-        else:
+        try:
+            twiml_response = services.voice_service.create_voice_response()
+        except Exception as e:
+            logger.error(f"VoiceService error: {e}")
             twiml_response = create_fallback_voice_response()
 
         return Response(twiml_response, mimetype='text/xml')
@@ -119,8 +99,95 @@ def test_voice():
     return Response(str(resp), mimetype='text/xml')
 
 
+def get_cached_answer(services, snapshot, question: str, standalone: bool):
+    # Precomputed FAQ answers first, then answers generated for earlier callers
+    if not standalone:
+        return None
+    if config.FAQ_ENABLED:
+        ai_text = services.faq.get("voice", snapshot.version, question)
+        if ai_text is not None:
+            return ai_text
+    if not config.ANSWER_CACHE_ENABLED:
+        return None
+    return services.answer_cache.get("voice", snapshot.version, question)
+
+
+def speculate(services, snapshot, session_id: str, question: str) -> str:
+    # Runs on the prefetch executor: the answer this turn gets if the caller's
+    # final words are `question`. Nothing is stored until /process_speech
+    # takes it over.
+    conversation_store = services.conversation_store
+    standalone = is_standalone_question(conversation_store.message_count(session_id) + 1)
+    history = conversation_store.get_messages(session_id)
+    messages = services.prompts.build_messages(snapshot, "voice", history + [{"role": "user", "content": question}])
+    cached = get_cached_answer(services, snapshot, question, snapshot.loaded and standalone)
+    if cached is not None:
+        return cached
+    return services.ai_service.generate_voice_response(
+        messages, max_output_tokens=config.VOICE_MAX_OUTPUT_TOKENS, max_chars=config.VOICE_MAX_CHARS
+    )
+
+
+def answer_speech(services, snapshot, session_id: str, speech_result: str, messages: list, cacheable: bool,
+                  speculation=None, turn=None) -> str:
+    # Runs on the voice turn executor, outside the request context
+    ai_text = None
+    if speculation is not None:
+        try:
+            ai_text = speculation.result()
+            logger.info(f"Using speculative answer for session {session_id}")
+        except Exception as e:
+            logger.warning(f"Speculative answer failed for session {session_id}: {e}")
+    # A speculative answer was generated for the partial words, which are only
+    # similar to speech_result, so it is not cached under speech_result
+    speculative = ai_text is not None and ai_text not in FALLBACK_RESPONSES
+    if not speculative:
+        ai_text = VOICE_ERROR_REPLY
+        try:
+            ai_text = services.ai_service.generate_voice_response(
+                messages, max_output_tokens=config.VOICE_MAX_OUTPUT_TOKENS, max_chars=config.VOICE_MAX_CHARS
+            )
+            logger.info(f"AI generated response: {ai_text[:100]}...")
+        except Exception as e:
+            logger.error(f"AIService error: {e}")
+
+    if (cacheable and not speculative and ai_text and ai_text not in FALLBACK_RESPONSES
+            and ai_text != VOICE_ERROR_REPLY):
+        services.answer_cache.put("voice", snapshot.version, speech_result, ai_text)
+
+    def store():
+        services.conversation_store.add_message(session_id, "assistant", ai_text)
+
+    if turn is None:
+        store()
+    elif not services.voice_turns.settle(turn, store):
+        # The caller was told to repeat the question and never hears this answer
+        logger.info(f"Answer for session {session_id} arrived after the caller was given up on, not stored")
+    return ai_text
+
+
+def answer_response(services, speech_result: str, ai_text: str) -> Response:
+    try:
+        twiml_response = services.voice_service.create_voice_response(speech_result, ai_text)
+    except Exception as e:
+        logger.error(f"VoiceService error: {e}")
+        twiml_response = create_fallback_voice_response(ai_text)
+    return Response(twiml_response, mimetype='text/xml')
+
+
+def turn_key(question: str) -> str:
+    # Names the turn a hold redirect waits for, without the caller's words in the URL
+    return hashlib.sha256(question.encode()).hexdigest()[:16]
+
+
+def hold_response(services, since: float, turn: str, message: str = None) -> Response:
+    redirect_url = url_for('voice.voice_answer', since=f"{since:.3f}", turn=turn)
+    return Response(services.voice_service.create_hold_response(redirect_url, message), mimetype='text/xml')
+
+
 @voice_bp.route("/process_speech", methods=["POST"])
 def process_speech():
+    started = time.monotonic()
     try:
         session_id = request.form.get("CallSid", f"voice_{request.remote_addr}")
         speech_result = request.form.get("SpeechResult", "").strip()
@@ -130,40 +197,113 @@ def process_speech():
             return Response(create_fallback_voice_response("I didn't hear anything. Please try again."),
                             mimetype='text/xml')
 
-        conversation_store.add_message(session_id, "user", speech_result)
-
-        ai_text = "I'm currently having trouble accessing information. Please try again later."
-        if ai_service:
-            try:
-                messages = build_messages(session_id)
-                ai_text = ai_service.generate_response(messages)
-                logger.info(f"AI generated response: {ai_text[:100]}...")
-            except Exception as e:
-                logger.error(f"AIService error: {e}")
-
-        # Clean response for voice
-        ai_text = ai_text.strip()
-        ai_text = ai_text.replace('**', '').replace('*', '')
-        if len(ai_text) > 500:
-            ai_text = ai_text[:497] + "..."
-
-        conversation_store.add_message(session_id, "assistant", ai_text)
-
-        if voice_service:
-            try:
-                twiml_response = voice_service.create_voice_response(speech_result, ai_text)
-            except Exception as e:
-                logger.error(f"VoiceService error: {e}")
-                twiml_response = create_fallback_voice_response(ai_text)
-        else:
-            twiml_response = create_fallback_voice_response(ai_text)
-
-        return Response(twiml_response, mimetype='text/xml')
+        services = get_services()
+        snapshot = services.knowledge.snapshot
+        conversation_store = services.conversation_store
+        stored = conversation_store.add_message(session_id, "user", speech_result)
+        messages = build_messages(session_id, snapshot)
+
+        standalone = snapshot.loaded and is_standalone_question(stored)
+        cacheable = config.ANSWER_CACHE_ENABLED and standalone
+        ai_text = get_cached_answer(services, snapshot, speech_result, standalone)
+        if ai_text is not None:
+            if config.VOICE_PREFETCH_ENABLED:
+                services.voice_prefetch.discard(session_id)
+            conversation_store.add_message(session_id, "assistant", ai_text)
+            return answer_response(services, speech_result, ai_text)
+
+        # An answer started from the partial transcript is reused when the
+        # final words match it
+        speculation = services.voice_prefetch.take(session_id, speech_result) if config.VOICE_PREFETCH_ENABLED else None
+
+        # Generate in the background; answer now if it is ready within the
+        # budget, otherwise put the caller on hold and poll /voice/answer.
+        voice_turns = services.voice_turns
+        voice_turns.submit(session_id, speech_result, lambda turn: answer_speech(
+            services, snapshot, session_id, speech_result, messages, cacheable, speculation, turn
+        ))
+        ai_text = voice_turns.wait(session_id, config.VOICE_RESPONSE_BUDGET - (time.monotonic() - started))
+        if ai_text is None:
+            logger.info(f"Answer not ready within budget, holding call {session_id}")
+            return hold_response(services, time.time(), turn_key(speech_result), VOICE_HOLD_MESSAGE)
+        return answer_response(services, speech_result, ai_text)
 
     except Exception as e:
         logger.error(f"Error in process_speech: {e}")
         return Response(create_fallback_voice_response("Sorry, I encountered an error. Please try again."),
                         mimetype='text/xml')
+    finally:
+        get_services().voice_turns.observe("response_seconds", time.monotonic() - started)
+
+
+# Twilio's partialResultCallback: interim transcripts while the caller speaks
+@voice_bp.route("/voice/partial", methods=["POST"])
+def partial_speech():
+    try:
+        session_id = request.form.get("CallSid")
+        partial = request.form.get("UnstableSpeechResult") or request.form.get("StableSpeechResult") or ""
+        if session_id and partial.strip() and config.VOICE_PREFETCH_ENABLED:
+            services = get_services()
+            snapshot = services.knowledge.snapshot
+            services.voice_prefetch.observe(
+                session_id, partial.strip(), lambda question: speculate(services, snapshot, session_id, question)
+            )
+        return '', 204
+
+    except Exception as e:
+        logger.error(f"Error in partial_speech: {e}")
+        return '', 204
+
+
+# Twilio follows the hold response's <Redirect> here until the answer is ready
+@voice_bp.route("/voice/answer", methods=["POST"])
+def voice_answer():
+    started = time.monotonic()
+    try:
+        session_id = request.form.get("CallSid", f"voice_{request.remote_addr}")
+        since = float(request.args.get("since", time.time()))
+        key = request.args.get("turn", "")
+        services = get_services()
+        voice_turns = services.voice_turns
+
+        # Only the turn the caller was put on hold for is answered
+        turn = voice_turns.pending(session_id)
+        if turn is not None and turn_key(turn.question) != key:
+            turn = None
+        question = turn.question if turn else ""
+        ai_text = voice_turns.wait(session_id, config.VOICE_POLL_WAIT, polled=True) if turn else None
+        if turn is None:
+            # Generated by another worker, or already collected: the answer is in
+            # the shared history right after this turn's question
+            history = services.conversation_store.get_messages(session_id)
+            if (len(history) >= 2 and history[-1]["role"] == "assistant" and history[-2]["role"] == "user"
+                    and turn_key(history[-2]["content"]) == key):
+                ai_text = history[-1]["content"]
+                question = history[-2]["content"]
+
+        if ai_text is not None:
+            return answer_response(services, question or "...", ai_text)
+        if time.time() - since > config.VOICE_MAX_WAIT:
+            # The history records what the caller heard; a late answer is dropped
+            def store_timeout_reply():
+                services.conversation_store.add_message(session_id, "assistant", VOICE_TIMEOUT_REPLY)
+
+            if turn is not None:
+                ai_text = voice_turns.abandon(session_id, store_timeout_reply)
+                if ai_text is not None:
+                    return answer_response(services, question, ai_text)
+            elif history and history[-1]["role"] == "user" and turn_key(history[-1]["content"]) == key:
+                store_timeout_reply()
+            logger.warning(f"Gave up waiting for an answer on call {session_id}")
+            return Response(create_fallback_voice_response(VOICE_TIMEOUT_REPLY), mimetype='text/xml')
+        return hold_response(services, since, key)
+
+    except Exception as e:
+        logger.error(f"Error in voice_answer: {e}")
+        return Response(create_fallback_voice_response("Sorry, I encountered an error. Please try again."),
+                        mimetype='text/xml')
+    finally:
+        get_services().voice_turns.observe("response_seconds", time.monotonic() - started)
 
 
 @voice_bp.route("/voice/status", methods=["POST"])
@@ -173,7 +313,11 @@ def voice_status():
         session_id = request.form.get('CallSid')
         logger.info(f"Call status: {call_status} for session: {session_id}")
 
+        conversation_store = get_services().conversation_store
         if call_status in ('completed', 'failed', 'busy', 'no-answer'):
+            get_services().voice_turns.discard(session_id)
+            if config.VOICE_PREFETCH_ENABLED:
+                get_services().voice_prefetch.discard(session_id)
             if session_id and conversation_store.session_exists(session_id):
                 conversation_store.end_session(session_id)
                 logger.info(f"Cleaned up voice session: {session_id}")
@@ -192,24 +336,20 @@ def update_websites():
         data = request.get_json()
         if not data or 'urls' not in data:
             return {"error": "No URLs provided"}, 400
+        error = url_list_error(data['urls'])
+        if error:
+            return {"error": error}, 400
 
-        global SYSTEM_PROMPT
-        web_content = web_scraper.scrape_multiple_urls(data['urls'])
-        SYSTEM_PROMPT = (
-            "You are a Student Assistant AI for Metropolia University. Use the information below "
-            "from both the PDF manual and official websites to answer questions accurately.\n\n"
-            "PDF MANUAL CONTENT:\n"
-            f"{pdf_text}\n\n"
-            "WEBSITE CONTENT:\n"
-            f"{web_content}\n\n"
-            "Keep voice responses concise and helpful."
-        )
+        # Same job as /update-websites: chat and voice share the knowledge
+        job = get_services().knowledge.submit_update(data['urls'])
+        status_url = url_for('health.knowledge_job', job_id=job.id)
 
         return {
-            "message": f"Updated with {len(data['urls'])} URLs",
-            "content_length": len(web_content),
+            "message": f"Updating with {len(data['urls'])} URLs",
+            "job": job.to_dict(),
+            "status_url": status_url,
             "urls": data['urls']
-        }
+        }, 202, {"Location": status_url}
     except Exception as e:
         logger.error(f"Error updating websites: {e}")
-        return {"error": str(e)}, 500
\ No newline at end of file
+        return {"error": str(e)}, 500
@@ -0,0 +1,41 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+logger = logging.getLogger(__name__)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # Werkzeug server handling requests on a fixed pool of threads, the same
+    # concurrency limit as a gunicorn gthread worker.
+    def __init__(self, host: str, port: int, app, threads: int):
+        super().__init__(host, port, app)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve(app, config, host: str = "0.0.0.0"):
+    mode = config.SERVER_MODE
+    if mode == "gevent":
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+        logger.info("Serving with gevent, up to %s concurrent requests", config.SERVER_CONNECTIONS)
+        WSGIServer((host, config.PORT), app, spawn=Pool(config.SERVER_CONNECTIONS), log=None).serve_forever()
+    elif mode == "threads":
+        logger.info("Serving with %s request threads", config.SERVER_THREADS)
+        PooledWSGIServer(host, config.PORT, app, config.SERVER_THREADS).serve_forever()
+    elif mode == "dev":
+        app.run(host=host, port=config.PORT, debug=True)
+    else:
+        raise ValueError(f"Unknown SERVER_MODE: {mode}")
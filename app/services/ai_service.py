@@ -1,31 +1,263 @@
 import google.generativeai as genai
 import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple, Union
+
+from app.services.gemini_client import GeminiClient, GeminiUnavailable
+from app.utils.metrics import SIZE_BUCKETS, metrics
+from app.utils.singleflight import SingleFlight
+from app.utils.speech import clean_for_speech, trim_to_sentences
 
 logger = logging.getLogger(__name__)
 
+SUMMARY_INSTRUCTION = (
+    "Summarize this conversation between a Metropolia student and the Student Assistant "
+    "in at most five sentences. Keep names, dates, study programmes and open questions."
+)
+# Low temperature keeps spoken answers short and to the point
+SPEECH_GENERATION_CONFIG = {"temperature": 0.4, "candidate_count": 1}
+NO_RESPONSE = "Sorry, I couldn't generate a response."
+ERROR_RESPONSE = "Sorry, I encountered an error while trying to answer."
+# Replies that stand in for an answer and must never be cached
+FALLBACK_RESPONSES = frozenset([NO_RESPONSE, ERROR_RESPONSE])
+# One string, or the parts of a prompt assembled from shared segments
+SystemInstruction = Optional[Union[str, Tuple[str, ...]]]
+
+
+def stopped_at_token_limit(response) -> bool:
+    candidates = getattr(response, "candidates", None) or []
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    return getattr(reason, "name", reason) == "MAX_TOKENS"
+
+
+def record_usage(response):
+    # Token counts Gemini reports for the request (the last chunk when streaming)
+    usage = getattr(response, "usage_metadata", None)
+    for kind, field in (("prompt", "prompt_token_count"), ("cached", "cached_content_token_count"),
+                        ("output", "candidates_token_count")):
+        count = getattr(usage, field, 0) or 0
+        if count:
+            metrics.inc("assistant_gemini_tokens_total", count, kind=kind)
+
+
+def prompt_chars(messages: list) -> int:
+    return sum(len(m["content"]) for m in messages)
+
+
+def request_options(timeout: Optional[float]) -> Optional[dict]:
+    return {"timeout": timeout} if timeout is not None else None
+
+
+def prompt_key(model_name: str, messages: list, generation_config: Optional[dict]) -> tuple:
+    # Identifies the exact request. Knowledge segments are the snapshot's own
+    # strings, whose hashes Python has already computed, so building and
+    # looking up the key does not rehash the manual.
+    config = tuple(sorted(generation_config.items())) if generation_config else None
+    return (model_name, config, *((m["role"], m["content"]) for m in messages))
+
+
+def to_gemini_contents(messages: list) -> Tuple[SystemInstruction, List[dict]]:
+    # System messages become the system instruction; the rest become
+    # user/model turns, merging consecutive turns of the same role. Several
+    # system messages are kept as separate parts: joining them would copy the
+    # whole knowledge text on every request.
+    system_parts = []
+    contents = []
+    for m in messages:
+        if m["role"] == "system":
+            system_parts.append(m["content"])
+            continue
+        role = "model" if m["role"] == "assistant" else "user"
+        if contents and contents[-1]["role"] == role:
+            contents[-1]["parts"].append(m["content"])
+        else:
+            contents.append({"role": role, "parts": [m["content"]]})
+    if len(system_parts) > 1:
+        return tuple(system_parts), contents
+    return (system_parts[0] if system_parts else None), contents
+
 
 class AIService:
-    def __init__(self, api_key: str, model: str = "gemini-1.5-flash"):
+    def __init__(self, api_key: str, model: str = "gemini-1.5-flash", model_factory=None,
+                 model_cache_size: int = 32, turn_cache_size: int = 4096, context_cache=None,
+                 transport: Optional[str] = None, coalesce: bool = True,
+                 coalesce_timeout: Optional[float] = None, client: Optional[GeminiClient] = None):
         if not api_key:
             logger.warning("GEMINI_API_KEY not set — Gemini responses will fail.")
         else:
-            genai.configure(api_key=api_key)
+            # "rest" or "grpc"; None keeps the library default
+            genai.configure(api_key=api_key, transport=transport)
         self.model_name = model
+        # Anything with generate_content(); lets a local fake replace Gemini
+        self.model_factory = model_factory or genai.GenerativeModel
+        self.model_cache_size = model_cache_size
+        self._models = OrderedDict()
+        self._models_lock = threading.Lock()
+        self.turn_cache_size = turn_cache_size
+        self._turns = {}
+        # Optional ContextCache for the static system-prompt prefix
+        self.context_cache = context_cache
+        # Deadlines, retries, concurrency limit and circuit breaker for every call
+        self.client = client or GeminiClient()
+        # Identical requests in flight at the same time share one Gemini call
+        self.coalescer = SingleFlight(coalesce_timeout) if coalesce else None
 
-    def generate_response(self, messages: list) -> str:
+    def get_model(self, system_instruction: SystemInstruction):
+        # Models are reused per (model name, system instruction), LRU-bounded
+        # because retrieval produces a different instruction for many turns.
+        # Segments shared with the snapshot hash and compare in constant time.
+        key = (self.model_name, system_instruction)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+
+        model = self.model_factory(self.model_name, system_instruction=system_instruction)
+        with self._models_lock:
+            self._models[key] = model
+            while len(self._models) > self.model_cache_size:
+                self._models.popitem(last=False)
+        return model
+
+    def to_protos(self, contents: List[dict]) -> list:
+        # The SDK would build a protos.Content per turn on every request, which
+        # costs several times more than sending a prebuilt one. Stored turns
+        # never change, so each is built once. Dict reads and writes are atomic,
+        # so requests share the cache without a lock; it is emptied when full.
+        turns = self._turns
+        result = []
+        for turn in contents:
+            key = (turn["role"], *turn["parts"])
+            proto = turns.get(key)
+            if proto is None:
+                if len(turns) >= self.turn_cache_size:
+                    turns.clear()
+                proto = turns[key] = genai.protos.Content(
+                    role=turn["role"], parts=[genai.protos.Part(text=text) for text in turn["parts"]]
+                )
+            result.append(proto)
+        return result
+
+    def _prepare(self, messages: list):
+        # When the system prompt is static knowledge followed by further system
+        # messages, the knowledge can come from the server-side context cache
+        # and the remaining instructions lead the first user turn instead.
+        system = [m for m in messages if m["role"] == "system"]
+        knowledge = tuple(m["content"] for m in system if m.get("knowledge"))
+        if self.context_cache and knowledge and len(knowledge) < len(system):
+            model = self.context_cache.get_model(knowledge)
+            if model is not None:
+                rest = [{"role": "user", "content": m["content"].lstrip()}
+                        for m in system if not m.get("knowledge")]
+                rest += [m for m in messages if m["role"] != "system"]
+                _, contents = to_gemini_contents(rest)
+                return model, self.to_protos(contents), True
+
+        system_instruction, contents = to_gemini_contents(messages)
+        return self.get_model(system_instruction), self.to_protos(contents), False
+
+    def _generate(self, messages: list, generation_config: Optional[dict] = None):
+        if self.coalescer is None:
+            return self._call_model(messages, generation_config)
+        key = prompt_key(self.model_name, messages, generation_config)
+        return self.coalescer.do(key, lambda: self._call_model(messages, generation_config))
+
+    def _call_model(self, messages: list, generation_config: Optional[dict] = None):
+        model, contents, cached = self._prepare(messages)
+        metrics.observe("assistant_prompt_chars", prompt_chars(messages), SIZE_BUCKETS)
         try:
-            dialog_text = ""
-            for m in messages:
-                dialog_text += f"{m['role'].upper()}: {m['content']}\n\n"
+            with metrics.stage("model"):
+                response = self.client.call(lambda timeout: model.generate_content(
+                    contents, generation_config=generation_config, request_options=request_options(timeout)
+                ))
+        except Exception:
+            metrics.inc("assistant_gemini_errors_total")
+            raise
+        if cached:
+            self.context_cache.record_usage(response)
+        record_usage(response)
+        return response
 
-            model = genai.GenerativeModel(self.model_name)
-            response = model.generate_content(dialog_text)
+    def generate_response(self, messages: list, generation_config: Optional[dict] = None) -> str:
+        try:
+            response = self._generate(messages, generation_config)
 
             if hasattr(response, "text"):
-                return response.text.strip()
+                text = response.text.strip()
+                metrics.observe("assistant_response_chars", len(text), SIZE_BUCKETS)
+                return text
 
-            return "Sorry, I couldn't generate a response."
+            return NO_RESPONSE
 
+        except GeminiUnavailable as e:
+            logger.warning("Gemini unavailable: %s", e)
+            return ERROR_RESPONSE
         except Exception as e:
             logger.exception("Gemini API error: %s", e)
-            return "Sorry, I encountered an error while trying to answer."
\ No newline at end of file
+            return ERROR_RESPONSE
+
+    def generate_voice_response(self, messages: list, max_output_tokens: int = 160, max_chars: int = 500) -> str:
+        # Spoken answers: the output token cap bounds latency and cost up
+        # front, and the text is cut at a sentence end instead of mid-word.
+        generation_config = dict(SPEECH_GENERATION_CONFIG, max_output_tokens=max_output_tokens)
+        try:
+            response = self._generate(messages, generation_config)
+            text = clean_for_speech(response.text)
+        except GeminiUnavailable as e:
+            logger.warning("Gemini unavailable: %s", e)
+            return ERROR_RESPONSE
+        except Exception as e:
+            logger.exception("Gemini API error: %s", e)
+            return ERROR_RESPONSE
+
+        if not text:
+            return NO_RESPONSE
+        text = trim_to_sentences(text, max_chars, complete=not stopped_at_token_limit(response))
+        metrics.observe("assistant_response_chars", len(text), SIZE_BUCKETS)
+        return text
+
+    def summarize(self, summary: str, messages: list) -> str:
+        # Rolling summary of turns that left the conversation window
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        if summary:
+            transcript = f"Earlier summary: {summary}\n{transcript}"
+        model = self.get_model(SUMMARY_INSTRUCTION)
+        response = self.client.call(
+            lambda timeout: model.generate_content(transcript, request_options=request_options(timeout))
+        )
+        return response.text.strip()
+
+    def stream_response(self, messages: list) -> Iterator[str]:
+        model, contents, cached = self._prepare(messages)
+        metrics.observe("assistant_prompt_chars", prompt_chars(messages), SIZE_BUCKETS)
+        started = time.perf_counter()
+        chunk, streamed = None, 0
+        try:
+            stream = self.client.stream(
+                lambda timeout: model.generate_content(contents, stream=True, request_options=request_options(timeout))
+            )
+            for chunk in stream:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    if not streamed:
+                        metrics.observe("assistant_stage_seconds", time.perf_counter() - started,
+                                        stage="model_first_token")
+                    streamed += len(text)
+                    yield text
+        except Exception:
+            metrics.inc("assistant_gemini_errors_total")
+            raise
+        metrics.observe("assistant_stage_seconds", time.perf_counter() - started, stage="model_stream")
+        metrics.observe("assistant_response_chars", streamed, SIZE_BUCKETS)
+        # Usage metadata arrives with the final chunk
+        if chunk is not None:
+            if cached:
+                self.context_cache.record_usage(chunk)
+            record_usage(chunk)
@@ -0,0 +1,162 @@
+import logging
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NON_WORD = re.compile(r"[^0-9a-zåäö]+")
+# A near match must agree on these: "non-EU" or "not compulsory" ask the opposite
+NEGATIONS = frozenset(["no", "non", "not", "never", "nor", "without", "cannot", "t"])
+# Words a rephrasing may add or drop without changing the question
+FILLER_WORDS = frozenset(["a", "an", "the", "to", "of", "for", "in", "on", "at", "do", "does", "is", "are",
+                          "can", "i", "my", "please"])
+
+
+def normalize_question(text: str) -> str:
+    return NON_WORD.sub(" ", text.lower()).strip()
+
+
+def question_vector(normalized: str, dimensions: int) -> np.ndarray:
+    # Hashed character trigrams (with word boundaries), L2-normalized
+    padded = f" {normalized} "
+    indices = [zlib.crc32(padded[i:i + 3].encode()) % dimensions for i in range(len(padded) - 2)]
+    vector = np.bincount(indices, minlength=dimensions).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def same_words(a: str, b: str, min_ratio: float = 0.8) -> bool:
+    # Guards a trigram near match on two normalized questions: the words only
+    # one of them has, filler aside, must be a respelling of the other's
+    # ("enrolment"/"enrollment", "time table"/"timetable"), not a different
+    # word ("autumn"/"spring"), and both must agree on negations
+    words_a, words_b = a.split(), b.split()
+    if NEGATIONS.intersection(words_a) != NEGATIONS.intersection(words_b):
+        return False
+    only_a = "".join(w for w in words_a if w not in words_b and w not in FILLER_WORDS)
+    only_b = "".join(w for w in words_b if w not in words_a and w not in FILLER_WORDS)
+    if only_a == only_b:
+        return True
+    return SequenceMatcher(None, only_a, only_b).ratio() >= min_ratio
+
+
+class AnswerCache:
+    # Answers to standalone questions keyed by (channel, knowledge version,
+    # normalized question). Optionally a near-duplicate lookup compares the
+    # question's hashed trigram vector with all cached questions in one
+    # matrix-vector product; a candidate must also pass same_words(), since
+    # trigrams alone score "EU" and "non-EU" students as the same question.
+    # LRU-bounded, with per-entry TTL.
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600,
+                 similarity_threshold: float = 0.0, dimensions: int = 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.dimensions = dimensions
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (answer, stored_at, slot)
+        # Only near-duplicate lookup reads the vectors (4 KB per entry by default)
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32) if similarity_threshold > 0 else None
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        # Answers generated from an older snapshot than this are not stored
+        self._min_version = 0
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0, "stores": 0, "stale_stores": 0,
+                       "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, channel: str, version: int, question: str) -> Optional[str]:
+        normalized = normalize_question(question)
+        key = (channel, version, normalized)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] > self.ttl:
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+
+            if self._vectors is not None and self._entries:
+                near_key = self._nearest(channel, version, normalized)
+                if near_key and now - self._entries[near_key][1] <= self.ttl:
+                    self._entries.move_to_end(near_key)
+                    self._stats["near_hits"] += 1
+                    return self._entries[near_key][0]
+
+            self._stats["misses"] += 1
+            return None
+
+    def _nearest(self, channel: str, version: int, normalized: str):
+        scores = self._vectors @ question_vector(normalized, self.dimensions)
+        for slot in np.argsort(-scores)[:8]:
+            if scores[slot] < self.similarity_threshold:
+                break
+            key = self._slot_keys[slot]
+            if key and key[0] == channel and key[1] == version and same_words(normalized, key[2]):
+                return key
+        return None
+
+    def put(self, channel: str, version: int, question: str, answer: str):
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        key = (channel, version, normalized)
+
+        with self._lock:
+            if version < self._min_version:
+                # Generated from a snapshot replaced while the answer was written
+                self._stats["stale_stores"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+            slot = self._free_slots.pop()
+            if self._vectors is not None:
+                self._vectors[slot] = question_vector(normalized, self.dimensions)
+            self._slot_keys[slot] = key
+            self._entries[key] = (answer, time.monotonic(), slot)
+            self._stats["stores"] += 1
+
+    def _remove(self, key):
+        _, _, slot = self._entries.pop(key)
+        if self._vectors is not None:
+            self._vectors[slot] = 0
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+
+    def invalidate(self, snapshot=None):
+        # With a snapshot, drops the answers of older knowledge versions;
+        # without one, everything
+        with self._lock:
+            if snapshot is not None:
+                self._min_version = max(self._min_version, snapshot.version)
+            for key in list(self._entries):
+                if snapshot is None or key[1] < self._min_version:
+                    self._remove(key)
+            self._stats["invalidations"] += 1
+        logger.info("Answer cache invalidated")
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["near_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["near_hits"]) / lookups if lookups else 0.0
+        return stats
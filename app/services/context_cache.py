@@ -0,0 +1,178 @@
+import datetime
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+from app.services.gemini_client import GeminiClient
+
+logger = logging.getLogger(__name__)
+
+
+class ContextCache:
+    # Keeps one server-side CachedContent for the static knowledge prefix of the
+    # system prompt. The handle is keyed by the prefix hash, so new knowledge
+    # (e.g. after /update-websites) replaces it; it is renewed shortly before
+    # its TTL runs out. Creating, renewing and deleting run in the background
+    # through the GeminiClient, one at a time per prefix, and requests never
+    # wait for them: until a cache exists they send the prompt normally. Any
+    # failure disables caching for `retry_after` seconds.
+    def __init__(self, model_name: str, ttl: float = 3600, renew_margin: float = 300,
+                 retry_after: float = 300, cached_content_cls=None, model_from_cache=None,
+                 client: Optional[GeminiClient] = None):
+        self.model_name = model_name
+        self.ttl = ttl
+        self.renew_margin = min(renew_margin, ttl / 2)
+        self.retry_after = retry_after
+        self.cached_content_cls = cached_content_cls or caching.CachedContent
+        self.model_from_cache = model_from_cache or genai.GenerativeModel.from_cached_content
+        self.client = client or GeminiClient()
+        self._jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-cache")
+        # The SDK's cache calls take no timeout, so each runs here and the job
+        # stops waiting for it after the GeminiClient's per-attempt timeout
+        self._calls = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-cache-call")
+
+        self._lock = threading.Lock()
+        self._key = None
+        self._handle = None
+        self._model = None
+        self._expires_at = 0.0
+        self._disabled_until = 0.0
+        self._failed_key = None
+        self._prefix = ()
+        self._prefix_key = None
+        # Prefix keys with a create or renew job queued or running
+        self._busy = set()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "created": 0, "renewed": 0, "failures": 0,
+            "cached_requests": 0, "tokens_saved": 0, "last_tokens_saved": 0,
+        }
+
+    def get_model(self, static_prefix: Union[str, Tuple[str, ...]]):
+        parts = (static_prefix,) if isinstance(static_prefix, str) else static_prefix
+        now = time.monotonic()
+
+        with self._lock:
+            key = self._fingerprint(parts)
+            if now < self._disabled_until and key == self._failed_key:
+                return None
+            current = self._model if key == self._key else None
+            if current is not None and now < self._expires_at - self.renew_margin:
+                return current
+            if key not in self._busy:
+                self._busy.add(key)
+                if current is None:
+                    self._jobs.submit(self._run, key, self._create, key, parts)
+                else:
+                    self._jobs.submit(self._run, key, self._renew, self._handle)
+            return current
+
+    def _run(self, key: str, job, *args):
+        try:
+            job(*args)
+        except Exception as e:
+            logger.warning("Gemini context caching unavailable, sending full prompt: %s", str(e) or type(e).__name__)
+            self._record("failures")
+            with self._lock:
+                self._failed_key = key
+                self._disabled_until = time.monotonic() + self.retry_after
+                if self._key == key:
+                    self._key = self._handle = self._model = None
+        finally:
+            with self._lock:
+                self._busy.discard(key)
+
+    def _call(self, request, abandoned=None):
+        # Never retried: a call the job stopped waiting for may still complete
+        # on the server. abandoned(result) cleans up after such a call.
+        def attempt(timeout):
+            future = self._calls.submit(request)
+            try:
+                return future.result(timeout)
+            except TimeoutError:
+                if not future.cancel() and abandoned is not None:
+                    future.add_done_callback(lambda f: f.exception() is None and abandoned(f.result()))
+                raise
+
+        return self.client.call(attempt, max_retries=0)
+
+    def _delete(self, handle):
+        try:
+            handle.delete()
+        except Exception as e:
+            logger.warning("Could not delete context cache %s: %s", handle.name, e)
+
+    def _fingerprint(self, parts: Tuple[str, ...]) -> str:
+        # The snapshot hands out the same segment objects until the knowledge
+        # changes, so the prefix is only hashed again when one of them differs
+        if len(parts) == len(self._prefix) and all(a is b for a, b in zip(parts, self._prefix)):
+            return self._prefix_key
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode())
+        self._prefix, self._prefix_key = parts, digest.hexdigest()
+        return self._prefix_key
+
+    def _create(self, key: str, parts: Tuple[str, ...]):
+        with self._lock:
+            if key != self._prefix_key:
+                # Newer knowledge arrived while this job was queued
+                return
+        started = time.monotonic()
+        handle = self._call(lambda: self.cached_content_cls.create(
+            model=self.model_name,
+            display_name=f"student-assistant-{key[:12]}",
+            system_instruction=parts[0] if len(parts) == 1 else list(parts),
+            ttl=datetime.timedelta(seconds=self.ttl),
+        ), abandoned=self._delete)
+        model = self.model_from_cache(handle)
+        with self._lock:
+            previous = self._handle
+            self._key, self._handle, self._model = key, handle, model
+            self._expires_at = started + self.ttl
+        self._record("created")
+        logger.info("Created Gemini context cache %s", handle.name)
+
+        if previous is not None:
+            try:
+                self._call(previous.delete)
+            except Exception as e:
+                logger.warning("Could not delete old context cache %s: %s", previous.name, e)
+
+    def _renew(self, handle):
+        started = time.monotonic()
+        self._call(lambda: handle.update(ttl=datetime.timedelta(seconds=self.ttl)))
+        with self._lock:
+            if self._handle is handle:
+                self._expires_at = started + self.ttl
+        self._record("renewed")
+
+    def record_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        saved = getattr(usage, "cached_content_token_count", 0) or 0
+        with self._stats_lock:
+            self._stats["cached_requests"] += 1
+            self._stats["tokens_saved"] += saved
+            self._stats["last_tokens_saved"] = saved
+        logger.debug("Context cache saved %s prompt tokens", saved)
+
+    def _record(self, event: str):
+        with self._stats_lock:
+            self._stats[event] += 1
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["tokens_saved_per_request"] = (
+            stats["tokens_saved"] / stats["cached_requests"] if stats["cached_requests"] else 0
+        )
+        stats["active"] = self._handle is not None
+        return stats
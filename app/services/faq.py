@@ -0,0 +1,164 @@
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.ai_service import FALLBACK_RESPONSES
+from app.services.answer_cache import normalize_question
+from app.utils.rate_limit import TokenBucket
+from app.utils.speech import clean_for_speech, trim_to_sentences
+
+logger = logging.getLogger(__name__)
+
+# A heading that is itself a question, e.g. "How do I get a student card?"
+QUESTION_LINE = re.compile(r"^[A-ZÅÄÖ][^.!?:]{8,200}\?$")
+BULLET = re.compile(r"^[•*–-]+\s*")
+
+
+def load_questions(path: str) -> List[str]:
+    # One question per line; blank lines and "#" comments are skipped
+    if not path or not os.path.isfile(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def mine_questions(text: str) -> List[str]:
+    questions = []
+    for line in text.splitlines():
+        line = BULLET.sub("", line.strip())
+        if QUESTION_LINE.match(line) and 3 <= len(line.split()) <= 20:
+            questions.append(line)
+    return questions
+
+
+class FAQPrecomputer:
+    # Answers the frequent questions ahead of time for every knowledge
+    # version: the configured list, then question headings found in the
+    # manual and website text, up to max_questions. Generation starts in the
+    # background when a snapshot is published and runs batch_size questions at
+    # a time with at most requests_per_second Gemini calls; each answer is
+    # served as soon as it is stored, in a chat form and a speech-trimmed voice
+    # form. Lookups match the normalized question (case and punctuation
+    # ignored) for the current version only.
+    def __init__(self, ai_service: Callable[[], object], prompts, questions: List[str] = (),
+                 mine_headings: bool = True, max_questions: int = 100, batch_size: int = 4,
+                 requests_per_second: float = 1.0, voice_max_chars: int = 500):
+        self.ai_service = ai_service
+        self.prompts = prompts
+        self.questions = list(questions)
+        self.mine_headings = mine_headings
+        self.max_questions = max_questions
+        self.batch_size = max(1, batch_size)
+        self.voice_max_chars = voice_max_chars
+        self._bucket = TokenBucket(requests_per_second, capacity=self.batch_size)
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="faq")
+        self._pool = ThreadPoolExecutor(max_workers=self.batch_size, thread_name_prefix="faq-answer")
+        self._lock = threading.Lock()
+        self._version = 0
+        self._planned: List[str] = []
+        self._answers: Dict[str, Tuple[str, str]] = {}   # normalized question -> (chat, voice)
+        self._run = {"configured": 0, "mined": 0, "failed": 0, "run_seconds": 0.0}
+        self._stats = {"hits": 0, "misses": 0, "runs": 0, "superseded": 0}
+
+    def plan(self, snapshot) -> Tuple[List[str], int, int]:
+        # The questions to answer for a snapshot, configured ones first
+        mined = []
+        if self.mine_headings:
+            mined = mine_questions(snapshot.pdf_text) + mine_questions(snapshot.web_content)
+        questions, seen = [], set()
+        for question in self.questions + mined:
+            normalized = normalize_question(question)
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                questions.append(question)
+        questions = questions[:self.max_questions]
+        listed = {normalize_question(question) for question in self.questions}
+        configured = sum(1 for question in questions if normalize_question(question) in listed)
+        return questions, configured, len(questions) - configured
+
+    def refresh(self, snapshot):
+        # Knowledge listener: answers for older versions are dropped at once
+        if not snapshot.loaded:
+            return
+        questions, configured, mined = self.plan(snapshot)
+        with self._lock:
+            if snapshot.version <= self._version:
+                return
+            self._version = snapshot.version
+            self._planned = questions
+            self._answers = {}
+            self._run = {"configured": configured, "mined": mined, "failed": 0, "run_seconds": 0.0}
+            self._stats["runs"] += 1
+        logger.info("Precomputing %s FAQ answers (%s configured, %s mined) for knowledge version %s",
+                    len(questions), configured, mined, snapshot.version)
+        self._runner.submit(self._precompute, snapshot, questions)
+
+    def _current(self, snapshot) -> bool:
+        with self._lock:
+            return self._version == snapshot.version
+
+    def _precompute(self, snapshot, questions: List[str]):
+        started = time.monotonic()
+        for i in range(0, len(questions), self.batch_size):
+            if not self._current(snapshot):
+                with self._lock:
+                    self._stats["superseded"] += 1
+                logger.info("Knowledge version %s replaced, FAQ precompute stopped", snapshot.version)
+                return
+            batch = questions[i:i + self.batch_size]
+            for question, answer in zip(batch, self._pool.map(lambda q: self._answer(snapshot, q), batch)):
+                self._store(snapshot, question, answer)
+        with self._lock:
+            if self._version == snapshot.version:
+                self._run["run_seconds"] = time.monotonic() - started
+        logger.info("FAQ answers for knowledge version %s ready in %.1f s",
+                    snapshot.version, time.monotonic() - started)
+
+    def _answer(self, snapshot, question: str) -> Optional[Tuple[str, str]]:
+        self._bucket.acquire()
+        try:
+            messages = self.prompts.build_messages(snapshot, "chat", [{"role": "user", "content": question}])
+            answer = self.ai_service().generate_response(messages)
+        except Exception as e:
+            logger.warning("FAQ answer failed for %r: %s", question, e)
+            return None
+        if not answer or answer in FALLBACK_RESPONSES:
+            return None
+        voice = trim_to_sentences(clean_for_speech(answer), self.voice_max_chars)
+        return answer, voice or answer
+
+    def _store(self, snapshot, question: str, answer: Optional[Tuple[str, str]]):
+        with self._lock:
+            if self._version != snapshot.version:
+                return
+            if answer is None:
+                self._run["failed"] += 1
+                return
+            self._answers[normalize_question(question)] = answer
+
+    def get(self, channel: str, version: int, question: str) -> Optional[str]:
+        normalized = normalize_question(question)
+        with self._lock:
+            entry = self._answers.get(normalized) if version == self._version else None
+            self._stats["hits" if entry else "misses"] += 1
+        if entry is None:
+            return None
+        return entry[1] if channel == "voice" else entry[0]
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats, **self._run)
+            stats["version"] = self._version
+            stats["questions"] = len(self._planned)
+            stats["answered"] = len(self._answers)
+        stats["pending"] = stats["questions"] - stats["answered"] - stats["failed"]
+        stats["coverage"] = stats["answered"] / stats["questions"] if stats["questions"] else 0.0
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,285 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+import requests
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Quota, overload and transient server or network errors. Anything else (bad
+# request, blocked prompt, wrong API key) fails the same way when retried.
+RETRIABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def is_retriable(error: Exception) -> bool:
+    return isinstance(error, RETRIABLE_ERRORS)
+
+
+class GeminiUnavailable(Exception):
+    # Raised without calling Gemini: the circuit is open, too many requests
+    # are queued, or no slot became free before the deadline
+    pass
+
+
+class CircuitBreaker:
+    # closed: calls go through and consecutive failures are counted.
+    # open: calls fail at once for reset_timeout seconds.
+    # half_open: one trial call decides whether to close or open again.
+    # failure_threshold=0 never opens.
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._stats = {"opened": 0, "closed": 0, "short_circuited": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state
+
+    def _advance(self, now: float):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_started = None
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            if self._state == self.CLOSED:
+                return True
+            # A trial call that never reported back does not block the next one forever
+            if self._state == self.HALF_OPEN and (
+                    self._probe_started is None or now - self._probe_started >= self.reset_timeout):
+                self._probe_started = now
+                return True
+            self._stats["short_circuited"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._state = self.CLOSED
+                self._stats["closed"] += 1
+                logger.info("Gemini circuit closed")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.failure_threshold <= 0 or self._state == self.OPEN:
+                return
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._stats["opened"] += 1
+                logger.warning(
+                    "Gemini circuit opened after %s consecutive failures, retrying in %s s",
+                    self._failures, self.reset_timeout
+                )
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        state = self.state
+        with self._lock:
+            stats = dict(self._stats)
+            stats["consecutive_failures"] = self._failures
+        stats["state"] = state
+        # Numeric copies of the state for /metrics
+        stats["circuit_open"] = int(state == self.OPEN)
+        stats["circuit_half_open"] = int(state == self.HALF_OPEN)
+        return stats
+
+
+class GeminiClient:
+    # Wraps every Gemini request. At most max_concurrent run at once and at
+    # most max_queue wait for a slot, first come first served; more are
+    # turned away. Each attempt gets
+    # at most `timeout` seconds and never more than is left of the call's
+    # `deadline`. Retriable errors are retried up to max_retries times after a
+    # jittered exponential backoff, and the circuit breaker fails calls at once
+    # while Gemini keeps failing. 0 disables a limit.
+    def __init__(
+        self,
+        timeout: float = 20.0,
+        deadline: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 4.0,
+        max_concurrent: int = 32,
+        max_queue: int = 64,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queue = deque()
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "successes": 0, "failures": 0,
+                       "rejected": 0, "queue_timeouts": 0, "max_active": 0}
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _deadline(self, seconds: Optional[float]) -> float:
+        seconds = self.deadline if seconds is None else seconds
+        return time.monotonic() + seconds if seconds > 0 else float("inf")
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise GeminiUnavailable("Gemini circuit is open")
+
+    @contextmanager
+    def _slot(self, deadline: float):
+        self._acquire(deadline)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self, deadline: float):
+        # Waiters are served in arrival order: a released slot is handed to the
+        # oldest waiter, so new arrivals cannot overtake requests already queued
+        with self._lock:
+            if self.max_concurrent <= 0 or (self._active < self.max_concurrent and not self._queue):
+                self._started()
+                return
+            if len(self._queue) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise GeminiUnavailable(f"{len(self._queue)} Gemini requests already queued")
+            turn = threading.Event()
+            self._queue.append(turn)
+
+        remaining = deadline - time.monotonic()
+        if turn.wait(None if remaining == float("inf") else max(remaining, 0)):
+            return
+        with self._lock:
+            if turn.is_set():
+                # Handed a slot just as the wait ran out
+                return
+            self._queue.remove(turn)
+            self._stats["queue_timeouts"] += 1
+        raise GeminiUnavailable("No Gemini slot became free before the deadline")
+
+    def _started(self):
+        # Caller holds self._lock
+        self._active += 1
+        self._stats["max_active"] = max(self._stats["max_active"], self._active)
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            if self._queue:
+                self._started()
+                self._queue.popleft().set()
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": anywhere up to the exponential bound, so callers that
+        # failed together do not retry together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _attempts(self, request: Callable[[Optional[float]], T], deadline: float,
+                  max_retries: Optional[int] = None) -> T:
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            timeout = min(self.timeout or remaining, remaining)
+            self._count("attempts")
+            try:
+                result = request(None if timeout == float("inf") else max(timeout, 0.001))
+            except Exception as e:
+                if not is_retriable(e):
+                    # Gemini answered; the request itself is at fault
+                    self.breaker.record_success()
+                    self._count("failures")
+                    raise
+                self.breaker.record_failure()
+                delay = self.backoff(attempt)
+                if attempt >= max_retries or time.monotonic() + delay >= deadline:
+                    self._count("failures")
+                    raise
+                attempt += 1
+                self._count("retries")
+                logger.warning("Gemini call failed (%s: %s), retry %s in %.2f s",
+                               type(e).__name__, e, attempt, delay)
+                time.sleep(delay)
+                self._check_breaker()
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    def call(self, request: Callable[[Optional[float]], T], deadline: Optional[float] = None,
+             max_retries: Optional[int] = None) -> T:
+        # request(timeout) makes one attempt; timeout is None when unlimited.
+        # max_retries=0 for requests that must not be repeated
+        self._count("calls")
+        self._check_breaker()
+        deadline_at = self._deadline(deadline)
+        with self._slot(deadline_at):
+            return self._attempts(request, deadline_at, max_retries)
+
+    def stream(self, request: Callable[[Optional[float]], Iterator[T]],
+               deadline: Optional[float] = None) -> Iterator[T]:
+        # Attempts are retried until the first chunk arrives; the slot is held
+        # until the stream has been read
+        def first_chunk(timeout):
+            iterator = iter(request(timeout))
+            return iterator, next(iterator, None)
+
+        self._count("calls")
+        self._check_breaker()
+        deadline_at = self._deadline(deadline)
+        with self._slot(deadline_at):
+            iterator, chunk = self._attempts(first_chunk, deadline_at)
+            if chunk is None:
+                return
+            yield chunk
+            try:
+                yield from iterator
+            except Exception as e:
+                if is_retriable(e):
+                    self.breaker.record_failure()
+                raise
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+            stats["waiting"] = len(self._queue)
+        stats.update(self.breaker.stats)
+        return stats
@@ -0,0 +1,159 @@
+from bisect import bisect_right
+from typing import List
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+from lxml import etree
+import lxml.html
+
+EXCLUDED_TAGS = frozenset(["script", "style", "nav", "header", "footer"])
+TEXT_TAGS = frozenset(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'td'])
+CONTENT_SELECTORS = [
+    'main', 'article', '.content', '.main-content',
+    '#content', '#main', '.post-content', '.entry-content'
+]
+MIN_TEXT_LENGTH = 10
+
+
+def split_page_text(text: str) -> List[str]:
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return [chunk for chunk in chunks if chunk and len(chunk) > MIN_TEXT_LENGTH]
+
+
+class SoupExtractor:
+    name = "soup"
+
+    def extract(self, content: bytes) -> List[str]:
+        soup = BeautifulSoup(content, 'html.parser')
+        for script in soup(list(EXCLUDED_TAGS)):
+            script.decompose()
+        text_parts = []
+
+        main_content = None
+        for selector in CONTENT_SELECTORS:
+            main_content = soup.select_one(selector)
+            if main_content:
+                break
+
+        content_element = main_content if main_content else soup.find('body')
+
+        if content_element:
+            text_elements = content_element.find_all(list(TEXT_TAGS))
+
+            for element in text_elements:
+                text = element.get_text().strip()
+                if text and len(text) > MIN_TEXT_LENGTH:
+                    text_parts.append(text)
+
+        if not text_parts:
+            text_parts = split_page_text(soup.get_text())
+
+        return text_parts
+
+
+def _selector_matches(selector: str, tag: str, attrib) -> bool:
+    if selector[0] == '.':
+        return selector[1:] in attrib.get('class', '').split()
+    if selector[0] == '#':
+        return attrib.get('id') == selector[1:]
+    return tag == selector
+
+
+class LxmlExtractor:
+    # Same paragraphs as SoupExtractor from one walk over an lxml tree: text
+    # fragments are collected in document order while excluded subtrees are
+    # skipped, and every element remembers the fragment range it covers, so
+    # both the content container and the text elements are resolved without
+    # re-traversing the document.
+    name = "lxml"
+
+    def extract(self, content: bytes) -> List[str]:
+        # Detect the encoding the same way BeautifulSoup does, let libxml2 decode
+        dammit = UnicodeDammit(content, is_html=True)
+        if not dammit.unicode_markup or not dammit.unicode_markup.strip():
+            return []
+        parser = lxml.html.HTMLParser(encoding=dammit.original_encoding or 'utf-8')
+        try:
+            root = lxml.html.document_fromstring(content, parser=parser)
+        except etree.ParserError:
+            return []
+
+        fragments = []
+        text_elements = []          # [node index, first fragment, end fragment]
+        containers = {}             # selector -> [node index, end node index]
+        body = None
+        node_count = 0
+
+        stack = [(root, False, None, ())]
+        while stack:
+            element, closing, text_record, spans = stack.pop()
+            if closing:
+                # Fix the element's ranges, then continue with its tail
+                if text_record:
+                    text_record[2] = len(fragments)
+                for span in spans:
+                    span[1] = node_count
+                if element.tail and element is not root:
+                    fragments.append(element.tail)
+                continue
+
+            tag = element.tag
+            if not isinstance(tag, str) or tag in EXCLUDED_TAGS:
+                # Comments, processing instructions and removed tags keep only their tail
+                if element.tail:
+                    fragments.append(element.tail)
+                continue
+
+            node_index = node_count
+            node_count += 1
+
+            text_record = None
+            if tag in TEXT_TAGS:
+                text_record = [node_index, len(fragments), None]
+                text_elements.append(text_record)
+            spans = []
+            for selector in CONTENT_SELECTORS:
+                if selector not in containers and _selector_matches(selector, tag, element.attrib):
+                    containers[selector] = [node_index, None]
+                    spans.append(containers[selector])
+            if tag == 'body' and body is None:
+                body = [node_index, None]
+                spans.append(body)
+
+            if element.text:
+                fragments.append(element.text)
+
+            stack.append((element, True, text_record, spans))
+            for child in reversed(element):
+                stack.append((child, False, None, ()))
+
+        container = next((containers[s] for s in CONTENT_SELECTORS if s in containers), body)
+
+        text_parts = []
+        if container:
+            starts = [record[0] for record in text_elements]
+            first = bisect_right(starts, container[0])
+            last = bisect_right(starts, container[1] - 1)
+            for _, start, end in text_elements[first:last]:
+                text = "".join(fragments[start:end]).strip()
+                if text and len(text) > MIN_TEXT_LENGTH:
+                    text_parts.append(text)
+
+        if not text_parts:
+            text_parts = split_page_text("".join(fragments))
+
+        return text_parts
+
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+def get_extractor(name: str):
+    try:
+        return EXTRACTORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown HTML extractor: {name}") from None
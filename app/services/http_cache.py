@@ -0,0 +1,89 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    text: str
+    fetched_at: float
+    extractor: str
+
+
+class HTTPCache:
+    # On-disk cache of scraped pages: the raw body, its validators and the text
+    # extracted from it, so a 304 answer needs no HTML parsing at all. The text
+    # is tagged with the extractor that produced it; another extractor
+    # re-extracts it from the stored body.
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "revalidated": 0, "misses": 0, "errors": 0, "reextracted": 0}
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL, "
+                "text TEXT NOT NULL, fetched_at REAL NOT NULL, extractor TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            if "extractor" not in columns:
+                # Text cached before extractors were recorded is re-extracted on use
+                conn.execute("ALTER TABLE responses ADD COLUMN extractor TEXT NOT NULL DEFAULT ''")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT url, etag, last_modified, body, text, fetched_at, extractor FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+        return CachedResponse(*row) if row else None
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes, text: str,
+            extractor: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, body, text, fetched_at, extractor) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, text, time.time(), extractor)
+            )
+
+    def retext(self, url: str, text: str, extractor: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE responses SET text = ?, extractor = ? WHERE url = ?", (text, extractor, url))
+
+    def touch(self, url: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def record(self, event: str):
+        with self._stats_lock:
+            self._stats[event] += 1
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
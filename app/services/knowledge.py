@@ -0,0 +1,254 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.knowledge_base import KnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_PROMPT = "You are a Student Assistant AI for Metropolia University. Answer questions helpfully."
+PROMPT_HEADER = (
+    "You are a Student Assistant AI for Metropolia University. Use the information below "
+    "from both the PDF manual and official websites to answer questions accurately. "
+    "If the answer is not found in the provided information, politely say so and suggest "
+    "checking the official Metropolia website.\n\n"
+    "PDF MANUAL CONTENT:\n"
+)
+WEBSITE_HEADER = "\n\nWEBSITE CONTENT:\n"
+
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    version: int
+    pdf_text: str
+    web_content: str
+    knowledge_base: Optional[KnowledgeBase]
+
+    @property
+    def loaded(self) -> bool:
+        return self.version > 0
+
+    @cached_property
+    def prompt_segments(self) -> Tuple[str, ...]:
+        # The full knowledge prompt as the pieces it is made of. Channels send
+        # these pieces as they are, so no request copies the manual text.
+        return (PROMPT_HEADER, self.pdf_text, WEBSITE_HEADER, self.web_content)
+
+    @cached_property
+    def full_prompt(self) -> str:
+        return "".join(self.prompt_segments)
+
+
+class KnowledgeJob:
+    # One load, website update or periodic refresh, as reported by the
+    # job-status endpoint. Jobs run one at a time on the manager's worker.
+    __slots__ = ("id", "kind", "urls", "status", "submitted_at", "started_at", "finished_at",
+                 "version", "web_characters", "error", "future")
+
+    def __init__(self, kind: str, urls: Optional[List[str]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.urls = urls
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = None
+        self.web_characters = None
+        self.error = None
+        self.future = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def wait(self, timeout: float = None) -> bool:
+        if self.future is not None:
+            try:
+                self.future.result(timeout)
+            except Exception:
+                pass
+        return self.finished
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__ if name != "future"}
+
+
+class KnowledgeManager:
+    # Holds the one copy of the manual/website text that every blueprint reads.
+    # Readers only ever see a complete snapshot; loads swap the reference.
+    # Loads, website updates and refreshes run as background jobs on a single
+    # worker, so they never interleave and versions are published in order.
+    def __init__(self, pdf_service, web_scraper, urls: List[str], config, max_jobs: int = 50):
+        self.pdf_service = pdf_service
+        self.web_scraper = web_scraper
+        self.urls = urls
+        self.config = config
+        self.max_jobs = max_jobs
+
+        self._snapshot = KnowledgeSnapshot(0, "", "", None)
+        self._lock = threading.Lock()
+        # Held for a whole load/update/refresh, also when called directly
+        self._update_lock = threading.RLock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="knowledge-job")
+        self._jobs: Dict[str, KnowledgeJob] = OrderedDict()
+        self._loader = None
+        self._refresher = None
+        self._listeners = []
+
+    @property
+    def snapshot(self) -> KnowledgeSnapshot:
+        return self._snapshot
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def add_listener(self, callback):
+        # callback(snapshot) runs after every new snapshot is published
+        self._listeners.append(callback)
+
+    def start_background_load(self) -> KnowledgeJob:
+        with self._lock:
+            if self._loader is None:
+                self._loader = self._enqueue("load", self.load)
+            return self._loader
+
+    def submit_update(self, urls: List[str]) -> KnowledgeJob:
+        urls = list(urls)
+        return self._submit("update", lambda: self.update_websites(urls), urls)
+
+    def submit_refresh(self) -> KnowledgeJob:
+        return self._submit("refresh", self.refresh_websites)
+
+    def get_job(self, job_id: str) -> Optional[KnowledgeJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[KnowledgeJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _submit(self, kind: str, work: Callable[[], KnowledgeSnapshot], urls: List[str] = None) -> KnowledgeJob:
+        with self._lock:
+            return self._enqueue(kind, work, urls)
+
+    def _enqueue(self, kind: str, work: Callable[[], KnowledgeSnapshot], urls: List[str] = None) -> KnowledgeJob:
+        # A job that would do the same work is still waiting: share it
+        for job in self._jobs.values():
+            if job.status == "queued" and job.kind == kind and job.urls == urls:
+                return job
+        job = KnowledgeJob(kind, urls)
+        self._jobs[job.id] = job
+        finished = [key for key, old in self._jobs.items() if old.finished]
+        for key in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[key]
+        job.future = self._executor.submit(self._run_job, job, work)
+        return job
+
+    def _run_job(self, job: KnowledgeJob, work: Callable[[], KnowledgeSnapshot]):
+        job.status, job.started_at = "running", time.time()
+        try:
+            snapshot = work()
+            job.version, job.web_characters = snapshot.version, len(snapshot.web_content)
+            job.status = "done"
+        except Exception as e:
+            logger.exception("Knowledge %s job failed: %s", job.kind, e)
+            job.status, job.error = "failed", str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def start_background_refresh(self, interval: float):
+        with self._lock:
+            if self._refresher is None and interval > 0:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, args=(interval,), name="knowledge-refresher", daemon=True
+                )
+                self._refresher.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _refresh_loop(self, interval: float):
+        while not self._stopped.wait(interval):
+            self.submit_refresh().wait()
+
+    def load(self) -> KnowledgeSnapshot:
+        with self._update_lock:
+            return self._load()
+
+    def _load(self) -> KnowledgeSnapshot:
+        pdf_text = self.pdf_service.extract_text()
+        if not pdf_text:
+            logger.warning("PDF content empty — manual context unavailable.")
+            pdf_text = "No PDF content available."
+
+        web_content = self.scrape(self.urls)
+        snapshot = self._publish(pdf_text, web_content)
+        logger.info(
+            "Knowledge loaded: PDF %s characters, web %s characters",
+            len(pdf_text), len(web_content)
+        )
+        return snapshot
+
+    def update_websites(self, urls: List[str]) -> KnowledgeSnapshot:
+        with self._update_lock:
+            self.urls = list(urls)
+            pdf_text = self._snapshot.pdf_text or self.pdf_service.extract_text() or "No PDF content available."
+            return self._publish(pdf_text, self.scrape(urls))
+
+    def refresh_websites(self) -> KnowledgeSnapshot:
+        with self._update_lock:
+            snapshot = self._snapshot
+            if not snapshot.loaded:
+                return snapshot
+            web_content = self.scrape(self.urls)
+            # Unchanged pages keep the current version so nothing downstream is invalidated
+            if web_content == snapshot.web_content:
+                logger.info("Website content unchanged, keeping knowledge version %s", snapshot.version)
+                return snapshot
+            return self._publish(snapshot.pdf_text, web_content)
+
+    def scrape(self, urls: List[str]) -> str:
+        if not urls:
+            logger.warning("No WEBSITE_URLS configured in config")
+            return "No website URLs configured."
+        try:
+            return self.web_scraper.scrape_multiple_urls(urls)
+        except Exception as e:
+            logger.error("Web scraping failed: %s", e)
+            return f"Could not retrieve web content: {str(e)}"
+
+    def _publish(self, pdf_text: str, web_content: str) -> KnowledgeSnapshot:
+        # Chunking and BM25 are only paid for when retrieval is on
+        knowledge_base = None
+        if self.config.RAG_ENABLED:
+            knowledge_base = KnowledgeBase(self.config.RAG_CHUNK_SIZE, self.config.RAG_CHUNK_OVERLAP)
+            knowledge_base.add_document("PDF manual", pdf_text)
+            knowledge_base.add_document("Metropolia website", web_content)
+            knowledge_base.build()
+
+        # The index is built before the swap and published with its snapshot;
+        # caches keyed by version drop older entries right after it
+        with self._lock:
+            snapshot = KnowledgeSnapshot(self._snapshot.version + 1, pdf_text, web_content, knowledge_base)
+            self._snapshot = snapshot
+        self._ready.set()
+        logger.info("Published knowledge version %s", snapshot.version)
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error("Knowledge listener failed: %s", e)
+        return snapshot
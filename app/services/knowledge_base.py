@@ -0,0 +1,137 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[0-9a-zåäö]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or",
+    "the", "to", "what", "when", "where", "which", "who", "will", "with", "you",
+    "your",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
+    # Pack whole lines into chunks of roughly chunk_size characters; the tail of
+    # each chunk is repeated at the start of the next one so that facts split
+    # across a boundary stay retrievable.
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    chunks = []
+    current = ""
+
+    for line in lines:
+        while len(line) > chunk_size:
+            cut = line.rfind(" ", 0, chunk_size)
+            cut = cut if cut > 0 else chunk_size
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:cut])
+            line = line[cut:].strip()
+
+        if current and len(current) + len(line) + 1 > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap > 0 else ""
+            space = tail.find(" ")
+            current = tail[space + 1:] if space >= 0 else ""
+
+        current = f"{current}\n{line}" if current else line
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass(frozen=True)
+class Chunk:
+    source: str
+    text: str
+
+
+class KnowledgeBase:
+    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100, k1: float = 1.5, b: float = 0.75):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[Chunk] = []
+
+        self._vocabulary = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._doc_ids = np.zeros(0, dtype=np.int32)
+        self._weights = np.zeros(0, dtype=np.float32)
+
+    def add_document(self, source: str, text: str):
+        for piece in chunk_text(text or "", self.chunk_size, self.chunk_overlap):
+            self.chunks.append(Chunk(source, piece))
+
+    def build(self):
+        # BM25 index stored as CSR-style postings: for term t the documents are
+        # _doc_ids[_offsets[t]:_offsets[t + 1]] with precomputed term weights.
+        postings = {}
+        lengths = np.zeros(len(self.chunks), dtype=np.float32)
+
+        for doc_id, chunk in enumerate(self.chunks):
+            tokens = tokenize(chunk.text)
+            lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        n_docs = len(self.chunks)
+        avg_length = float(lengths.mean()) if n_docs and lengths.sum() else 1.0
+        norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+
+        vocabulary = {}
+        offsets = [0]
+        doc_ids = []
+        weights = []
+        for term_id, (term, entries) in enumerate(postings.items()):
+            vocabulary[term] = term_id
+            ids = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = np.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            doc_ids.append(ids)
+            weights.append(idf * tfs * (self.k1 + 1) / (tfs + norms[ids]))
+            offsets.append(offsets[-1] + len(entries))
+
+        self._vocabulary = vocabulary
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32)
+        self._weights = (np.concatenate(weights).astype(np.float32)
+                         if weights else np.zeros(0, dtype=np.float32))
+
+        logger.info("Knowledge base indexed %s chunks, %s terms", n_docs, len(vocabulary))
+        return self
+
+    def search(self, query: str, top_k: int = 5) -> List[Chunk]:
+        if not self.chunks or top_k <= 0:
+            return []
+
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term_id = self._vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            scores[self._doc_ids[start:end]] += self._weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [self.chunks[i] for i in ranked]
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the page hash changes meaning; older rows are dropped on open.
+# Version 2 hashes the page's resolved fonts instead of their resource names.
+SCHEMA_VERSION = 2
+
+
+class PDFTextCache:
+    # Content-addressed store of extracted PDF text. Documents are keyed by the
+    # SHA-256 of the whole file and map to an ordered list of page hashes; page
+    # text is keyed by the hash of the page's content stream and resources, so
+    # an edited PDF only needs its changed pages re-extracted. SQLite in WAL mode lets every
+    # worker process share the same file.
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "file_hash TEXT PRIMARY KEY, page_hashes TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "page_hash TEXT PRIMARY KEY, text TEXT NOT NULL)"
+            )
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                conn.execute("DELETE FROM documents")
+                conn.execute("DELETE FROM pages")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                if version:
+                    logger.info("PDF text cache cleared: page hashes changed (version %s)", SCHEMA_VERSION)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_document(self, file_hash: str) -> Optional[List[str]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT page_hashes FROM documents WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            page_hashes = json.loads(row[0])
+            texts = self._get_pages(conn, page_hashes)
+
+        if len(texts) != len(set(page_hashes)):
+            return None
+        return [texts[h] for h in page_hashes]
+
+    def get_pages(self, page_hashes: Iterable[str]) -> Dict[str, str]:
+        with self._connect() as conn:
+            return self._get_pages(conn, list(page_hashes))
+
+    def _get_pages(self, conn: sqlite3.Connection, page_hashes: List[str]) -> Dict[str, str]:
+        texts = {}
+        unique = list(set(page_hashes))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT page_hash, text FROM pages WHERE page_hash IN ({placeholders})", batch
+            )
+            texts.update(rows)
+        return texts
+
+    def put_document(self, file_hash: str, page_hashes: List[str], new_pages: Dict[str, str]):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (page_hash, text) VALUES (?, ?)",
+                new_pages.items()
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (file_hash, page_hashes, created_at) VALUES (?, ?, ?)",
+                (file_hash, json.dumps(page_hashes), time.time())
+            )
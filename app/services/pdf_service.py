@@ -1,18 +1,339 @@
 from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+import hashlib
 import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from app.services.pdf_cache import PDFTextCache
+from app.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Font programs and image samples do not change the extracted text
+SKIPPED_KEYS = frozenset(["/FontFile", "/FontFile2", "/FontFile3"])
+
+
+def digest_object(digest, obj, memo: Dict[tuple, bytes]):
+    # Feeds a PDF object to the digest in a canonical form: sorted dictionary
+    # keys and decoded stream data. Indirect objects are hashed once per
+    # reader (fonts are shared by many pages); one already being hashed higher
+    # up, a cycle, stands in as a marker.
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        value = memo.get(key)
+        if value is None:
+            memo[key] = b"cycle"
+            child = hashlib.sha256()
+            digest_object(child, obj.get_object(), memo)
+            value = memo[key] = child.digest()
+        digest.update(value)
+    elif isinstance(obj, DictionaryObject):
+        digest.update(b"<<")
+        for key in sorted(obj):
+            if key not in SKIPPED_KEYS:
+                digest.update(key.encode())
+                digest_object(digest, obj.raw_get(key), memo)
+        if isinstance(obj, StreamObject) and obj.get("/Subtype") != "/Image":
+            digest.update(b"stream")
+            digest.update(obj.get_data())
+        digest.update(b">>")
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            digest_object(digest, item, memo)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode())
+
+
+def hash_page(page, memo: Optional[Dict[tuple, bytes]] = None) -> str:
+    contents = page.get_contents()
+    data = contents.get_data() if contents is not None else b""
+    # Text extraction also depends on the resources the page references: the
+    # font dictionaries with their encodings, widths and ToUnicode maps, and
+    # form XObjects with their own content. Subset fonts reuse resource names
+    # across documents, so the objects are hashed, not just their names.
+    # `memo` holds hashes of one reader's indirect objects.
+    digest = hashlib.sha256(data)
+    digest_object(digest, page.raw_get("/Resources") if "/Resources" in page else DictionaryObject(),
+                  {} if memo is None else memo)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class PageRecord:
+    source: str
+    page: int  # 1-based; 0 when the whole document could not be opened
+    pages: int
+    text: str
+    error: Optional[str] = None
+
+
+def describe(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+_worker_caches: Dict[str, PDFTextCache] = {}
+
+
+def extract_page_range(path: str, start: int, stop: int, cache_path: Optional[str] = None) -> list:
+    # Runs in a worker process, which opens the file for each range
+    try:
+        reader = PdfReader(path)
+    except Exception as e:
+        return [(i, None, "", describe(e), False) for i in range(start, stop)]
+    return extract_reader_range(reader, start, stop, cache_path, {})
+
+
+def extract_reader_range(reader: PdfReader, start: int, stop: int, cache_path: Optional[str],
+                         memo: Dict[tuple, bytes]) -> list:
+    # Returns (index, page_hash, text, error, extracted) per page; a page that
+    # fails only marks itself as failed. `memo` is hash_page's, for this reader.
+    try:
+        pages = [reader.pages[i] for i in range(start, stop)]
+    except Exception as e:
+        return [(i, None, "", describe(e), False) for i in range(start, stop)]
+
+    page_hashes = []
+    for page in pages:
+        try:
+            page_hashes.append(hash_page(page, memo))
+        except Exception:
+            page_hashes.append(None)
+
+    cached = {}
+    if cache_path:
+        try:
+            cache = _worker_caches.get(cache_path)
+            if cache is None:
+                cache = _worker_caches[cache_path] = PDFTextCache(cache_path)
+            cached = cache.get_pages(h for h in page_hashes if h)
+        except Exception as e:
+            logger.warning("PDF text cache unavailable in worker: %s", e)
+
+    rows = []
+    for index, page, page_hash in zip(range(start, stop), pages, page_hashes):
+        if page_hash in cached:
+            rows.append((index, page_hash, cached[page_hash], None, False))
+            continue
+        try:
+            rows.append((index, page_hash, page.extract_text() or "", None, True))
+        except Exception as e:
+            rows.append((index, page_hash, "", describe(e), False))
+    return rows
+
+
+def run_inline(fn, *args) -> Future:
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class Document:
+    # Ingestion state of one PDF while its page ranges come back
+    def __init__(self, path: str):
+        self.path = path
+        self.file_hash: Optional[str] = None
+        self.total = 0
+        self.cached: Optional[List[str]] = None
+        self.error: Optional[str] = None
+        self.page_hashes: List[Optional[str]] = []
+        self.new_pages: Dict[str, str] = {}
+        # Kept open across page ranges when extracting in this process
+        self.reader: Optional[PdfReader] = None
+        self.memo: Dict[tuple, bytes] = {}
+        self.received = 0
+        self.failed = 0
+
+
 class PDFService:
-    def __init__(self, pdf_path: str):
+    # Pages are extracted by a pool of worker processes, in ranges of
+    # pages_per_task pages, and yielded in document and page order as
+    # PageRecords. workers=0 extracts in this process.
+    def __init__(
+        self,
+        pdf_path: str,
+        cache: Optional[PDFTextCache] = None,
+        pdf_dir: str = "",
+        workers: int = 0,
+        pages_per_task: int = 16
+    ):
         self.pdf_path = pdf_path
+        self.cache = cache
+        self.pdf_dir = pdf_dir
+        self.workers = workers
+        self.pages_per_task = max(1, pages_per_task)
+
+    def sources(self) -> List[str]:
+        paths = []
+        if self.pdf_dir and os.path.isdir(self.pdf_dir):
+            paths = sorted(
+                os.path.join(self.pdf_dir, name) for name in os.listdir(self.pdf_dir)
+                if name.lower().endswith(".pdf")
+            )
+        if self.pdf_path and os.path.abspath(self.pdf_path) not in {os.path.abspath(p) for p in paths}:
+            paths.append(self.pdf_path)
+        return paths
+
+    def iter_pages(self, paths: Optional[Iterable[str]] = None) -> Iterator[PageRecord]:
+        paths = self.sources() if paths is None else list(paths)
+        if self.workers > 0:
+            # Extraction starts from the knowledge job thread of a threaded
+            # server; a forked child could inherit a lock another thread held
+            with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                yield from self._iter_pages(paths, pool.submit, self.workers * 2)
+        else:
+            yield from self._iter_pages(paths, None, 1)
+
+    def _iter_pages(self, paths: List[str], submit, window: int) -> Iterator[PageRecord]:
+        # At most `window` page ranges are in flight; results are yielded in
+        # submission order while later ranges are still being extracted.
+        # Without a pool (submit=None) each document's reader is reused.
+        cache_path = self.cache.db_path if self.cache else None
+        pending = deque()
+        try:
+            for document, start, stop in self._plan(paths, keep_reader=submit is None):
+                future = None
+                if document.cached is None and not document.error:
+                    try:
+                        if submit is None:
+                            future = run_inline(
+                                extract_reader_range, document.reader, start, stop, cache_path, document.memo
+                            )
+                        else:
+                            future = submit(extract_page_range, document.path, start, stop, cache_path)
+                    except Exception as e:
+                        future = Future()
+                        future.set_exception(e)
+                pending.append((document, start, stop, future))
+                while len(pending) > window:
+                    yield from self._collect(*pending.popleft())
+            while pending:
+                yield from self._collect(*pending.popleft())
+        finally:
+            for *_, future in pending:
+                if future is not None:
+                    future.cancel()
+
+    def _plan(self, paths: List[str], keep_reader: bool = False):
+        seen = set()
+        for path in paths:
+            document = Document(path)
+            try:
+                document.file_hash = hash_file(path)
+                if document.file_hash in seen:
+                    logger.info("Skipping %s, same file as an earlier PDF", path)
+                    continue
+                seen.add(document.file_hash)
+                if self.cache:
+                    document.cached = self.cache.get_document(document.file_hash)
+                if document.cached is not None:
+                    document.total = len(document.cached)
+                    logger.info("PDF text cache hit for %s (%s pages)", path, document.total)
+                else:
+                    reader = PdfReader(path)
+                    document.total = len(reader.pages)
+                    if keep_reader:
+                        document.reader = reader
+            except Exception as e:
+                document.error = describe(e)
+                logger.error("Could not open PDF %s: %s", path, document.error)
+                yield document, 0, 0
+                continue
+
+            if document.cached is not None:
+                yield document, 0, document.total
+                continue
+            document.page_hashes = [None] * document.total
+            for start in range(0, document.total, self.pages_per_task):
+                yield document, start, min(start + self.pages_per_task, document.total)
+
+    def _collect(self, document: Document, start: int, stop: int, future: Optional[Future]) -> Iterator[PageRecord]:
+        if document.error:
+            metrics.inc("assistant_pdf_pages_total", result="failed")
+            yield PageRecord(document.path, 0, 0, "", document.error)
+            return
+        if document.cached is not None:
+            metrics.inc("assistant_pdf_pages_total", document.total, result="cached")
+            for index, text in enumerate(document.cached):
+                yield PageRecord(document.path, index + 1, document.total, text)
+            return
+
+        try:
+            rows = future.result()
+        except Exception as e:
+            # The worker itself died; only this range is lost
+            rows = [(i, None, "", describe(e), False) for i in range(start, stop)]
+
+        for index, page_hash, text, error, extracted in rows:
+            document.page_hashes[index] = page_hash
+            if error:
+                document.failed += 1
+                logger.warning("Could not extract page %s of %s: %s", index + 1, document.path, error)
+            elif extracted and page_hash:
+                document.new_pages[page_hash] = text
+            metrics.inc(
+                "assistant_pdf_pages_total",
+                result="failed" if error else "extracted" if extracted else "cached"
+            )
+            yield PageRecord(document.path, index + 1, document.total, text, error)
+
+        document.received += stop - start
+        if document.received == document.total:
+            self._finish(document)
+
+    def _finish(self, document: Document):
+        document.reader, document.memo = None, {}
+        logger.info(
+            "Extracted %s of %s pages from %s (%s failed)",
+            len(document.new_pages), document.total, document.path, document.failed
+        )
+        # A document with failed pages is not recorded, so they are retried next time
+        if self.cache and not document.failed and None not in document.page_hashes:
+            try:
+                self.cache.put_document(document.file_hash, document.page_hashes, document.new_pages)
+            except Exception as e:
+                logger.warning("Could not store PDF text cache: %s", e)
+
+    def extract_pages(self) -> List[str]:
+        return [record.text for record in self.iter_pages([self.pdf_path])]
 
     def extract_text(self) -> str:
+        sources = self.sources()
+        texts: Dict[str, List[str]] = {}
+        failed = 0
         try:
-            reader = PdfReader(self.pdf_path)
-            pages = [p.extract_text() for p in reader.pages if p.extract_text()]
-            return "\n".join(pages)
+            for record in self.iter_pages(sources):
+                if record.error:
+                    failed += 1
+                elif record.text:
+                    texts.setdefault(record.source, []).append(record.text)
         except Exception as e:
             logger.exception("PDF extraction failed: %s", e)
-            return ""
\ No newline at end of file
+        if failed:
+            logger.warning("%s PDF pages could not be extracted", failed)
+
+        if len(sources) == 1:
+            return "\n".join(texts.get(sources[0], []))
+        # Several handbooks: each starts with its file name
+        return "\n\n".join(
+            f"[{os.path.basename(source)}]\n" + "\n".join(texts[source])
+            for source in sources if source in texts
+        )
@@ -0,0 +1,48 @@
+from typing import Dict
+
+from app.services.knowledge import FALLBACK_PROMPT, KnowledgeSnapshot
+from app.utils.helper import get_latest_user_message, get_retrieval_prompt
+
+# Instructions that differ per channel, applied after the shared knowledge
+CHANNEL_SUFFIXES = {
+    "chat": "Keep responses helpful, accurate, and student-focused.",
+    "voice": (
+        "Keep voice responses concise, natural for speech, and helpful: at most three short "
+        "sentences of plain text, without lists, headings or formatting."
+    ),
+}
+
+
+class PromptAssembler:
+    # Builds the messages for a channel from the one shared knowledge snapshot.
+    # With the full knowledge text, the system messages are the snapshot's own
+    # segments (marked "knowledge") plus the channel suffix; they are built
+    # once per snapshot and channel and reused by every request.
+    def __init__(self, config, suffixes: Dict[str, str] = None):
+        self.config = config
+        self.suffixes = suffixes or CHANNEL_SUFFIXES
+        self._full = {}
+
+    def build_messages(self, snapshot: KnowledgeSnapshot, channel: str, history: list) -> list:
+        return [*self.system_messages(snapshot, channel, history), *history]
+
+    def system_messages(self, snapshot: KnowledgeSnapshot, channel: str, history: list):
+        if not snapshot.loaded:
+            return [{"role": "system", "content": FALLBACK_PROMPT}]
+        if not self.config.RAG_ENABLED or snapshot.knowledge_base is None:
+            return self._full_messages(snapshot, channel)
+        chunks = snapshot.knowledge_base.search(get_latest_user_message(history), self.config.RAG_TOP_K)
+        return [{"role": "system", "content": get_retrieval_prompt(chunks, self.suffixes[channel])}]
+
+    def _full_messages(self, snapshot: KnowledgeSnapshot, channel: str) -> tuple:
+        cached = self._full.get(channel)
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+        messages = tuple(
+            {"role": "system", "content": segment, "knowledge": True}
+            for segment in snapshot.prompt_segments if segment
+        )
+        # The separator travels with the suffix so the parts read as one prompt
+        messages += ({"role": "system", "content": f"\n\n{self.suffixes[channel]}"},)
+        self._full[channel] = (snapshot, messages)
+        return messages
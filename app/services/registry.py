@@ -0,0 +1,231 @@
+import logging
+import threading
+
+from flask import current_app, url_for
+
+from app.models.conversation import ConversationStore
+from app.models.session_backends import MemoryBackend, RedisBackend, SQLiteBackend
+from app.services.ai_service import AIService
+from app.services.answer_cache import AnswerCache
+from app.services.context_cache import ContextCache
+from app.services.faq import FAQPrecomputer, load_questions
+from app.services.gemini_client import CircuitBreaker, GeminiClient
+from app.services.html_extractor import get_extractor
+from app.services.http_cache import HTTPCache
+from app.services.knowledge import KnowledgeManager
+from app.services.pdf_cache import PDFTextCache
+from app.services.pdf_service import PDFService
+from app.services.prompt import PromptAssembler
+from app.services.voice_service import VoiceService
+from app.services.voice_prefetch import VoicePrefetcher
+from app.services.voice_turns import VoiceTurnScheduler
+from app.services.web_scraper import WebScraper
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    # One instance per application; every service is built on first use and
+    # then shared by all blueprints and request threads.
+    def __init__(self, config):
+        self.config = config
+        self._services = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, factory):
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+                    logger.info("Initialized %s", name)
+        return service
+
+    def override(self, name: str, service):
+        # Replace a service before first use, e.g. with a local fake
+        with self._lock:
+            self._services[name] = service
+
+    @property
+    def pdf_service(self) -> PDFService:
+        return self._get("pdf_service", self._create_pdf_service)
+
+    @property
+    def web_scraper(self) -> WebScraper:
+        return self._get("web_scraper", self._create_web_scraper)
+
+    @property
+    def ai_service(self) -> AIService:
+        return self._get("ai_service", self._create_ai_service)
+
+    @property
+    def voice_service(self) -> VoiceService:
+        return self._get(
+            "voice_service",
+            lambda: VoiceService(
+                self.config.TWILIO_ACCOUNT_SID,
+                self.config.TWILIO_AUTH_TOKEN,
+                self.config.TWILIO_PHONE_NUMBER,
+                # Built on the first voice request, so a URL prefix or proxy path is kept
+                partial_callback=url_for("voice.partial_speech") if self.config.VOICE_PREFETCH_ENABLED else None
+            )
+        )
+
+    @property
+    def conversation_store(self) -> ConversationStore:
+        return self._get("conversation_store", self._create_conversation_store)
+
+    @property
+    def voice_turns(self) -> VoiceTurnScheduler:
+        return self._get("voice_turns", lambda: VoiceTurnScheduler(
+            max_workers=self.config.VOICE_WORKERS, result_ttl=self.config.VOICE_MAX_WAIT * 2
+        ))
+
+    @property
+    def voice_prefetch(self) -> VoicePrefetcher:
+        return self._get("voice_prefetch", lambda: VoicePrefetcher(
+            stable_seconds=self.config.VOICE_PREFETCH_STABLE_SECONDS,
+            min_words=self.config.VOICE_PREFETCH_MIN_WORDS,
+            min_similarity=self.config.VOICE_PREFETCH_SIMILARITY,
+            max_speculations=self.config.VOICE_PREFETCH_MAX,
+            max_workers=self.config.VOICE_PREFETCH_WORKERS,
+            ttl=self.config.VOICE_MAX_WAIT * 2
+        ))
+
+    @property
+    def answer_cache(self) -> AnswerCache:
+        return self._get("answer_cache", self._create_answer_cache)
+
+    @property
+    def faq(self) -> FAQPrecomputer:
+        return self._get("faq", self._create_faq)
+
+    @property
+    def knowledge(self) -> KnowledgeManager:
+        return self._get(
+            "knowledge",
+            lambda: KnowledgeManager(
+                self.pdf_service, self.web_scraper, self.config.WEBSITE_URLS, self.config
+            )
+        )
+
+    @property
+    def prompts(self) -> PromptAssembler:
+        return self._get("prompts", lambda: PromptAssembler(self.config))
+
+    def _create_conversation_store(self) -> ConversationStore:
+        summarizer = None
+        if self.config.CONVERSATION_SUMMARIZE:
+            # Resolved per call so an overridden ai_service is used
+            summarizer = lambda summary, messages: self.ai_service.summarize(summary, messages)
+        return ConversationStore(
+            backend=self._create_session_backend(),
+            max_turns=self.config.CONVERSATION_MAX_TURNS,
+            max_tokens=self.config.CONVERSATION_MAX_TOKENS,
+            summarizer=summarizer
+        )
+
+    def _create_session_backend(self):
+        expiry = dict(session_ttl=self.config.CONVERSATION_SESSION_TTL, idle_ttl=self.config.CONVERSATION_IDLE_TTL)
+        backend = self.config.SESSION_BACKEND
+        if backend == "sqlite":
+            return SQLiteBackend(
+                self.config.SESSION_DB_PATH, max_sessions=self.config.CONVERSATION_MAX_SESSIONS, **expiry
+            )
+        if backend == "redis":
+            import redis
+            return RedisBackend(redis.Redis.from_url(self.config.SESSION_REDIS_URL), **expiry)
+        if backend != "memory":
+            raise ValueError(f"Unknown session backend: {backend}")
+        return MemoryBackend(max_sessions=self.config.CONVERSATION_MAX_SESSIONS, **expiry)
+
+    def _create_answer_cache(self) -> AnswerCache:
+        cache = AnswerCache(
+            max_entries=self.config.ANSWER_CACHE_SIZE,
+            ttl=self.config.ANSWER_CACHE_TTL,
+            similarity_threshold=self.config.ANSWER_CACHE_SIMILARITY
+        )
+        # Entries are keyed by knowledge version; drop them as soon as it changes
+        self.knowledge.add_listener(cache.invalidate)
+        return cache
+
+    def _create_faq(self) -> FAQPrecomputer:
+        faq = FAQPrecomputer(
+            # Resolved per call so an overridden ai_service is used
+            lambda: self.ai_service,
+            self.prompts,
+            questions=load_questions(self.config.FAQ_PATH),
+            mine_headings=self.config.FAQ_MINE_HEADINGS,
+            max_questions=self.config.FAQ_MAX_QUESTIONS,
+            batch_size=self.config.FAQ_BATCH_SIZE,
+            requests_per_second=self.config.FAQ_REQUESTS_PER_SECOND,
+            voice_max_chars=self.config.VOICE_MAX_CHARS
+        )
+        # Answered again for every new knowledge version
+        self.knowledge.add_listener(faq.refresh)
+        faq.refresh(self.knowledge.snapshot)
+        return faq
+
+    def _create_ai_service(self) -> AIService:
+        client = self._create_gemini_client()
+        context_cache = None
+        if self.config.GEMINI_CONTEXT_CACHE:
+            context_cache = ContextCache(self.config.GEMINI_MODEL, ttl=self.config.GEMINI_CONTEXT_CACHE_TTL,
+                                         client=client)
+        return AIService(
+            self.config.GEMINI_API_KEY, self.config.GEMINI_MODEL,
+            context_cache=context_cache, transport=self.config.GEMINI_TRANSPORT or None,
+            coalesce=self.config.GEMINI_COALESCE, coalesce_timeout=self.config.GEMINI_COALESCE_TIMEOUT,
+            client=client
+        )
+
+    def _create_gemini_client(self) -> GeminiClient:
+        return GeminiClient(
+            timeout=self.config.GEMINI_TIMEOUT,
+            deadline=self.config.GEMINI_DEADLINE,
+            max_retries=self.config.GEMINI_MAX_RETRIES,
+            backoff_base=self.config.GEMINI_RETRY_BASE,
+            backoff_max=self.config.GEMINI_RETRY_MAX,
+            max_concurrent=self.config.GEMINI_MAX_CONCURRENT,
+            max_queue=self.config.GEMINI_MAX_QUEUE,
+            breaker=CircuitBreaker(self.config.GEMINI_BREAKER_FAILURES, self.config.GEMINI_BREAKER_RESET)
+        )
+
+    def _create_web_scraper(self) -> WebScraper:
+        cache = None
+        if self.config.HTTP_CACHE_PATH:
+            try:
+                cache = HTTPCache(self.config.HTTP_CACHE_PATH)
+            except Exception as e:
+                logger.warning("HTTP cache unavailable: %s", e)
+        return WebScraper(
+            max_workers=self.config.SCRAPER_MAX_WORKERS,
+            per_host_concurrency=self.config.SCRAPER_PER_HOST_CONCURRENCY,
+            requests_per_second=self.config.SCRAPER_REQUESTS_PER_SECOND,
+            request_timeout=self.config.SCRAPER_REQUEST_TIMEOUT,
+            deadline=self.config.SCRAPER_DEADLINE,
+            cache=cache,
+            cache_fresh_seconds=self.config.HTTP_CACHE_FRESH_SECONDS,
+            extractor=get_extractor(self.config.HTML_EXTRACTOR)
+        )
+
+    def _create_pdf_service(self) -> PDFService:
+        cache = None
+        if self.config.PDF_CACHE_PATH:
+            try:
+                cache = PDFTextCache(self.config.PDF_CACHE_PATH)
+            except Exception as e:
+                logger.warning("PDF text cache unavailable: %s", e)
+        return PDFService(
+            self.config.PDF_PATH,
+            cache,
+            pdf_dir=self.config.PDF_DIR,
+            workers=self.config.PDF_WORKERS,
+            pages_per_task=self.config.PDF_PAGES_PER_TASK
+        )
+
+
+def get_services() -> ServiceRegistry:
+    return current_app.extensions["services"]
@@ -0,0 +1,176 @@
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from app.services.answer_cache import normalize_question, question_vector, same_words
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIMENSIONS = 1024
+
+
+class Speculation:
+    __slots__ = ("question", "normalized", "future", "started")
+
+    def __init__(self, question: str, normalized: str, future: Future, started: float):
+        self.question = question
+        self.normalized = normalized
+        self.future = future
+        self.started = started
+
+
+class PartialSpeech:
+    # What the caller has said so far in the current turn
+    __slots__ = ("normalized", "speculation", "speculations", "updated")
+
+    def __init__(self):
+        self.normalized = ""
+        self.speculation: Optional[Speculation] = None
+        self.speculations = 0
+        self.updated = time.monotonic()
+
+
+def similarity(a: str, b: str) -> float:
+    # Cosine similarity of hashed character trigrams, as the answer cache uses
+    if a == b:
+        return 1.0
+    return float(np.dot(question_vector(a, VECTOR_DIMENSIONS), question_vector(b, VECTOR_DIMENSIONS)))
+
+
+def same_question(a: str, b: str, min_similarity: float) -> bool:
+    return a == b or (similarity(a, b) >= min_similarity and same_words(a, b))
+
+
+class VoicePrefetcher:
+    # Starts generating a voice answer from Twilio's partial speech results,
+    # before the caller's silence ends the <Gather>. A partial transcript that
+    # has not changed for stable_seconds starts a speculation (at most
+    # max_speculations per turn). When the final SpeechResult arrives, take()
+    # hands over the speculation if its question is close enough and discards
+    # it otherwise; a discarded one is cancelled if it has not started yet.
+    # One scheduler thread checks the partials when they become due; a
+    # partial that changed in the meantime has a later entry of its own.
+    def __init__(self, stable_seconds: float = 0.5, min_words: int = 3, min_similarity: float = 0.9,
+                 max_speculations: int = 2, max_workers: int = 8, ttl: float = 120):
+        self.stable_seconds = stable_seconds
+        self.min_words = min_words
+        self.min_similarity = min_similarity
+        self.max_speculations = max_speculations
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voice-prefetch")
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._calls: Dict[str, PartialSpeech] = {}
+        # (due, seq, call_sid, partial, normalized, text, generate), earliest first
+        self._due = []
+        self._seq = 0
+        self._scheduler: Optional[threading.Thread] = None
+        self._stats = {"partials": 0, "speculations": 0, "reused": 0, "discarded": 0, "cancelled": 0,
+                       "not_ready": 0, "limited": 0, "expired": 0}
+
+    def observe(self, call_sid: str, text: str, generate: Callable[[str], str]):
+        # generate(question) produces the answer; it runs on the prefetch pool
+        normalized = normalize_question(text)
+        now = time.monotonic()
+        with self._lock:
+            self._stats["partials"] += 1
+            self._purge(now)
+            if len(normalized.split()) < self.min_words:
+                return
+            partial = self._calls.get(call_sid)
+            if partial is None:
+                partial = self._calls[call_sid] = PartialSpeech()
+            partial.updated = now
+            if normalized == partial.normalized:
+                return
+            partial.normalized = normalized
+            self._seq += 1
+            heapq.heappush(self._due, (now + self.stable_seconds, self._seq, call_sid, partial,
+                                       normalized, text, generate))
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._schedule, name="voice-prefetch-scheduler",
+                                                   daemon=True)
+                self._scheduler.start()
+            elif self._due[0][1] == self._seq:
+                self._wakeup.notify()
+
+    def _schedule(self):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._due and self._due[0][0] <= now:
+                    _, _, call_sid, partial, normalized, text, generate = heapq.heappop(self._due)
+                    self._stable(call_sid, partial, normalized, text, generate)
+                self._wakeup.wait(self._due[0][0] - now if self._due else None)
+
+    def _stable(self, call_sid: str, partial: PartialSpeech, normalized: str, text: str,
+                generate: Callable[[str], str]):
+        # Caller holds self._lock
+        if self._calls.get(call_sid) is not partial or partial.normalized != normalized:
+            return
+        current = partial.speculation
+        if current is not None and same_question(current.normalized, normalized, self.min_similarity):
+            return
+        if partial.speculations >= self.max_speculations:
+            self._stats["limited"] += 1
+            return
+        if current is not None:
+            self._discard(current)
+        partial.speculations += 1
+        self._stats["speculations"] += 1
+        partial.speculation = Speculation(
+            text, normalized, self._executor.submit(generate, text), time.monotonic()
+        )
+        logger.info("Speculating on partial speech for call %s: %s", call_sid, text)
+
+    def take(self, call_sid: str, final_text: str) -> Optional[Future]:
+        # The speculative answer for this turn's final transcript, if any
+        with self._lock:
+            partial = self._calls.pop(call_sid, None)
+            if partial is None:
+                return None
+            speculation = partial.speculation
+            if speculation is None:
+                self._stats["not_ready"] += 1
+                return None
+            if same_question(speculation.normalized, normalize_question(final_text), self.min_similarity):
+                self._stats["reused"] += 1
+                return speculation.future
+            self._discard(speculation)
+        logger.info("Final speech for call %s differs from the speculation, discarded", call_sid)
+        return None
+
+    def discard(self, call_sid: str):
+        with self._lock:
+            partial = self._calls.pop(call_sid, None)
+            if partial is not None:
+                self._drop(partial)
+
+    def _discard(self, speculation: Speculation):
+        # Caller holds self._lock; a running generation finishes unused
+        self._stats["cancelled" if speculation.future.cancel() else "discarded"] += 1
+
+    def _drop(self, partial: PartialSpeech):
+        # Its scheduled checks find it gone from self._calls
+        if partial.speculation is not None:
+            self._discard(partial.speculation)
+
+    def _purge(self, now: float):
+        # Caller holds self._lock; turns that never got a final result
+        for call_sid, partial in list(self._calls.items()):
+            if now - partial.updated > self.ttl:
+                del self._calls[call_sid]
+                self._drop(partial)
+                self._stats["expired"] += 1
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._calls)
+        return stats
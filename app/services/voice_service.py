@@ -1,12 +1,97 @@
 from twilio.rest import Client
 from twilio.twiml.voice_response import VoiceResponse, Gather
 import logging
+from functools import partial
+
+from app.services.twiml import TwimlTemplate
+from app.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+
+def gather_speech(partial_callback: str = None) -> Gather:
+    options = {}
+    if partial_callback:
+        # Twilio posts interim transcripts here while the caller is speaking
+        options = {"partial_result_callback": partial_callback, "partial_result_callback_method": "POST"}
+    return Gather(
+        input='speech',
+        action='/process_speech',
+        method='POST',
+        speech_timeout=3,
+        speech_model='phone_call',
+        language='en-US',
+        enhanced='true',
+        **options
+    )
+
+
+def build_greeting_response(partial_callback: str = None) -> VoiceResponse:
+    resp = VoiceResponse()
+    resp.say(
+        "Hello! Welcome to the Metropolia Student Assistant. "
+        "I can help you with course information, deadlines, and university services. "
+        "Please ask your question after the beep.",
+        voice='alice',
+        language='en-US'
+    )
+
+    gather = gather_speech(partial_callback)
+    gather.say("Please speak now.", voice='alice')
+    resp.append(gather)
+
+    resp.say(
+        "We didn't hear your question. Please call back and try again. Goodbye!",
+        voice='alice'
+    )
+    resp.hangup()
+    return resp
+
+
+def build_answer_response(ai_response: str = None, partial_callback: str = None) -> VoiceResponse:
+    resp = VoiceResponse()
+    if ai_response:
+        resp.say(ai_response, voice='alice', language='en-US')
+
+    gather = gather_speech(partial_callback)
+    gather.say(
+        "Do you have another question? Please speak now, or hang up to end the call.",
+        voice='alice'
+    )
+    resp.append(gather)
+
+    resp.say(
+        "Thank you for calling the Metropolia Student Assistant. Have a great day!",
+        voice='alice'
+    )
+    resp.hangup()
+    return resp
+
+
+def build_error_response() -> VoiceResponse:
+    resp = VoiceResponse()
+    resp.say(
+        "We're experiencing technical difficulties. Please try again later.",
+        voice='alice'
+    )
+    resp.hangup()
+    return resp
+
+
+def build_hold_response(redirect_url: str, message: str = None) -> VoiceResponse:
+    # Keeps the call alive while the answer is still being generated
+    resp = VoiceResponse()
+    if message:
+        resp.say(message, voice='alice', language='en-US')
+    resp.pause(length=1)
+    resp.redirect(redirect_url, method='POST')
+    return resp
+
+
 class VoiceService:
-    def __init__(self, account_sid: str, auth_token: str, phone_number: str):
+    def __init__(self, account_sid: str, auth_token: str, phone_number: str, partial_callback: str = None):
         self.phone_number = phone_number
+        self.partial_callback = partial_callback
         self.client = None
 
         if account_sid and auth_token:
@@ -18,67 +103,28 @@ class VoiceService:
         else:
             logger.warning("Twilio credentials not provided - voice calls will not work")
 
+        # The scaffolding around the spoken text is the same on every webhook
+        self.greeting_template = TwimlTemplate(partial(build_greeting_response, partial_callback=partial_callback))
+        self.answer_template = TwimlTemplate(
+            partial(build_answer_response, partial_callback=partial_callback), "ai_response"
+        )
+        self.error_template = TwimlTemplate(build_error_response)
+        self.hold_template = TwimlTemplate(build_hold_response, "redirect_url")
+        self.hold_message_template = TwimlTemplate(build_hold_response, "redirect_url", "message")
+
     def create_voice_response(self, speech_result: str = None, ai_response: str = None) -> str:
-        resp = VoiceResponse()
-
-        try:
-            if not speech_result:
-                resp.say(
-                    "Hello! Welcome to the Metropolia Student Assistant. "
-                    "I can help you with course information, deadlines, and university services. "
-                    "Please ask your question after the beep.",
-                    voice='alice',
-                    language='en-US'
-                )
-
-                gather = Gather(
-                    input='speech',
-                    action='/process_speech',
-                    method='POST',
-                    speech_timeout=3,
-                    speech_model='phone_call',
-                    language='en-US',
-                    enhanced='true'
-                )
-                gather.say("Please speak now.", voice='alice')
-                resp.append(gather)
-
-                resp.say(
-                    "We didn't hear your question. Please call back and try again. Goodbye!",
-                    voice='alice'
-                )
-                resp.hangup()
-            else:
-                if ai_response:
-                    resp.say(ai_response, voice='alice', language='en-US')
-
-                gather = Gather(
-                    input='speech',
-                    action='/process_speech',
-                    method='POST',
-                    speech_timeout=3,
-                    speech_model='phone_call',
-                    language='en-US',
-                    enhanced='true'
-                )
-                gather.say(
-                    "Do you have another question? Please speak now, or hang up to end the call.",
-                    voice='alice'
-                )
-                resp.append(gather)
-
-                resp.say(
-                    "Thank you for calling the Metropolia Student Assistant. Have a great day!",
-                    voice='alice'
-                )
-                resp.hangup()
-
-        except Exception as e:
-            logger.error(f"Error creating voice response: {e}")
-            resp.say(
-                "We're experiencing technical difficulties. Please try again later.",
-                voice='alice'
-            )
-            resp.hangup()
-
-        return str(resp)
+        with metrics.stage("twiml"):
+            try:
+                if not speech_result:
+                    return self.greeting_template.render()
+                return self.answer_template.render(ai_response=ai_response)
+
+            except Exception as e:
+                logger.error(f"Error creating voice response: {e}")
+                return self.error_template.render()
+
+    def create_hold_response(self, redirect_url: str, message: str = None) -> str:
+        with metrics.stage("twiml"):
+            if message:
+                return self.hold_message_template.render(redirect_url=redirect_url, message=message)
+            return self.hold_template.render(redirect_url=redirect_url)
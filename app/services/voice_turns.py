@@ -0,0 +1,142 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, Optional
+
+from app.utils.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceTurn:
+    __slots__ = ("question", "future", "started", "answered", "abandoned")
+
+    def __init__(self, question: str, future, started: float):
+        self.question = question
+        self.future = future
+        self.started = started
+        # Set under the scheduler lock: the answer was stored, or the caller
+        # was given up on and must not find it in the history later
+        self.answered = False
+        self.abandoned = False
+
+
+class VoiceTurnScheduler:
+    # Generates voice answers in the background so a webhook can return before
+    # Twilio's timeout. One turn per call: submit() starts it, wait() returns
+    # the answer if it is ready within the timeout (and then forgets the turn),
+    # otherwise None so the caller can be put on hold and poll again. A job
+    # stores its answer through settle(); once the turn is abandoned it no
+    # longer does.
+    def __init__(self, max_workers: int = 8, result_ttl: float = 120):
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voice-turn")
+        self._lock = threading.Lock()
+        self._turns: Dict[str, VoiceTurn] = {}
+
+        self.histograms = {
+            "generation_seconds": LatencyHistogram(),   # speech received -> answer generated
+            "answer_seconds": LatencyHistogram(),       # speech received -> answer sent to Twilio
+            "response_seconds": LatencyHistogram(),     # duration of each voice webhook
+        }
+        self._stats = {
+            "turns": 0, "answered_in_budget": 0, "held": 0, "polls": 0,
+            "answered_after_hold": 0, "abandoned": 0,
+        }
+
+    def _record(self, event: str):
+        with self._lock:
+            self._stats[event] += 1
+
+    def observe(self, histogram: str, seconds: float):
+        self.histograms[histogram].observe(seconds)
+
+    def submit(self, call_sid: str, question: str, job: Callable[[VoiceTurn], str]) -> VoiceTurn:
+        # job(turn) generates the answer
+        started = time.monotonic()
+
+        def run():
+            try:
+                return job(turn)
+            finally:
+                self.observe("generation_seconds", time.monotonic() - started)
+
+        with self._lock:
+            self._purge(started)
+            turn = self._turns[call_sid] = VoiceTurn(question, None, started)
+            self._stats["turns"] += 1
+        # The job runs in the webhook's context, so its stages land in the same trace
+        turn.future = self._executor.submit(contextvars.copy_context().run, run)
+        return turn
+
+    def _purge(self, now: float):
+        # Caller holds self._lock; turns nobody came back for (caller hung up)
+        for call_sid, turn in list(self._turns.items()):
+            if now - turn.started > self.result_ttl:
+                del self._turns[call_sid]
+                turn.abandoned = True
+                self._stats["abandoned"] += 1
+
+    def wait(self, call_sid: str, timeout: float, polled: bool = False) -> Optional[str]:
+        with self._lock:
+            turn = self._turns.get(call_sid)
+            if polled:
+                self._stats["polls"] += 1
+        if turn is None or turn.future is None:
+            return None
+        try:
+            answer = turn.future.result(timeout=max(timeout, 0))
+        except TimeoutError:
+            if not polled:
+                self._record("held")
+            return None
+
+        with self._lock:
+            if self._turns.get(call_sid) is turn:
+                del self._turns[call_sid]
+            self._stats["answered_after_hold" if polled else "answered_in_budget"] += 1
+        self.observe("answer_seconds", time.monotonic() - turn.started)
+        return answer
+
+    def pending(self, call_sid: str) -> Optional[VoiceTurn]:
+        with self._lock:
+            return self._turns.get(call_sid)
+
+    def settle(self, turn: VoiceTurn, store: Callable[[], None]) -> bool:
+        # Runs store() for the turn's answer unless the turn was abandoned
+        with self._lock:
+            if turn.abandoned:
+                return False
+            store()
+            turn.answered = True
+            return True
+
+    def abandon(self, call_sid: str, store: Callable[[], None] = None) -> Optional[str]:
+        # Gives up on the call's turn: its answer will not be stored, and
+        # store() records what the caller was told instead. If the answer was
+        # stored first, it is returned and nothing else is stored.
+        with self._lock:
+            turn = self._turns.pop(call_sid, None)
+            if turn is None:
+                return None
+            if not turn.answered:
+                turn.abandoned = True
+                self._stats["abandoned"] += 1
+                if store is not None:
+                    store()
+                return None
+        return turn.future.result()
+
+    def discard(self, call_sid: str):
+        self.abandon(call_sid)
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._turns)
+        for name, histogram in self.histograms.items():
+            stats[name] = histogram.snapshot()
+        return stats
@@ -1,78 +1,163 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urlparse
 import time
 
+from app.services.html_extractor import LxmlExtractor
+from app.services.http_cache import HTTPCache
+from app.utils.metrics import metrics
+from app.utils.rate_limit import TokenBucket
+
 logger = logging.getLogger(__name__)
 
 
 class WebScraper:
-    def __init__(self):
+    def __init__(self, max_workers: int = 8, per_host_concurrency: int = 2,
+                 requests_per_second: float = 2.0, request_timeout: float = 10,
+                 deadline: float = 60, cache: HTTPCache = None, cache_fresh_seconds: float = 0,
+                 extractor=None):
+        self.extractor = extractor or LxmlExtractor()
+        self.cache = cache
+        self.cache_fresh_seconds = cache_fresh_seconds
+        self.max_workers = max_workers
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.request_timeout = request_timeout
+        self.deadline = deadline
+
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
-
-    def scrape_url(self, url: str, max_length: int = 10000) -> str:
+        # Keep enough pooled keep-alive connections for every worker thread
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._hosts_lock = threading.Lock()
+        self._host_slots = {}
+        self._host_buckets = {}
+
+    def _host_limits(self, url: str):
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+                self._host_buckets[host] = TokenBucket(self.requests_per_second, self.per_host_concurrency)
+            return self._host_slots[host], self._host_buckets[host]
+
+    def scrape_url(self, url: str, max_length: int = 10000, timeout: float = 10) -> str:
         try:
             parsed = urlparse(url)
             if not parsed.scheme or not parsed.netloc:
                 return f"Invalid URL: {url}"
 
-            print(f"Scraping URL: {url}")
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for script in soup(["script", "style", "nav", "header", "footer"]):
-                script.decompose()
-            text_parts = []
-            content_selectors = [
-                'main', 'article', '.content', '.main-content',
-                '#content', '#main', '.post-content', '.entry-content'
-            ]
-
-            main_content = None
-            for selector in content_selectors:
-                main_content = soup.select_one(selector)
-                if main_content:
-                    break
-
-            content_element = main_content if main_content else soup.find('body')
-
-            if content_element:
-                text_elements = content_element.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'td'])
-
-                for element in text_elements:
-                    text = element.get_text().strip()
-                    if text and len(text) > 10:
-                        text_parts.append(text)
-
-            if not text_parts:
-                text = soup.get_text()
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text_parts = [chunk for chunk in chunks if chunk and len(chunk) > 10]
-
-            combined_text = "\n".join(text_parts)
+            logger.debug("Scraping URL: %s", url)
+            with metrics.stage("scrape"):
+                combined_text = self._fetch_text(url, timeout)
             if len(combined_text) > max_length:
                 combined_text = combined_text[:max_length] + "..."
 
-            print(f"Scraped {len(combined_text)} characters from {url}")
+            logger.info("Scraped %s characters from %s", len(combined_text), url)
+            metrics.inc("assistant_scraped_pages_total", result="ok")
+            metrics.inc("assistant_scraped_chars_total", len(combined_text))
             return combined_text
 
         except Exception as e:
-            logger.error(f"Web scraping failed for {url}: {e}")
+            logger.error("Web scraping failed for %s: %s", url, e)
+            metrics.inc("assistant_scraped_pages_total", result="error")
             return f"Could not retrieve content from {url}: {str(e)}"
 
-    def scrape_multiple_urls(self, urls: list, max_length: int = 15000) -> str:
-        all_content = []
+    def _fetch_text(self, url: str, timeout: float) -> str:
+        cached = self.cache.get(url) if self.cache else None
+        if cached and time.time() - cached.fetched_at < self.cache_fresh_seconds:
+            self.cache.record("hits")
+            return self._cached_text(url, cached)
+
+        # Revalidate what we already have; a 304 reuses the stored page
+        headers = {}
+        if cached and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached and cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            response = self.session.get(url, timeout=timeout, headers=headers)
+            if cached and response.status_code == 304:
+                self.cache.touch(url)
+                self.cache.record("revalidated")
+                return self._cached_text(url, cached)
+            response.raise_for_status()
+        except Exception:
+            if self.cache:
+                self.cache.record("errors")
+            raise
+
+        text = self.extract_text(response.content)
+        if self.cache:
+            self.cache.record("misses")
+            self.cache.put(
+                url,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                response.content,
+                text,
+                self.extractor.name
+            )
+        return text
+
+    def _cached_text(self, url: str, cached) -> str:
+        # Text from another extractor is redone from the stored body
+        if cached.extractor == self.extractor.name:
+            return cached.text
+        text = self.extract_text(cached.body)
+        self.cache.retext(url, text, self.extractor.name)
+        self.cache.record("reextracted")
+        return text
+
+    def extract_text(self, content: bytes) -> str:
+        return "\n".join(self.extractor.extract(content))
+
+    def _polite_scrape(self, url: str, max_length: int, deadline: float) -> str:
+        slots, bucket = self._host_limits(url)
+        if not slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            return f"Could not retrieve content from {url}: deadline exceeded"
+        try:
+            if not bucket.acquire(deadline):
+                return f"Could not retrieve content from {url}: deadline exceeded"
+            remaining = deadline - time.monotonic()
+            return self.scrape_url(url, max_length, timeout=min(self.request_timeout, max(remaining, 0.1)))
+        finally:
+            slots.release()
+
+    def scrape_multiple_urls(self, urls: list, max_length: int = 15000, deadline: float = None) -> str:
+        if not urls:
+            return "No web content available."
+
+        # Fetch concurrently; politeness comes from per-host concurrency slots
+        # and token buckets instead of a fixed sleep after every request.
+        deadline = time.monotonic() + (deadline or self.deadline)
+        per_url_length = max_length // len(urls)
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls)))
+        try:
+            futures = [
+                executor.submit(self._polite_scrape, url, per_url_length, deadline)
+                for url in urls
+            ]
+            wait(futures, timeout=max(deadline - time.monotonic(), 0))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        for url in urls:
-            content = self.scrape_url(url, max_length // len(urls))
+        all_content = []
+        for url, future in zip(urls, futures):
+            if not future.done():
+                logger.warning("Scraping %s did not finish before the deadline", url)
+                continue
+            content = future.result()
             if content and not content.startswith("Could not retrieve"):
                 all_content.append(f"Content from {url}:\n{content}")
 
-            time.sleep(1)
-
-        return "\n\n".join(all_content) if all_content else "No web content available."
\ No newline at end of file
+        return "\n\n".join(all_content) if all_content else "No web content available."
@@ -1,3 +1,5 @@
-from .helper import setup_logging, build_messages
+from .helper import (setup_logging, build_messages, get_latest_user_message, is_standalone_question,
+                     get_retrieval_prompt, url_list_error)
 
-__all__ = ['setup_logging', 'build_messages']
\ No newline at end of file
+__all__ = ['setup_logging', 'build_messages', 'get_latest_user_message', 'is_standalone_question',
+           'get_retrieval_prompt', 'url_list_error']
\ No newline at end of file
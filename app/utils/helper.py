@@ -1,4 +1,6 @@
 import logging
+from typing import Optional
+from urllib.parse import urlparse
 
 def setup_logging():
     logging.basicConfig(
@@ -18,3 +20,42 @@ def get_system_prompt(pdf_context: str) -> str:
         "Keep voice responses concise.\n\n"
         f"Manual Content:\n{pdf_context}"
     )
+
+def get_latest_user_message(conversation_history: list) -> str:
+    for message in reversed(conversation_history):
+        if message.get("role") == "user":
+            return message.get("content", "")
+    return ""
+
+# Only a session's first question is answered independently of earlier turns.
+# Decided from the number of stored messages including the question, not from
+# the prompt: its token window can drop a long previous answer.
+def is_standalone_question(stored_messages: int) -> bool:
+    return stored_messages == 1
+
+def get_retrieval_prompt(chunks: list, closing: str) -> str:
+    knowledge = "\n\n".join(f"[{chunk.source}]\n{chunk.text}" for chunk in chunks)
+    return (
+        "You are a Student Assistant AI for Metropolia University. Use the information below "
+        "from both the PDF manual and official websites to answer questions accurately. "
+        "If the answer is not found in the provided information, politely say so and suggest "
+        "checking the official Metropolia website.\n\n"
+        "RELEVANT KNOWLEDGE:\n"
+        f"{knowledge or 'No matching information found.'}\n\n"
+        f"{closing}"
+    )
+
+# Why a /update-websites urls list is rejected, or None when every entry is an
+# absolute http(s) URL
+def url_list_error(urls) -> Optional[str]:
+    if not isinstance(urls, list):
+        return "urls must be a list"
+    if not urls:
+        return "urls must not be empty"
+    for url in urls:
+        if not isinstance(url, str):
+            return "urls must be strings"
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            return f"Not an http(s) URL: {url}"
+    return None
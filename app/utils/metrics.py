@@ -0,0 +1,225 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+# Request stages range from microseconds (history fetch) to seconds (Gemini)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Prompt and response sizes in characters
+SIZE_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000)
+
+
+class Histogram:
+    # Fixed upper-bound buckets (cumulative, as Prometheus expects); quantiles
+    # are estimated as the upper bound of the bucket they fall in.
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def _quantile(self, counts, total: int, q: float) -> float:
+        rank, seen = q * total, 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts, total_value = list(self._counts), self._sum
+        total = sum(counts)
+        cumulative, seen = {}, 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            cumulative[str(bound)] = seen
+        cumulative["+Inf"] = total
+        snapshot = {"count": total, "sum": round(total_value, 6), "buckets": cumulative}
+        if total:
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                snapshot[name] = self._quantile(counts, total, q)
+        return snapshot
+
+
+class LatencyHistogram(Histogram):
+    # Seconds, with buckets sized for whole webhook and generation latencies
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(buckets)
+
+
+class RequestTrace:
+    # Stage timings and counters of one sampled request, logged as one line
+    __slots__ = ("stages", "counters")
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = round(self.stages.get(name, 0) + seconds * 1000, 3)
+
+    def add_count(self, name: str, value: float):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        return {"stages_ms": self.stages, "counters": self.counters}
+
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def format_labels(labels: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(str(value))}"' for name, value in labels]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_histogram(name: str, snapshot: dict, labels: tuple = ()) -> list:
+    lines = []
+    for bound, count in snapshot["buckets"].items():
+        le = f'le="{bound}"'
+        lines.append(f"{name}_bucket{format_labels(labels, le)} {count}")
+    lines.append(f"{name}_sum{format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+    return lines
+
+
+def render_stats(prefix: str, stats: dict, gauges=()) -> list:
+    # Numeric fields of a service's stats dict. Most only ever grow and are
+    # exported as counters with a _total suffix; the live values named in
+    # `gauges` (sizes, states, ratios, high-water marks) as gauges.
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if key in gauges:
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value}")
+        else:
+            lines.append(f"# TYPE {prefix}_{key}_total counter")
+            lines.append(f"{prefix}_{key}_total {value}")
+    return lines
+
+
+class Metrics:
+    # Process-wide counters and histograms, rendered in the Prometheus text
+    # format by /metrics. Everything observed while a sampled request is
+    # being handled also goes to that request's trace.
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, Histogram] = {}
+        # Stage name -> its assistant_stage_seconds histogram
+        self._stages: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        # Call sites always pass their labels in the same order
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add_count(trace_name(name, labels), value)
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = STAGE_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        self.histogram(name, buckets, **labels).observe(value)
+
+    def histogram(self, name: str, buckets: Sequence[float] = STAGE_BUCKETS, **labels) -> Histogram:
+        key = (name, tuple(labels.items()))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def stage(self, name: str) -> "Stage":
+        # Times one stage of a request: history, prompt, model, twiml, scrape
+        if not self.enabled:
+            return NO_STAGE
+        histogram = self._stages.get(name)
+        if histogram is None:
+            histogram = self._stages[name] = self.histogram("assistant_stage_seconds", stage=name)
+        return Stage(histogram, name)
+
+    def render(self) -> list:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            lines.extend(render_histogram(name, histogram.snapshot(), labels))
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._stages.clear()
+
+
+class Stage:
+    __slots__ = ("histogram", "name", "started")
+
+    def __init__(self, histogram: Histogram, name: str):
+        self.histogram = histogram
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        self.histogram.observe(seconds)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add_stage(self.name, seconds)
+
+
+class NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NO_STAGE = NoStage()
+
+
+def trace_name(name: str, labels: dict) -> str:
+    # assistant_gemini_tokens_total{kind="output"} -> gemini_tokens_total.output
+    name = name.replace("assistant_", "", 1)
+    return ".".join([name, *map(str, labels.values())])
+
+
+metrics = Metrics()
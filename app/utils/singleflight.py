@@ -0,0 +1,66 @@
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+
+class Flight:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first caller
+    # runs fn, the others wait for it and get its result or its exception.
+    # A follower gives up with TimeoutError after `timeout` seconds. Nothing is
+    # kept once the call returns, so later calls run again.
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Flight] = {}
+        self._stats = {"calls": 0, "coalesced": 0, "errors": 0, "timeouts": 0, "max_followers": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                self._stats["calls"] += 1
+                leader = True
+            else:
+                flight.followers += 1
+                self._stats["coalesced"] += 1
+                self._stats["max_followers"] = max(self._stats["max_followers"], flight.followers)
+                leader = False
+
+        if leader:
+            try:
+                flight.result = fn()
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+
+        if not flight.done.wait(self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"Shared call did not finish within {self.timeout} s")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        return stats
@@ -0,0 +1,35 @@
+import re
+
+LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+EMPHASIS = re.compile(r"\*\*|\*|__|`")
+# Headings and list markers at the start of a line, e.g. "## ", "- ", "- 2. "
+BLOCK_MARKERS = re.compile(r"^[ \t]*(?:#+[ \t]*|(?:[-•]|\d+[.)])(?:[ \t]+|$))+", re.MULTILINE)
+WHITESPACE = re.compile(r"\s+")
+# End of a sentence: terminal punctuation followed by whitespace or the end
+SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+def clean_for_speech(text: str) -> str:
+    # Markdown means nothing to a caller: keep link labels, drop emphasis,
+    # headings and list markers, and read the lines as one paragraph, ending
+    # headings and list items with a full stop so the voice pauses there.
+    text = LINK.sub(r"\1", text)
+    text = BLOCK_MARKERS.sub("", EMPHASIS.sub("", text))
+    lines = [WHITESPACE.sub(" ", line).strip() for line in text.splitlines()]
+    return " ".join(line if line[-1] in ".!?:;," else line + "." for line in lines if line)
+
+
+def trim_to_sentences(text: str, max_chars: int, complete: bool = True) -> str:
+    # Cuts at the last sentence end within max_chars. When generation stopped
+    # at the token limit (complete=False) a trailing fragment is dropped too.
+    if len(text) <= max_chars and complete:
+        return text
+    window = text[:max_chars]
+    ends = [match.end() for match in SENTENCE_END.finditer(window)]
+    if ends:
+        return window[:ends[-1]]
+    if len(text) <= max_chars:
+        return text
+    # A single sentence longer than the limit: cut at a word boundary
+    cut = window[:max_chars - 3].rsplit(" ", 1)[0]
+    return cut.rstrip(",;:") + "..."
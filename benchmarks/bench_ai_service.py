@@ -0,0 +1,86 @@
+"""Per-request CPU time and allocations of AIService over long conversations.
+
+Compares the old path (flatten the history into one "ROLE: content" string
+with += and build a new GenerativeModel per call) with the current one
+(cached model per system instruction, structured contents), and with the
+current one handing the SDK plain dict contents instead of prebuilt turns. Real
+GenerativeModel objects are constructed and the real protobuf request is
+built for every call; only the network round trip is stubbed.
+
+Run from the repository root:  python -m benchmarks.bench_ai_service
+"""
+import argparse
+import time
+import tracemalloc
+
+import google.generativeai as genai
+
+from app.services.ai_service import AIService
+from benchmarks.stubs import FakeResponse
+
+
+class OfflineModel(genai.GenerativeModel):
+    def generate_content(self, contents, **kwargs):
+        self._prepare_request(contents=contents, tools=None, tool_config=None)
+        return FakeResponse("ok")
+
+
+class PlainContentsAIService(AIService):
+    # The SDK converts every dict turn to a protos.Content on each request
+    def to_protos(self, contents: list) -> list:
+        return contents
+
+
+def legacy_generate(model_name: str, messages: list) -> str:
+    dialog_text = ""
+    for m in messages:
+        dialog_text += f"{m['role'].upper()}: {m['content']}\n\n"
+    model = OfflineModel(model_name)
+    return model.generate_content(dialog_text).text.strip()
+
+
+def conversation(turns: int, system_prompt: str) -> list:
+    messages = [{"role": "system", "content": system_prompt}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i}: how do I register for course number {i}?"})
+        messages.append({"role": "assistant", "content": f"Answer {i}: register in OMA during the registration period. " * 4})
+    messages.append({"role": "user", "content": "And when does the next period start?"})
+    return messages
+
+
+def measure(label: str, call, repeat: int):
+    call()  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    elapsed = (time.perf_counter() - started) / repeat
+
+    # Allocations are traced separately so tracing does not skew the timing
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:34} {elapsed * 1e6:10.1f} us/request   peak alloc {(peak - before) / 1024:8.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--prompt-chars", type=int, default=20000, help="size of the system prompt")
+    args = parser.parse_args()
+
+    system_prompt = ("Metropolia manual text. " * (args.prompt_chars // 24 + 1))[:args.prompt_chars]
+    messages = conversation(args.turns, system_prompt)
+    service = AIService("", "gemini-1.5-flash", model_factory=OfflineModel)
+    plain = PlainContentsAIService("", "gemini-1.5-flash", model_factory=OfflineModel)
+
+    print(f"{args.turns}-turn conversation, {args.prompt_chars}-character system prompt")
+    measure("legacy (string concat, new model)", lambda: legacy_generate("gemini-1.5-flash", messages), args.repeat)
+    measure("cached model + dict contents", lambda: plain.generate_response(messages), args.repeat)
+    measure("cached model + contents", lambda: service.generate_response(messages), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Hit rate and latency of /chat with the answer cache for repeated questions.
+
+Sends a stream of first questions drawn from a small pool of FAQs, written in a
+few variants each (case, punctuation, small rewordings), to a fake Gemini model.
+Then checks golden question pairs against the near-duplicate lookup: pairs
+that ask different things ("EU" and "non-EU" students) must never share an
+answer, however close their trigrams are.
+
+Run from the repository root:  python -m benchmarks.bench_answer_cache
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.stubs import fake_model_factory, offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+from app.services.ai_service import AIService  # noqa: E402
+from app.services.answer_cache import AnswerCache, normalize_question  # noqa: E402
+from app.services.voice_prefetch import similarity  # noqa: E402
+
+QUESTIONS = [
+    ["Which campuses does Metropolia have?", "which campuses does metropolia have",
+     "Which campuses does Metropolia have??", "Which campuses does Metropolia have"],
+    ["How do I get a certificate of enrolment?", "how do i get a certificate of enrolment",
+     "How do I get a certificate of enrollment?"],
+    ["Where can I find my timetable?", "Where can i find my timetable", "where can I find my time table?"],
+    ["When does the autumn semester start?", "When does autumn semester start?"],
+    ["How do I register for a course?", "How do I register for courses?", "how to register for a course"],
+]
+
+# (cached question, new question, may they share an answer?)
+GOLDEN_PAIRS = [
+    ("How much are the tuition fees for EU students?", "How much are the tuition fees for non-EU students?", False),
+    ("When is the application deadline for the autumn intake?",
+     "When is the application deadline for the spring intake?", False),
+    ("Is attendance compulsory?", "Is attendance not compulsory?", False),
+    ("Can I take the exam online?", "Can I not take the exam online?", False),
+    ("How do I get a certificate of enrolment?", "How do I get a certificate of enrollment?", True),
+    ("Where can I find my timetable?", "where can I find my time table?", True),
+    ("How do I register for a course?", "How do I register for courses?", True),
+    ("When does the autumn semester start?", "When does autumn semester start?", True),
+]
+
+
+class StaticPDFService:
+    def extract_text(self) -> str:
+        return "Metropolia has four campuses: Arabia, Karamalmi, Myllypuro and Myyrmäki."
+
+
+def run(requests: int, latency: float, enabled: bool, seed: int):
+    app = create_app()
+    app.config["TESTING"] = True
+    services = app.extensions["services"]
+    model_factory = fake_model_factory(latency=latency, token_delay=0)
+    services.override("ai_service", AIService("", model_factory=model_factory))
+    services.override("pdf_service", StaticPDFService())
+    services.knowledge.update_websites([])
+
+    from app.config import config
+    config.ANSWER_CACHE_ENABLED = enabled
+    client = app.test_client()
+    rng = random.Random(seed)
+
+    latencies = []
+    for i in range(requests):
+        question = rng.choice(rng.choice(QUESTIONS))
+        started = time.perf_counter()
+        client.post("/chat", json={"message": question, "session_id": f"bench_{i}"})
+        latencies.append(time.perf_counter() - started)
+    return latencies, services.answer_cache.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--similarity", type=float, default=0.9, help="ANSWER_CACHE_SIMILARITY")
+    args = parser.parse_args()
+
+    config.ANSWER_CACHE_SIMILARITY = args.similarity
+    for enabled in (False, True):
+        latencies, stats = run(args.requests, args.latency, enabled, args.seed)
+        ms = lambda q: statistics.quantiles(latencies, n=100)[q - 1] * 1000
+        label = "cache on " if enabled else "cache off"
+        print(f"{label}: p50 {ms(50):7.2f} ms  p95 {ms(95):7.2f} ms  total {sum(latencies):6.2f} s")
+        if enabled:
+            print(f"           hits {stats['hits']}, near hits {stats['near_hits']}, "
+                  f"misses {stats['misses']}, hit rate {stats['hit_rate']:.0%}")
+
+    print(f"\ngolden pairs at ANSWER_CACHE_SIMILARITY={args.similarity}:")
+    wrong = missed = 0
+    for cached, asked, same in GOLDEN_PAIRS:
+        cache = AnswerCache(max_entries=8, similarity_threshold=args.similarity)
+        cache.put("chat", 1, cached, "answer")
+        shared = cache.get("chat", 1, asked) is not None
+        # Sharing a different question's answer is wrong; missing a rewording only costs a Gemini call
+        verdict = "WRONG" if shared and not same else "miss " if same and not shared else "ok   "
+        wrong += shared and not same
+        missed += same and not shared
+        score = similarity(normalize_question(cached), normalize_question(asked))
+        print(f"  {verdict} trigram {score:.3f} {'shared' if shared else 'kept apart':10s} {cached!r} / {asked!r}")
+    print(f"  {wrong} different questions shared an answer, {missed} rewordings missed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Request coalescing: a burst of identical first questions against a slow model.
+
+Sends --burst concurrent /chat requests (separate sessions, same question)
+and then the same burst to /process_speech, with coalescing off and on, and
+counts the Gemini calls the slow fake model received. The answer cache is
+disabled: it only helps once the first answer has been stored, while the
+burst arrives before that. Two more bursts check that a failing call fails
+every request that shared it (each gets the fallback reply) and that requests
+joining a call give up after GEMINI_COALESCE_TIMEOUT. VOICE_WORKERS is raised
+to the burst size so the whole voice burst is in flight at once.
+
+The coalesced bursts are checked, and so is SingleFlight on its own: one
+call per burst, every follower gets the leader's answer or the leader's
+exception, and a follower that waits past the timeout gets TimeoutError.
+The script exits non-zero if a check fails.
+
+Run from the repository root:  python -m benchmarks.bench_coalescing
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+
+from benchmarks.stubs import offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+from app.services.ai_service import ERROR_RESPONSE, AIService  # noqa: E402
+from app.utils.singleflight import SingleFlight  # noqa: E402
+from benchmarks.stubs import FakeModel  # noqa: E402
+
+QUESTION = "When is the application deadline for the autumn intake?"
+
+
+class CountingModel(FakeModel):
+    calls = 0
+    lock = threading.Lock()
+    fail = False
+
+    def generate_content(self, contents, **kwargs):
+        with CountingModel.lock:
+            CountingModel.calls += 1
+        if CountingModel.fail:
+            time.sleep(self.latency)
+            raise RuntimeError("503 The model is overloaded")
+        return super().generate_content(contents, **kwargs)
+
+
+def check(failures: list, name: str, ok: bool, detail: str = ""):
+    print(f"  {'ok' if ok else 'FAILED':6s} {name}" + (f" ({detail})" if detail and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def check_single_flight(failures: list, size: int = 20, latency: float = 0.2):
+    # SingleFlight on its own: one execution per burst, shared result and error
+    flights = SingleFlight()
+    runs = []
+    barrier = threading.Barrier(size)
+    results = [None] * size
+
+    def call(i: int, fn):
+        barrier.wait()
+        try:
+            results[i] = flights.do("question", fn)
+        except Exception as e:
+            results[i] = e
+
+    def answer():
+        runs.append(1)
+        time.sleep(latency)
+        return object()
+
+    error = RuntimeError("503 The model is overloaded")
+
+    def fail():
+        runs.append(1)
+        time.sleep(latency)
+        raise error
+
+    for fn in (answer, fail):
+        runs.clear()
+        threads = [threading.Thread(target=call, args=(i, fn)) for i in range(size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        check(failures, f"SingleFlight {fn.__name__}: one execution for {size} callers", len(runs) == 1,
+              f"{len(runs)} executions")
+        check(failures, f"SingleFlight {fn.__name__}: every caller gets the leader's "
+                        f"{'answer' if fn is answer else 'exception'}",
+              all(result is results[0] for result in results) and (results[0] is error) == (fn is fail))
+
+    flights = SingleFlight(timeout=latency / 4)
+    leader_started = threading.Event()
+
+    def slow():
+        leader_started.set()
+        time.sleep(latency)
+        return "answer"
+
+    leader = threading.Thread(target=flights.do, args=("question", slow))
+    leader.start()
+    leader_started.wait()
+    started = time.perf_counter()
+    try:
+        flights.do("question", slow)
+        outcome = None
+    except TimeoutError as e:
+        outcome = e
+    waited = time.perf_counter() - started
+    leader.join()
+    check(failures, "SingleFlight follower past the timeout gets TimeoutError",
+          isinstance(outcome, TimeoutError) and waited < latency, f"{outcome!r} after {waited:.2f} s")
+
+
+def burst(services, client, size: int, endpoint: str, tag: str) -> tuple:
+    # Returns each request's answer (the reply stored in its conversation) and
+    # the slowest time to an answer, following holds on the voice channel
+    barrier = threading.Barrier(size)
+    answers, latencies = [None] * size, [0.0] * size
+
+    def send(i: int):
+        session_id = f"{tag}-{i}"
+        barrier.wait()
+        started = time.perf_counter()
+        if endpoint == "/chat":
+            client.post("/chat", json={"message": QUESTION, "session_id": session_id})
+        else:
+            body = client.post("/process_speech", data={"CallSid": session_id, "SpeechResult": QUESTION})
+            if "<Redirect" in body.get_data(as_text=True):
+                services.voice_turns.wait(session_id, 60, polled=True)
+        latencies[i] = time.perf_counter() - started
+        answers[i] = services.conversation_store.get_messages(session_id)[-1]["content"]
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(size)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return answers, max(latencies)
+
+
+def run(services, client, args, endpoint: str, coalesce: bool, timeout: float = None, fail: bool = False):
+    ai_service = AIService("", model_factory=lambda name, **kwargs: CountingModel(
+        name, latency=args.latency, token_delay=0, **kwargs
+    ), coalesce=coalesce, coalesce_timeout=timeout)
+    services.override("ai_service", ai_service)
+    CountingModel.calls, CountingModel.fail = 0, fail
+    answers, slowest = burst(services, client, args.burst, endpoint, f"{endpoint}-{coalesce}-{fail}-{timeout}")
+    return CountingModel.calls, answers, slowest, ai_service.coalescer.stats if coalesce else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per Gemini call")
+    args = parser.parse_args()
+
+    config.ANSWER_CACHE_ENABLED = False
+    # A smaller pool answers the burst in waves, and each wave makes its own call
+    config.VOICE_WORKERS = max(config.VOICE_WORKERS, args.burst)
+    app = create_app()
+    services = app.extensions["services"]
+    services.knowledge._publish("Applications for the autumn intake close on 20 January. " * 50, "Website.")
+    client = app.test_client()
+    logging.disable(logging.CRITICAL)
+
+    failures = []
+    print(f"{args.burst} concurrent identical questions, model latency {args.latency:.1f} s\n")
+    for endpoint in ("/chat", "/process_speech"):
+        for coalesce in (False, True):
+            calls, answers, slowest, stats = run(services, client, args, endpoint, coalesce)
+            label = f"{endpoint} coalescing {'on' if coalesce else 'off'}"
+            extra = f", {stats['coalesced']} coalesced, max {stats['max_followers']} followers" if stats else ""
+            print(f"{label:34s} {calls:4d} Gemini calls, {len(set(answers))} distinct replies, "
+                  f"last answer after {slowest:.2f} s{extra}")
+            if coalesce:
+                check(failures, f"{endpoint}: one Gemini call for the burst", calls == 1, f"{calls} calls")
+                check(failures, f"{endpoint}: every request gets the leader's answer",
+                      len(set(answers)) == 1 and answers[0] != ERROR_RESPONSE, f"{set(answers)}")
+
+    calls, answers, _, stats = run(services, client, args, "/chat", True, fail=True)
+    print(f"\nfailing model: {calls} Gemini call, {len(set(answers))} distinct reply (the fallback), "
+          f"{stats['errors']} error shared by {stats['coalesced'] + 1} requests")
+    check(failures, "failing model: one Gemini call", calls == 1, f"{calls} calls")
+    check(failures, "failing model: every request gets the fallback reply",
+          all(answer == ERROR_RESPONSE for answer in answers))
+    timeout = args.latency / 4
+    calls, answers, slowest, stats = run(services, client, args, "/chat", True, timeout=timeout)
+    print(f"GEMINI_COALESCE_TIMEOUT={timeout:.2f} s: {calls} Gemini call, "
+          f"{stats['timeouts']} requests gave up waiting, {len(set(answers))} distinct replies")
+    check(failures, "timeout: every follower gives up", stats["timeouts"] == args.burst - 1,
+          f"{stats['timeouts']} of {args.burst - 1}")
+
+    print("\nSingleFlight")
+    check_single_flight(failures)
+    if failures:
+        print(f"{len(failures)} check(s) FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Gemini context caching of the static knowledge prefix, against a local stub.
+
+Walks through the cache lifecycle (create, reuse, renew before expiry,
+rebuild on new knowledge, fall back when caching fails) and reports the
+prompt tokens saved per request. Creating a cache takes --create-latency
+seconds; the requests sent meanwhile report how long they took, since they
+must not wait for it.
+
+Run from the repository root:  python -m benchmarks.bench_context_cache
+"""
+import argparse
+import time
+
+from app.config import config
+from app.services.ai_service import AIService
+from app.services.context_cache import ContextCache
+from app.services.knowledge import KnowledgeSnapshot
+from app.services.pdf_service import PDFService
+from app.services.prompt import PromptAssembler
+from benchmarks.stubs import FakeCachedContent, FakeCachedModel, fake_model_factory
+
+
+class FullPromptConfig:
+    RAG_ENABLED = False
+    RAG_TOP_K = config.RAG_TOP_K
+
+
+prompts = PromptAssembler(FullPromptConfig)
+
+
+def ask(service: AIService, snapshot: KnowledgeSnapshot, question: str) -> str:
+    messages = prompts.build_messages(snapshot, "chat", [{"role": "user", "content": question}])
+    return service.generate_response(messages)
+
+
+def wait_for_jobs(context_cache: ContextCache):
+    context_cache._jobs.submit(lambda: None).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--ttl", type=float, default=1.0, help="cache TTL in seconds (short to show renewal)")
+    parser.add_argument("--create-latency", type=float, default=0.2, help="seconds to create a cached content")
+    args = parser.parse_args()
+    FakeCachedContent.latency = args.create_latency
+
+    pdf_text = PDFService(config.PDF_PATH).extract_text()
+    snapshot = KnowledgeSnapshot(1, pdf_text, "Website text v1", None)
+
+    context_cache = ContextCache(
+        "gemini-test", ttl=args.ttl, renew_margin=args.ttl / 2, retry_after=60,
+        cached_content_cls=FakeCachedContent,
+        model_from_cache=lambda handle: FakeCachedModel(handle, latency=0, token_delay=0)
+    )
+    service = AIService("", "gemini-test", model_factory=fake_model_factory(latency=0, token_delay=0),
+                        context_cache=context_cache)
+
+    started = time.perf_counter()
+    ask(service, snapshot, "First question")
+    waits = [time.perf_counter() - started]
+    while context_cache.stats["created"] == 0:
+        time.sleep(0.01)
+        started = time.perf_counter()
+        ask(service, snapshot, "Question while the cache is created")
+        waits.append(time.perf_counter() - started)
+    print(f"while creating:     {len(waits)} requests sent the full prompt, slowest took "
+          f"{max(waits) * 1000:.1f} ms (creation takes {args.create_latency * 1000:.0f} ms)")
+
+    for i in range(args.requests):
+        ask(service, snapshot, f"Question {i}")
+    print("steady state:      ", context_cache.stats)
+
+    time.sleep(args.ttl * 0.6)
+    ask(service, snapshot, "Question after most of the TTL")
+    wait_for_jobs(context_cache)
+    print("after renewal:     ", context_cache.stats)
+
+    updated = KnowledgeSnapshot(2, pdf_text, "Website text v2", None)
+    ask(service, updated, "Question after /update-websites")
+    wait_for_jobs(context_cache)
+    ask(service, updated, "Question after the new cache is ready")
+    print("after new content: ", context_cache.stats, "old handle deleted:", FakeCachedContent.created[0].deleted)
+
+    FakeCachedContent.fail = True
+    failing = KnowledgeSnapshot(3, pdf_text, "Website text v3", None)
+    ask(service, failing, "Question while caching fails")
+    wait_for_jobs(context_cache)
+    reply = ask(service, failing, "Question after caching failed")
+    print("fallback reply:    ", repr(reply[:40]), context_cache.stats["failures"], "failure(s)")
+
+    full_tokens = len(snapshot.full_prompt) // 4
+    print(f"\nfull prompt ~{full_tokens} tokens; "
+          f"saved {context_cache.stats['tokens_saved_per_request']:.0f} prompt tokens per cached request")
+
+
+if __name__ == "__main__":
+    main()
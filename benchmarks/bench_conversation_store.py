@@ -0,0 +1,66 @@
+"""Memory of ConversationStore while many sessions come and go.
+
+Creates sessions that each exchange a few messages and never end, like web
+users who close the tab. Traced memory should level off once the session cap
+is reached instead of growing with the number of sessions.
+
+Run from the repository root:  python -m benchmarks.bench_conversation_store
+"""
+import argparse
+import threading
+import time
+import tracemalloc
+
+from app.models import ConversationStore, MemoryBackend
+
+QUESTION = "How do I apply for a student card and where can I pick it up on campus? " * 2
+ANSWER = "You can order the student card online and collect it from the campus service desk. " * 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=3, help="question/answer pairs per session")
+    parser.add_argument("--max-sessions", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    store = ConversationStore(MemoryBackend(max_sessions=args.max_sessions), max_turns=4)
+    per_thread = args.sessions // args.threads
+    samples = []
+
+    def worker(index: int):
+        for i in range(per_thread):
+            session_id = f"web_{index}_{i}"
+            for _ in range(args.turns):
+                store.add_message(session_id, "user", QUESTION)
+                store.get_messages(session_id)
+                store.add_message(session_id, "assistant", ANSWER)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(0.25)
+        samples.append((store.stats["sessions"], tracemalloc.get_traced_memory()[0]))
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = store.stats
+    total = per_thread * args.threads
+    print(f"{total} sessions, {total * args.turns * 2} messages in {elapsed:.1f} s "
+          f"({total * args.turns * 2 / elapsed:,.0f} messages/s, {args.threads} threads)")
+    step = max(1, len(samples) // 8)
+    for sessions, traced in samples[::step]:
+        print(f"  live sessions {sessions:6d}   traced memory {traced / 2**20:7.1f} MiB")
+    print(f"final traced memory {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB")
+    print(f"high-water sessions {stats['high_water_sessions']}, stored characters "
+          f"{stats['stored_chars']:,} (high water {stats['high_water_chars']:,})")
+    print(f"LRU evictions {stats['lru_evictions']}, trimmed messages {stats['trimmed_messages']}")
+
+
+if __name__ == "__main__":
+    main()
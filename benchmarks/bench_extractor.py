@@ -0,0 +1,86 @@
+"""HTML-to-text extractors: golden-output check and microbenchmark.
+
+Every extractor must reproduce benchmarks/fixtures/html/<name>.json for the
+matching <name>.html exactly; the golden files are generated from the
+BeautifulSoup reference implementation with --update-golden.
+
+Run from the repository root:  python -m benchmarks.bench_extractor
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from app.services.html_extractor import EXTRACTORS, SoupExtractor
+from benchmarks.fixtures import make_page
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+
+
+def load_corpus():
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.html"))):
+        with open(path, "rb") as f:
+            yield path, f.read()
+
+
+def golden_path(html_path: str) -> str:
+    return os.path.splitext(html_path)[0] + ".json"
+
+
+def update_golden():
+    reference = SoupExtractor()
+    for path, content in load_corpus():
+        with open(golden_path(path), "w", encoding="utf-8") as f:
+            json.dump(reference.extract(content), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"wrote {golden_path(path)}")
+
+
+def check_golden() -> bool:
+    ok = True
+    for path, content in load_corpus():
+        with open(golden_path(path), encoding="utf-8") as f:
+            expected = json.load(f)
+        for name, extractor_class in EXTRACTORS.items():
+            if extractor_class().extract(content) != expected:
+                print(f"MISMATCH {name}: {os.path.basename(path)}")
+                ok = False
+    print("golden corpus:", "all extractors match" if ok else "FAILED")
+    return ok
+
+
+def timed(extractor, content: bytes, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        extractor.extract(content)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=2000, help="size of the synthetic large page")
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args()
+
+    if args.update_golden:
+        update_golden()
+        return
+    if not check_golden():
+        sys.exit(1)
+
+    pages = [(os.path.basename(path), content) for path, content in load_corpus()]
+    pages.append((f"synthetic ({args.paragraphs} paragraphs)", make_page(0, args.paragraphs)))
+
+    names = list(EXTRACTORS)
+    print(f"\n{'page':34}" + "".join(f"{name + ' ms':>12}" for name in names) + f"{'speedup':>10}")
+    for label, content in pages:
+        results = [timed(EXTRACTORS[name](), content, args.repeat) for name in names]
+        speedup = results[names.index("soup")] / results[names.index("lxml")]
+        print(f"{label:34}" + "".join(f"{ms:>12.3f}" for ms in results) + f"{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
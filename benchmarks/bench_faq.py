@@ -0,0 +1,139 @@
+"""FAQ precompute: generation after a knowledge load, then hits on /chat and /process_speech.
+
+Publishes a manual with a few question headings and lets the FAQ precompute
+answer files/faq.txt plus the mined headings with a fake model. It reports
+the run time, the model calls and the achieved call rate against
+--rate. Then it sends a stream of first questions: --faq-share of them are FAQ
+questions in other case and punctuation, and the rest are a long tail of
+one-off questions. The answer cache is disabled, so every miss reaches the
+model. The report shows hit rate, coverage and the latency of hits and
+misses. Finally a new knowledge version is published while a run is in
+progress: the old answers stop being served and the old run stops.
+
+Run from the repository root:  python -m benchmarks.bench_faq
+"""
+import argparse
+import logging
+import random
+import statistics
+import threading
+import time
+
+from benchmarks.stubs import offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+from app.services.ai_service import AIService  # noqa: E402
+from app.services.faq import load_questions  # noqa: E402
+from benchmarks.stubs import FakeModel  # noqa: E402
+
+MANUAL = """Studying at Metropolia
+How do I book a study room?
+Study rooms are booked in the Tuudo app up to two weeks ahead.
+• Where do I return library books?
+Books are returned at any campus library.
+Lunch
+Students eat at the campus restaurants with the Kela meal subsidy.
+"""
+
+
+class CountingModel(FakeModel):
+    calls = 0
+    lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        with CountingModel.lock:
+            CountingModel.calls += 1
+        return super().generate_content(contents, **kwargs)
+
+
+def variant(question: str, rng: random.Random) -> str:
+    return rng.choice([question, question.lower(), question.rstrip("?"), question.upper() + "??"])
+
+
+def wait_for_precompute(faq, timeout: float = 300) -> float:
+    started = time.perf_counter()
+    while faq.stats["pending"] > 0 and time.perf_counter() - started < timeout:
+        time.sleep(0.05)
+    return time.perf_counter() - started
+
+
+def timeit(fn, number: int = 10000) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - started) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per Gemini call")
+    parser.add_argument("--rate", type=float, default=20, help="FAQ_REQUESTS_PER_SECOND")
+    parser.add_argument("--batch", type=int, default=4, help="FAQ_BATCH_SIZE")
+    parser.add_argument("--faq-share", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    config.FAQ_ENABLED = True
+    config.FAQ_REQUESTS_PER_SECOND = args.rate
+    config.FAQ_BATCH_SIZE = args.batch
+    config.ANSWER_CACHE_ENABLED = False
+    config.VOICE_PREFETCH_ENABLED = False
+    config.VOICE_RESPONSE_BUDGET = 30
+    app = create_app()
+    services = app.extensions["services"]
+    services.override("ai_service", AIService("", model_factory=lambda name, **kwargs: CountingModel(
+        name, latency=args.latency, token_delay=0, **kwargs
+    ), coalesce=False))
+    client = app.test_client()
+    logging.disable(logging.CRITICAL)
+    faq = services.faq
+
+    services.knowledge._publish(MANUAL, "Website.")
+    seconds = wait_for_precompute(faq)
+    stats = faq.stats
+    print(f"precompute: {stats['questions']} questions ({stats['configured']} from {config.FAQ_PATH}, "
+          f"{stats['mined']} mined), {stats['answered']} answered in {seconds:.2f} s, "
+          f"{CountingModel.calls} model calls, {CountingModel.calls / seconds:.1f} calls/s "
+          f"(limit {args.rate:g}/s, {args.batch} at a time)")
+
+    rng = random.Random(args.seed)
+    questions = load_questions(config.FAQ_PATH)
+    latencies = {"hit": [], "miss": []}
+    CountingModel.calls = 0
+    for i in range(args.requests):
+        faq_question = rng.random() < args.faq_share
+        question = variant(rng.choice(questions), rng) if faq_question else f"Question number {i} about my studies?"
+        hits = faq.stats["hits"]
+        started = time.perf_counter()
+        if i % 2:
+            client.post("/process_speech", data={"CallSid": f"call-{i}", "SpeechResult": question})
+        else:
+            client.post("/chat", json={"message": question, "session_id": f"chat-{i}"})
+        latencies["hit" if faq.stats["hits"] > hits else "miss"].append(time.perf_counter() - started)
+
+    stats = faq.stats
+    lookup = min(timeit(lambda: faq.get("chat", stats["version"], "how do i get a student card")) for _ in range(5))
+    print(f"\n{args.requests} first questions, {args.faq_share:.0%} from the FAQ list in other case and punctuation")
+    print(f"hit rate {stats['hit_rate']:.1%}, coverage {stats['coverage']:.0%}, {CountingModel.calls} model calls")
+    for kind, values in latencies.items():
+        if values:
+            print(f"  {kind:4s} {len(values):4d} requests, median {statistics.median(values) * 1000:8.2f} ms")
+    print(f"FAQ lookup: {lookup * 1e6:.1f} us")
+
+    # A new version arrives while its predecessor is still being answered
+    services.knowledge._publish(MANUAL + "Updated.", "Website.")
+    time.sleep(args.latency)
+    services.knowledge._publish(MANUAL + "Updated again.", "Website.")
+    wait_for_precompute(faq)
+    stale = faq.get("chat", stats["version"], questions[0])
+    stats = faq.stats
+    print(f"\nversion {stats['version']}: {stats['answered']} answered, {stats['superseded']} run(s) superseded, "
+          f"old version served: {stale is not None}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Instrumentation overhead: /chat and /process_speech with metrics off and on.
+
+Runs the full request path through the Flask test client against a fake model
+with no latency, so the app's own work is all that is measured. Each round
+runs the same requests with METRICS_ENABLED off, on, and on with every
+request traced (TRACE_SAMPLE_RATE=1, trace log discarded); the best round
+of each is reported. Also times the metric primitives themselves.
+
+Run from the repository root:  python -m benchmarks.bench_instrumentation
+"""
+import argparse
+import logging
+import time
+
+from benchmarks.stubs import offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+from app.services.ai_service import AIService  # noqa: E402
+from app.utils.metrics import Metrics, metrics  # noqa: E402
+from benchmarks.stubs import fake_model_factory  # noqa: E402
+
+MODES = {
+    "metrics off": (False, 0.0),
+    "metrics on": (True, 0.0),
+    "metrics + trace": (True, 1.0),
+}
+
+
+def primitive_costs(repeat: int) -> dict:
+    results = {}
+    for enabled in (False, True):
+        m = Metrics(enabled)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            with m.stage("prompt"):
+                pass
+        results[f"stage() {'on' if enabled else 'off'}"] = (time.perf_counter() - started) / repeat
+    m = Metrics()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        m.inc("assistant_gemini_tokens_total", 10, kind="output")
+    results["inc()"] = (time.perf_counter() - started) / repeat
+    return results
+
+
+def run_requests(client, requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        client.post("/chat", json={"message": f"Question {i} about enrolment?", "session_id": f"chat-{i % 50}"})
+        client.post("/process_speech", data={"CallSid": f"CA{i % 50}", "SpeechResult": f"Question {i}?"})
+    return (time.perf_counter() - started) / (2 * requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    config.ANSWER_CACHE_ENABLED = False
+    logging.getLogger("app.trace").disabled = True
+    app = create_app()
+    services = app.extensions["services"]
+    services.override("ai_service", AIService("", model_factory=fake_model_factory(latency=0, token_delay=0)))
+    services.knowledge._publish("Manual text about enrolment and deadlines. " * 200, "Website text. " * 200)
+    client = app.test_client()
+    logging.disable(logging.WARNING)
+
+    best = {name: float("inf") for name in MODES}
+    run_requests(client, 20)
+    for _ in range(args.rounds):
+        for name, (enabled, sample_rate) in MODES.items():
+            metrics.enabled, config.TRACE_SAMPLE_RATE = enabled, sample_rate
+            best[name] = min(best[name], run_requests(client, args.requests))
+
+    baseline = best["metrics off"]
+    print(f"{args.requests} chat + {args.requests} voice requests, best of {args.rounds} rounds")
+    for name, seconds in best.items():
+        print(f"  {name:16s} {seconds * 1e6:8.1f} us/request  ({(seconds - baseline) / baseline:+.1%})")
+    print("metric primitives:")
+    for name, seconds in primitive_costs(100000).items():
+        print(f"  {name:16s} {seconds * 1e9:8.0f} ns")
+    series = sum(1 for line in client.get("/metrics").get_data(as_text=True).splitlines()
+                 if not line.startswith("#"))
+    print(f"/metrics exposes {series} series")
+
+
+if __name__ == "__main__":
+    main()
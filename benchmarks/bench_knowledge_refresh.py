@@ -0,0 +1,94 @@
+"""Knowledge refresh as background jobs: endpoint latency and consistent reads.
+
+A fake scraper takes --scrape-seconds per update. The previous endpoint
+scraped inside the request; /update-websites now answers 202 with a job and
+the new snapshot is swapped in when the job finishes. Reader threads build
+chat and voice prompts throughout and check that every snapshot they see is
+complete (its index was built from its own text) and that versions only grow.
+
+Run from the repository root:  python -m benchmarks.bench_knowledge_refresh
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.stubs import offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+
+
+class SlowScraper:
+    cache = None
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def scrape_multiple_urls(self, urls):
+        time.sleep(self.seconds)
+        return " ".join(f"Website {url} lists the admission deadlines for this term." for url in urls)
+
+
+def reader(services, stop: threading.Event, results: dict):
+    history = [{"role": "user", "content": "What are the admission deadlines?"}]
+    last_version = 0
+    while not stop.is_set():
+        snapshot = services.knowledge.snapshot
+        for channel in ("chat", "voice"):
+            services.prompts.build_messages(snapshot, channel, history)
+        chunks = snapshot.knowledge_base.search("admission deadlines", 1) if snapshot.knowledge_base else []
+        if chunks and chunks[0].text not in snapshot.pdf_text + snapshot.web_content:
+            results["torn"] += 1
+        if snapshot.version < last_version:
+            results["went_back"] += 1
+        last_version = snapshot.version
+        results["reads"] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=5)
+    parser.add_argument("--scrape-seconds", type=float, default=0.5)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    config.RAG_ENABLED = True
+    app = create_app()
+    services = app.extensions["services"]
+    services.override("web_scraper", SlowScraper(args.scrape_seconds))
+    client = app.test_client()
+
+    started = time.perf_counter()
+    services.knowledge.update_websites(["https://www.metropolia.fi/initial"])
+    print(f"synchronous update (previous endpoint): {time.perf_counter() - started:.3f} s")
+
+    stop = threading.Event()
+    results = {"reads": 0, "torn": 0, "went_back": 0}
+    threads = [threading.Thread(target=reader, args=(services, stop, results)) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+
+    jobs, latencies = [], []
+    for i in range(args.updates):
+        started = time.perf_counter()
+        response = client.post("/update-websites", json={"urls": [f"https://www.metropolia.fi/page-{i}"]})
+        latencies.append(time.perf_counter() - started)
+        jobs.append(services.knowledge.get_job(response.get_json()["job"]["id"]))
+    for job in jobs:
+        job.wait()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f"POST /update-websites: max {max(latencies) * 1000:.1f} ms for {args.updates} updates (202 + job)")
+    print(f"jobs: {[job.status for job in jobs]}, versions {[job.version for job in jobs]}")
+    print(f"readers: {results['reads']} reads, {results['torn']} torn snapshots, "
+          f"{results['went_back']} version regressions")
+    print("final:", client.get(f"/knowledge/jobs/{jobs[-1].id}").get_json()["status"],
+          "knowledge version", services.knowledge.snapshot.version)
+
+
+if __name__ == "__main__":
+    main()
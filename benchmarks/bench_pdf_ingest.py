@@ -0,0 +1,95 @@
+"""PDF ingestion: pages per second for 1 through N worker processes.
+
+Writes a directory of synthetic handbooks (one with pages that fail to
+extract, one file that is not a PDF at all) and extracts it with the text
+cache disabled. The previous path read one PDF at a time in this process and
+returned "" for a whole document when any page raised; the pipeline spreads
+page ranges over a process pool, yields page records as they are ready and
+only marks the failing pages. Speed-up is bounded by the cores available.
+
+Run from the repository root:  python -m benchmarks.bench_pdf_ingest
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from pypdf import PdfReader
+
+from app.services.pdf_service import PDFService, hash_page
+from benchmarks.fixtures import make_pdf
+
+
+def legacy_extract(path: str) -> tuple:
+    # The previous PDFService.extract_text for one file: (text, pages read)
+    texts = []
+    memo = {}
+    try:
+        for page in PdfReader(path).pages:
+            hash_page(page, memo)
+            texts.append(page.extract_text() or "")
+    except Exception:
+        return "", len(texts)
+    return "\n".join(texts), len(texts)
+
+
+def make_handbooks(directory: str, documents: int, pages: int) -> list:
+    paths = []
+    for i in range(documents):
+        broken = (3, pages // 2) if i == 1 else ()
+        path = os.path.join(directory, f"handbook_{i:02d}.pdf")
+        paths.append(make_pdf(path, pages=pages, title=f"Metropolia handbook {i}", broken_pages=broken))
+    with open(os.path.join(directory, "not_a_pdf.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4 truncated download")
+    return paths
+
+
+def run(service: PDFService) -> dict:
+    started = time.perf_counter()
+    first, pages, failed = None, 0, 0
+    for record in service.iter_pages():
+        if first is None:
+            first = time.perf_counter() - started
+        pages += record.page > 0
+        failed += record.error is not None
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "first": first, "pages": pages, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=120, help="pages per handbook")
+    parser.add_argument("--max-workers", type=int, default=max(4, os.cpu_count() or 1))
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_handbooks(directory, args.documents, args.pages)
+        print(f"{args.documents} handbooks x {args.pages} pages, {os.cpu_count()} CPUs\n")
+
+        started = time.perf_counter()
+        results = [legacy_extract(path) for path in paths]
+        seconds = time.perf_counter() - started
+        lost = sum(1 for text, _ in results if not text)
+        pages = sum(read for _, read in results)
+        print(f"{'sequential (previous)':24s} {pages / seconds:8.0f} pages/s  "
+              f"{seconds:6.2f} s  {lost} handbook(s) lost entirely")
+
+        for workers in range(0, args.max_workers + 1):
+            service = PDFService("", pdf_dir=directory, workers=workers, pages_per_task=args.pages_per_task)
+            result = run(service)
+            label = "in process" if workers == 0 else f"{workers} worker{'s' if workers > 1 else ''}"
+            print(f"{label:24s} {result['pages'] / result['seconds']:8.0f} pages/s  "
+                  f"{result['seconds']:6.2f} s  first page after {result['first'] * 1000:.0f} ms, "
+                  f"{result['failed']} failed record(s)")
+
+        text = PDFService("", pdf_dir=directory, workers=args.max_workers).extract_text()
+        print(f"\nextract_text: {len(text)} characters from "
+              f"{text.count('[handbook_')} handbooks; failing pages and the broken file are skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Prompt assembly: per-request allocation with the full knowledge prompt.
+
+Builds the Gemini request (model lookup plus contents) for chat and voice
+turns the way the routes do, with retrieval disabled so the whole manual goes
+out with every turn. The previous path joined all system messages into one
+new string per request (a copy of the manual, hashed again for the model
+lookup); the assembler sends the snapshot's shared segments as parts.
+
+Run from the repository root:  python -m benchmarks.bench_prompt_assembly
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.config import config
+from app.services.ai_service import AIService, to_gemini_contents
+from app.services.knowledge import KnowledgeSnapshot
+from app.services.pdf_service import PDFService
+from app.services.prompt import CHANNEL_SUFFIXES, PromptAssembler
+from benchmarks.stubs import fake_model_factory
+
+PARAGRAPH = (
+    "Students can find information about admissions, enrolment deadlines, tuition fees "
+    "and campus services at Arabia, Karamalmi, Myllypuro and Myyrmäki in this section. "
+)
+
+
+class FullPromptConfig:
+    RAG_ENABLED = False
+    RAG_TOP_K = config.RAG_TOP_K
+
+
+def make_history(turns: int) -> list:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i} about enrolment deadlines?"})
+        history.append({"role": "assistant", "content": f"Answer {i}: check the study guide in OMA."})
+    history.append({"role": "user", "content": "When does the autumn semester start?"})
+    return history
+
+
+def legacy_prepare(ai_service: AIService, models: dict, snapshot: KnowledgeSnapshot, channel: str, history: list):
+    # The previous route + AIService path, without calling the model factory
+    messages = [
+        {"role": "system", "content": snapshot.full_prompt},
+        {"role": "system", "content": CHANNEL_SUFFIXES[channel]},
+    ] + history
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    model = models.setdefault((ai_service.model_name, system), channel)
+    _, contents = to_gemini_contents([m for m in messages if m["role"] != "system"])
+    return model, ai_service.to_protos(contents)
+
+
+def measure(prepare, requests: int) -> tuple:
+    prepare()
+    started = time.perf_counter()
+    for _ in range(requests):
+        prepare()
+    seconds = (time.perf_counter() - started) / requests
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(requests):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        prepare()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return seconds, sum(peaks) / len(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--web-kb", type=int, default=200, help="size of the website text (KiB)")
+    parser.add_argument("--turns", type=int, default=3, help="earlier turns in the conversation")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    pdf_text = PDFService(config.PDF_PATH).extract_text()
+    web_content = PARAGRAPH * (args.web_kb * 1024 // len(PARAGRAPH))
+    snapshot = KnowledgeSnapshot(1, pdf_text, web_content, None)
+    history = make_history(args.turns)
+    prompts = PromptAssembler(FullPromptConfig)
+    ai_service = AIService("", "gemini-test", model_factory=fake_model_factory(latency=0, token_delay=0))
+    models = {}
+
+    knowledge_kib = (len(pdf_text) + len(web_content)) / 1024
+    print(f"knowledge {knowledge_kib:.0f} KiB, {len(history)} messages of history, {args.requests} requests\n")
+    print(f"{'':8s} {'joined prompt':>26s} {'shared segments':>26s}")
+    for channel in CHANNEL_SUFFIXES:
+        before = measure(lambda: legacy_prepare(ai_service, models, snapshot, channel, history), args.requests)
+        after = measure(lambda: ai_service._prepare(prompts.build_messages(snapshot, channel, history)),
+                        args.requests)
+        print(f"{channel:8s} {before[0] * 1e6:8.1f} us {before[1] / 1024:9.1f} KiB/req "
+              f"{after[0] * 1e6:8.1f} us {after[1] / 1024:9.1f} KiB/req")
+
+    chat = prompts.system_messages(snapshot, "chat", history)
+    voice = prompts.system_messages(snapshot, "voice", history)
+    shared = all(a["content"] is b["content"] for a, b in zip(chat[:-1], voice[:-1]))
+    print(f"\nchat and voice share the snapshot's segments: {shared}; "
+          f"manual copied per request: {chat[1]['content'] is not pdf_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Gemini client resilience: latency and success under injected faults.
+
+Worker threads (standing in for Flask workers) ask distinct questions
+through AIService.generate_response against a FaultyModel. Each scenario runs
+twice. The "unguarded" client has no timeout, retry, limit or breaker, which
+is how Gemini was called before. The "resilient" client uses this script's
+deadlines, retries, concurrency limit and circuit breaker. Reported: the
+share of real answers (the rest get the friendly fallback), latency
+percentiles, calls that reached the model and the most that ran at once.
+
+Then the client's contract is checked against the same fault-injecting
+stub, and the script exits non-zero if a check fails: no call runs past the
+deadline, 429 and 503 are retried at most --max-retries times, the breaker
+opens after --breaker-failures failures and lets one trial call through
+after the reset, and calls beyond --max-concurrent + --max-queue are
+rejected while queued calls are served in arrival order.
+
+Run from the repository root:  python -m benchmarks.bench_resilience
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.ai_service import FALLBACK_RESPONSES, AIService
+from app.services.gemini_client import CircuitBreaker, GeminiClient, GeminiUnavailable
+from benchmarks.stubs import FaultyModel, Faults
+
+
+def unguarded_client() -> GeminiClient:
+    return GeminiClient(timeout=0, deadline=0, max_retries=0, max_concurrent=0, breaker=CircuitBreaker(0))
+
+
+def resilient_client(args) -> GeminiClient:
+    return GeminiClient(
+        timeout=args.timeout, deadline=args.deadline, max_retries=args.max_retries, backoff_base=0.1,
+        backoff_max=1.0, max_concurrent=args.max_concurrent, max_queue=args.max_queue,
+        breaker=CircuitBreaker(args.breaker_failures, args.breaker_reset)
+    )
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(client: GeminiClient, faults: Faults, args, requests: int, workers: int) -> dict:
+    ai_service = AIService("", model_factory=lambda name, **kwargs: FaultyModel(
+        name, faults=faults, latency=args.latency, token_delay=0, **kwargs
+    ), coalesce=False, client=client)
+
+    def ask(i: int):
+        started = time.perf_counter()
+        reply = ai_service.generate_response([{"role": "user", "content": f"Question {i} about enrolment?"}])
+        return time.perf_counter() - started, reply not in FALLBACK_RESPONSES
+
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(ask, range(requests)))
+    latencies = [seconds for seconds, _ in results]
+    return {
+        "ok": sum(ok for _, ok in results) / len(results),
+        "p50": percentile(latencies, 0.5), "p99": percentile(latencies, 0.99), "max": max(latencies),
+        "upstream": faults.calls, "peak": faults.max_active, "stats": client.stats,
+    }
+
+
+def report(name: str, label: str, result: dict):
+    stats = result["stats"]
+    extra = ""
+    if stats["calls"] and label == "resilient":
+        extra = (f"  retries {stats['retries']}, rejected {stats['rejected'] + stats['queue_timeouts']}, "
+                 f"short-circuited {stats['short_circuited']}, circuit {stats['state']}")
+    print(f"{name:16s} {label:10s} {result['ok']:6.1%} {result['p50'] * 1000:8.0f} {result['p99'] * 1000:8.0f} "
+          f"{result['max'] * 1000:8.0f} {result['upstream']:6d} {result['peak']:5d}{extra}")
+
+
+# The deadline is checked between attempts and by the attempt's own timeout,
+# so a call may end slightly after it
+DEADLINE_SLACK = 0.25
+
+
+def check(failures: list, name: str, ok: bool, detail: str = ""):
+    print(f"  {'ok' if ok else 'FAILED':6s} {name}" + (f" ({detail})" if detail and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def ask_once(client: GeminiClient, faults: Faults, args, latency: float = None):
+    model = FaultyModel("fake", faults=faults, latency=args.latency if latency is None else latency, token_delay=0)
+    return client.call(lambda timeout: model.generate_content(
+        "Question?", request_options={"timeout": timeout} if timeout is not None else None
+    ))
+
+
+def check_deadline(failures: list, args):
+    client, faults = resilient_client(args), Faults(hang_rate=1.0, hang_seconds=60)
+    client.breaker = CircuitBreaker(0)
+    slowest = 0.0
+    for _ in range(3):
+        started = time.perf_counter()
+        try:
+            ask_once(client, faults, args)
+        except Exception:
+            pass
+        slowest = max(slowest, time.perf_counter() - started)
+    check(failures, f"a hanging model is given up within the {args.deadline} s deadline",
+          slowest <= args.deadline + DEADLINE_SLACK, f"slowest call {slowest:.2f} s")
+
+
+def check_retries(failures: list, args):
+    for name, options in (("429", dict(quota_rate=1.0)), ("503", dict(error_rate=1.0))):
+        client = GeminiClient(timeout=args.timeout, deadline=60, max_retries=args.max_retries,
+                              backoff_base=0.01, backoff_max=0.05, breaker=CircuitBreaker(0))
+        faults = Faults(error_latency=0.01, **options)
+        try:
+            ask_once(client, faults, args)
+            failed = False
+        except Exception:
+            failed = True
+        check(failures, f"{name} is retried at most {args.max_retries} times",
+              failed and faults.calls == args.max_retries + 1, f"{faults.calls} attempts")
+
+
+def check_breaker(failures: list, args):
+    client = GeminiClient(timeout=args.timeout, deadline=60, max_retries=0,
+                          breaker=CircuitBreaker(args.breaker_failures, args.breaker_reset))
+    faults = Faults(outage=True, error_latency=0.01)
+    for _ in range(args.breaker_failures):
+        try:
+            ask_once(client, faults, args)
+        except Exception:
+            pass
+    reached = faults.calls
+    try:
+        ask_once(client, faults, args)
+        short_circuited = False
+    except GeminiUnavailable:
+        short_circuited = True
+    check(failures, f"the breaker opens after {args.breaker_failures} failures",
+          client.breaker.state == "open" and short_circuited and faults.calls == reached,
+          f"state {client.breaker.state}, {faults.calls - reached} calls reached the model")
+
+    faults.outage = False
+    time.sleep(args.breaker_reset)
+    trial_started, results = threading.Event(), []
+
+    def trial():
+        def request(timeout):
+            trial_started.set()
+            time.sleep(0.2)
+            return "answer"
+        results.append(client.call(request))
+
+    thread = threading.Thread(target=trial)
+    thread.start()
+    trial_started.wait(5)
+    try:
+        ask_once(client, faults, args, latency=0)
+        second_let_through = True
+    except GeminiUnavailable:
+        second_let_through = False
+    thread.join()
+    check(failures, "after the reset one trial call goes through and closes the circuit",
+          results == ["answer"] and not second_let_through and client.breaker.state == "closed",
+          f"trial {results}, second call let through {second_let_through}, state {client.breaker.state}")
+
+
+def check_admission(failures: list, args):
+    # Every call holds its slot until released, so slots free one at a time
+    client = GeminiClient(timeout=0, deadline=60, max_retries=0, max_concurrent=args.max_concurrent,
+                          max_queue=args.max_queue, breaker=CircuitBreaker(0))
+    total = args.max_concurrent + args.max_queue
+    started = [threading.Event() for _ in range(total)]
+    release = [threading.Event() for _ in range(total)]
+    order = []
+
+    def call(i: int):
+        def request(timeout):
+            order.append(i)
+            started[i].set()
+            release[i].wait(30)
+        client.call(request)
+
+    threads = []
+    for i in range(total):
+        threads.append(threading.Thread(target=call, args=(i,)))
+        threads[-1].start()
+        if i < args.max_concurrent:
+            started[i].wait(5)
+        else:
+            # Queued one by one, so the arrival order is known
+            while client.stats["waiting"] < i - args.max_concurrent + 1:
+                time.sleep(0.001)
+    try:
+        client.call(lambda timeout: "answer")
+        rejected = False
+    except GeminiUnavailable:
+        rejected = True
+    check(failures, f"calls beyond {args.max_concurrent} running + {args.max_queue} queued are rejected",
+          rejected)
+
+    for i in range(args.max_queue):
+        release[i].set()
+        started[args.max_concurrent + i].wait(5)
+    for event in release:
+        event.set()
+    for thread in threads:
+        thread.join()
+    queued = order[args.max_concurrent:]
+    check(failures, "queued calls are served in arrival order",
+          queued == list(range(args.max_concurrent, total)), f"order {queued[:10]}...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per healthy Gemini call")
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--deadline", type=float, default=2.5)
+    parser.add_argument("--max-concurrent", type=int, default=16)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-reset", type=float, default=2.0)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    scenarios = {
+        "healthy": (dict(), args.workers),
+        "20% 503": (dict(error_rate=0.2), args.workers),
+        "10% 429": (dict(quota_rate=0.1), args.workers),
+        "5% hang": (dict(hang_rate=0.05, hang_seconds=5), args.workers),
+        "slow outage": (dict(outage=True, error_latency=1.0), args.workers),
+        # Gemini serves max-concurrent calls at once and answers 429 to the rest
+        "4x overload": (dict(capacity=args.max_concurrent), args.workers * 4),
+    }
+    print(f"{args.requests} requests per scenario, model latency {args.latency * 1000:.0f} ms; "
+          f"resilient: timeout {args.timeout} s, deadline {args.deadline} s, "
+          f"{args.max_concurrent} concurrent + {args.max_queue} queued\n")
+    print(f"{'scenario':16s} {'client':10s} {'ok':>6s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s} "
+          f"{'calls':>6s} {'peak':>5s}")
+    slowest = 0.0
+    for name, (options, workers) in scenarios.items():
+        for label, client in (("unguarded", unguarded_client()), ("resilient", resilient_client(args))):
+            result = run(client, Faults(**options), args, args.requests, workers)
+            report(name, label, result)
+            if label == "resilient":
+                slowest = max(slowest, result["max"])
+
+    # After the outage a trial call closes the circuit again
+    client, faults = resilient_client(args), Faults(outage=True, error_latency=1.0)
+    run(client, faults, args, 20, 4)
+    opened = client.breaker.state
+    faults.outage = False
+    time.sleep(args.breaker_reset)
+    half_open = client.breaker.state
+    probe = run(client, faults, args, 1, 1)
+    result = run(client, faults, args, 20, 4)
+    print(f"\nrecovery: circuit {opened} during the outage, {half_open} after {args.breaker_reset} s, "
+          f"{client.breaker.state} after the trial call ({probe['ok']:.0%} answered); "
+          f"{result['ok']:.0%} of the next 20 answered")
+
+    failures = []
+    print("\nclient contract")
+    check(failures, f"no resilient request above ran past the {args.deadline} s deadline",
+          slowest <= args.deadline + DEADLINE_SLACK, f"slowest {slowest:.2f} s")
+    check_deadline(failures, args)
+    check_retries(failures, args)
+    check_breaker(failures, args)
+    check_admission(failures, args)
+    if failures:
+        print(f"{len(failures)} check(s) FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Prompt size and retrieval latency: full-manual prompt vs. top-k retrieval.
+
+Run from the repository root:  python -m benchmarks.bench_retrieval
+"""
+import argparse
+import time
+
+from app.config import config
+from app.services.knowledge_base import KnowledgeBase
+from app.services.pdf_service import PDFService
+from app.utils.helper import get_retrieval_prompt
+
+QUERIES = [
+    "When is the enrollment deadline?",
+    "How do I get my student card?",
+    "Which campus has the ICT programmes?",
+    "Where can I find the study guide and timetable?",
+    "How do I register for courses in OMA?",
+    "Who do I contact about student health services?",
+    "How can I pay the tuition fee?",
+    "Is there a library at Myllypuro campus?",
+]
+
+CLOSING = "Keep responses helpful, accurate, and student-focused."
+
+
+def approx_tokens(text: str) -> int:
+    # Rough Gemini estimate for English text
+    return len(text) // 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", default=config.PDF_PATH)
+    parser.add_argument("--top-k", type=int, default=config.RAG_TOP_K)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pdf_text = PDFService(args.pdf).extract_text()
+    full_prompt = f"PDF MANUAL CONTENT:\n{pdf_text}\n\n{CLOSING}"
+
+    started = time.perf_counter()
+    knowledge_base = KnowledgeBase(config.RAG_CHUNK_SIZE, config.RAG_CHUNK_OVERLAP)
+    knowledge_base.add_document("PDF manual", pdf_text)
+    knowledge_base.build()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Indexed {len(knowledge_base.chunks)} chunks in {build_ms:.1f} ms")
+    print(f"Full prompt: {len(full_prompt)} chars (~{approx_tokens(full_prompt)} tokens)\n")
+    print(f"{'query':50} {'chars':>7} {'~tokens':>8} {'search us':>10}")
+
+    for query in QUERIES:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            chunks = knowledge_base.search(query, args.top_k)
+        search_us = (time.perf_counter() - started) / args.repeat * 1e6
+        prompt = get_retrieval_prompt(chunks, CLOSING)
+        print(f"{query[:50]:50} {len(prompt):>7} {approx_tokens(prompt):>8} {search_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Wall-clock time of WebScraper.scrape_multiple_urls: sequential vs. concurrent.
+
+Serves pages from several local fixture hosts (one port each, so per-host
+limits apply per server) and compares the old fetch-then-sleep loop with
+the concurrent engine.
+
+Run from the repository root:  python -m benchmarks.bench_scraper
+"""
+import argparse
+import time
+
+from app.services.web_scraper import WebScraper
+from benchmarks.fixtures import FixtureSite
+
+
+def sequential(scraper: WebScraper, urls: list, max_length: int, sleep: float) -> str:
+    # The pre-concurrency implementation of scrape_multiple_urls
+    all_content = []
+    for url in urls:
+        content = scraper.scrape_url(url, max_length // len(urls))
+        if content and not content.startswith("Could not retrieve"):
+            all_content.append(f"Content from {url}:\n{content}")
+        time.sleep(sleep)
+    return "\n\n".join(all_content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=24)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="server latency per page (s)")
+    parser.add_argument("--sleep", type=float, default=1.0, help="sleep per URL in the sequential loop")
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--rps", type=float, default=5.0, help="requests per second per host")
+    args = parser.parse_args()
+
+    sites = [FixtureSite(latency=args.latency) for _ in range(args.hosts)]
+    for site in sites:
+        site.__enter__()
+    try:
+        urls = [sites[i % args.hosts].urls(args.urls)[i] for i in range(args.urls)]
+        max_length = 15000 * args.urls
+
+        scraper = WebScraper()
+        started = time.perf_counter()
+        baseline = sequential(scraper, urls, max_length, args.sleep)
+        sequential_s = time.perf_counter() - started
+
+        scraper = WebScraper(per_host_concurrency=args.per_host, requests_per_second=args.rps)
+        started = time.perf_counter()
+        concurrent = scraper.scrape_multiple_urls(urls, max_length)
+        concurrent_s = time.perf_counter() - started
+    finally:
+        for site in sites:
+            site.__exit__(None, None, None)
+
+    print(f"{args.urls} URLs over {args.hosts} hosts, {args.latency * 1000:.0f} ms server latency")
+    print(f"sequential (sleep {args.sleep}s): {sequential_s:8.2f} s")
+    print(f"concurrent:                {concurrent_s:8.2f} s")
+    print(f"speedup:                   {sequential_s / concurrent_s:8.1f}x")
+    print(f"identical output:          {baseline == concurrent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Throughput of /chat per SERVER_MODE against a slow fake Gemini model.
+
+Starts the app in a subprocess for each mode (a fixed pool of request threads,
+and gevent greenlets when gevent is installed) and keeps `--concurrency`
+requests in flight. With a model that takes `--latency` seconds, the thread
+pool tops out at SERVER_THREADS / latency requests per second while gevent
+keeps scaling with the number of open requests.
+
+Run from the repository root:  python -m benchmarks.bench_serving
+"""
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_server(mode: str, port: int, latency: float):
+    # Runs in the child process; mirrors run.py
+    os.environ["SERVER_MODE"] = mode
+    if mode == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+
+    from benchmarks.stubs import fake_model_factory, offline_environment
+    offline_environment()
+
+    from app import create_app
+    from app.config import config
+    from app.server import serve
+    from app.services.ai_service import AIService
+
+    config.PORT = port
+    app = create_app()
+    app.extensions["services"].override(
+        "ai_service", AIService("", model_factory=fake_model_factory(latency=latency, token_delay=0))
+    )
+    serve(app, config, host="127.0.0.1")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post(port: int, session_id: str) -> float:
+    body = json.dumps({"message": "Which campuses does Metropolia have?", "session_id": session_id}).encode()
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/chat", data=body, headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def wait_until_up(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def measure(mode: str, args) -> dict:
+    port = free_port()
+    env = dict(os.environ, SERVER_THREADS=str(args.threads), SERVER_CONNECTIONS=str(args.concurrency * 2))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_serving", "--serve", mode,
+         "--port", str(port), "--latency", str(args.latency)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_up(port)
+        post(port, "warmup")
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            started = time.perf_counter()
+            latencies = list(pool.map(lambda i: post(port, f"load_{i}"), range(args.requests)))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "mode": mode,
+        "requests_per_second": args.requests / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0, help="fake model latency (s)")
+    parser.add_argument("--threads", type=int, default=16, help="SERVER_THREADS for threads mode")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        run_server(args.serve, args.port, args.latency)
+        return
+
+    modes = ["threads"]
+    if importlib.util.find_spec("gevent"):
+        modes.append("gevent")
+    else:
+        print("gevent is not installed; measuring threads mode only (pip install gevent)")
+
+    print(f"{args.requests} requests, {args.concurrency} in flight, model latency {args.latency:.1f} s")
+    for mode in modes:
+        result = measure(mode, args)
+        print(f"  {mode:8s} {result['requests_per_second']:7.1f} req/s   "
+              f"p50 {result['p50_ms']:7.0f} ms   p95 {result['p95_ms']:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
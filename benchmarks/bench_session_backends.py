@@ -0,0 +1,185 @@
+"""Session backends: shared history across workers and append/fetch cost.
+
+Two application instances stand in for two gunicorn workers. A voice call's
+webhooks alternate between them, and the script checks how much history the
+model sees on the last turn with each backend. Redis is replaced by an
+in-process fake with a configurable round-trip latency.
+
+It also drives SQLite and the fake Redis through the same sequence of
+appends, trims, summaries, expiry and deletion as MemoryBackend and checks
+that get_messages() returns the same history, summary included, after every
+step. The script exits non-zero if they differ.
+
+Run from the repository root:  python -m benchmarks.bench_session_backends
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.stubs import FakeRedis, fake_model_factory, offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.models import ConversationStore, MemoryBackend, RedisBackend, SQLiteBackend  # noqa: E402
+from app.services.ai_service import AIService  # noqa: E402
+
+
+class RecordingModel:
+    # Remembers how many turns the last request carried
+    last_turns = 0
+
+    def __init__(self, model_name, **kwargs):
+        self.model = fake_model_factory(latency=0, token_delay=0)(model_name, **kwargs)
+
+    def generate_content(self, contents, **kwargs):
+        RecordingModel.last_turns = len(contents)
+        return self.model.generate_content(contents, **kwargs)
+
+
+def make_backend(name: str, db_path: str, redis: FakeRedis):
+    if name == "sqlite":
+        return SQLiteBackend(db_path)
+    if name == "redis":
+        return RedisBackend(redis)
+    return MemoryBackend()
+
+
+def shared_history(name: str, db_path: str, turns: int) -> int:
+    redis = FakeRedis()
+    workers = []
+    for _ in range(2):
+        app = create_app()
+        services = app.extensions["services"]
+        services.override("ai_service", AIService("", model_factory=RecordingModel))
+        services.override("conversation_store", ConversationStore(make_backend(name, db_path, redis), max_turns=50))
+        workers.append(app.test_client())
+
+    for turn in range(turns):
+        workers[turn % 2].post("/process_speech", data={"CallSid": f"CA_{name}", "SpeechResult": f"question {turn}"})
+    return RecordingModel.last_turns
+
+
+class FakeClock:
+    # Shared by all backends so sessions expire at the same step
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def summarize(summary: str, messages: list) -> str:
+    folded = "; ".join(f"{m['role']}: {m['content']}" for m in messages)
+    return f"{summary}; {folded}" if summary else folded
+
+
+def replay(backend, clock: FakeClock, session_ttl: float) -> list:
+    # The same operations on every backend; returns what get_messages() saw after each
+    trimmed = ConversationStore(backend, max_turns=4)
+    summarized = ConversationStore(backend, max_turns=4, summarizer=summarize)
+    seen = []
+
+    def step(name: str, store: ConversationStore, session_id: str):
+        # Let the background summary finish before reading
+        if store.summarizer:
+            store._executor.submit(lambda: None).result()
+        seen.append((name, session_id, store.get_messages(session_id), store.session_exists(session_id)))
+
+    for store, session_id in ((trimmed, "trimmed"), (summarized, "summarized")):
+        store.create_session(session_id)
+        step("created", store, session_id)
+        for turn in range(7):
+            store.add_message(session_id, "user", f"Kysymys {turn}: mitä kuuluu, Myllypuro?")
+            store.add_message(session_id, "assistant", f"Answer {turn} " * (turn + 1))
+            step(f"turn {turn}", store, session_id)
+
+    summarized.backend.compact("summarized", 1, "Rewritten summary")
+    step("compacted", summarized, "summarized")
+
+    clock.now += session_ttl + 1
+    step("expired", trimmed, "trimmed")
+    summarized.add_message("summarized", "user", "Starting over")
+    step("appended after expiry", summarized, "summarized")
+
+    trimmed.end_session("summarized")
+    step("deleted", summarized, "summarized")
+    return seen
+
+
+def check_parity(failures: list, tmp: str):
+    print("\nSame history from every backend after append/trim/summary/compact/expire/delete:")
+    session_ttl = 3600
+    results = {}
+    for name in ("memory", "sqlite", "redis"):
+        clock = FakeClock()
+        if name == "memory":
+            backend = MemoryBackend(session_ttl=session_ttl, clock=clock)
+        elif name == "sqlite":
+            backend = SQLiteBackend(os.path.join(tmp, "parity.sqlite3"), session_ttl=session_ttl, clock=clock)
+        else:
+            backend = RedisBackend(FakeRedis(), session_ttl=session_ttl, clock=clock)
+        results[name] = replay(backend, clock, session_ttl)
+
+    expected = results["memory"]
+    check(failures, "memory keeps a summary and drops the expired session",
+          expected[-4][2][0].get("summary") is True and expected[-3][2] == [] and not expected[-1][3])
+    for name in ("sqlite", "redis"):
+        differing = [f"{step} ({session_id})" for (step, session_id, *got), (_, _, *want)
+                     in zip(results[name], expected) if got != want]
+        check(failures, f"{name} matches memory at all {len(expected)} steps",
+              not differing and len(results[name]) == len(expected), ", ".join(differing))
+
+
+def check(failures: list, name: str, ok: bool, detail: str = ""):
+    print(f"  {'ok' if ok else 'FAILED':6s} {name}" + (f" ({detail})" if detail and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def throughput(backend, sessions: int, turns: int) -> float:
+    started = time.perf_counter()
+    store = ConversationStore(backend, max_turns=10)
+    for i in range(sessions):
+        for turn in range(turns):
+            store.add_message(f"s{i}", "user", f"question {turn} " * 10)
+            store.get_messages(f"s{i}")
+            store.add_message(f"s{i}", "assistant", f"answer {turn} " * 40)
+    return sessions * turns * 3 / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--redis-latency", type=float, default=0.0002, help="fake Redis round trip (s)")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Turns the model sees on turn {args.turns} of a call served by two workers:")
+        for name in ("memory", "sqlite", "redis"):
+            turns = shared_history(name, os.path.join(tmp, f"{name}.sqlite3"), args.turns)
+            print(f"  {name:7s} {turns:3d}")
+
+        print(f"\nOperations per second ({args.sessions} sessions x {args.turns} turns, append+fetch+append):")
+        for name in ("memory", "sqlite", "redis"):
+            redis = FakeRedis(latency=args.redis_latency)
+            backend = make_backend(name, os.path.join(tmp, f"bench_{name}.sqlite3"), redis)
+            rate = throughput(backend, args.sessions, args.turns)
+            extra = ""
+            if name == "redis":
+                per_op = redis.round_trips / (args.sessions * args.turns * 3)
+                extra = f"  ({per_op:.2f} round trips per operation)"
+            print(f"  {name:7s} {rate:10,.0f}{extra}")
+
+        check_parity(failures, tmp)
+    if failures:
+        print(f"{len(failures)} check(s) FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
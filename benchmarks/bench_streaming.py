@@ -0,0 +1,137 @@
+"""Time-to-first-token of /chat/stream vs. total latency of /chat.
+
+Uses a fake streaming Gemini model, so it runs offline. Also checks the SSE
+contract: deltas arrive before the model has finished, a final `done` event
+carries the joined response, and a client that disconnects mid-stream
+closes the Gemini stream and leaves the partial reply in its conversation.
+The script exits non-zero if a check fails.
+
+Run from the repository root:  python -m benchmarks.bench_streaming
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.stubs import fake_model_factory, offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.services.ai_service import AIService  # noqa: E402
+
+
+class TrackingAIService(AIService):
+    # Records when the model stream was exhausted or closed early
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.finished_at = None
+        self.closed = False
+
+    def stream_response(self, messages: list):
+        self.finished_at, self.closed = None, False
+        try:
+            yield from super().stream_response(messages)
+            self.finished_at = time.perf_counter()
+        except GeneratorExit:
+            self.closed = True
+            raise
+
+
+def parse_events(chunks: list) -> list:
+    # (event, data) pairs of a text/event-stream body
+    events = []
+    for block in b"".join(chunks).decode("utf-8").split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+def check(failures: list, name: str, ok: bool, detail: str = ""):
+    print(f"  {'ok' if ok else 'FAILED':6s} {name}" + (f" ({detail})" if detail and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def check_contract(services, client, ai_service: TrackingAIService, failures: list):
+    # Questions of their own, so the answer cache does not answer them
+    body = {"message": "Where is the Myllypuro campus?", "session_id": "contract"}
+    response = client.post("/chat/stream", json=body, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_at = time.perf_counter()
+    received = [first] + list(chunks)
+    events = parse_events(received)
+    deltas = [data["delta"] for event, data in events if event == "message"]
+    done = [data for event, data in events if event == "done"]
+    check(failures, "the first delta arrives before the model has finished",
+          ai_service.finished_at is not None and first_at < ai_service.finished_at)
+    check(failures, "several deltas are streamed", len(deltas) > 1, f"{len(deltas)} deltas")
+    check(failures, "the done event carries the joined response and the session",
+          len(done) == 1 and events[-1][0] == "done" and done[0]["response"] == "".join(deltas).strip()
+          and done[0]["session_id"] == "contract", f"{done}")
+
+    body = {"message": "Where is the Arabia campus?", "session_id": "disconnect"}
+    response = client.post("/chat/stream", json=body, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    response.close()
+    sent = "".join(data["delta"] for _, data in parse_events([first])).strip()
+    history = services.conversation_store.get_messages("disconnect")
+    check(failures, "a client disconnect closes the Gemini stream", ai_service.closed)
+    check(failures, "a client disconnect stores the partial reply",
+          [m["role"] for m in history] == ["user", "assistant"] and history[-1]["content"] == sent,
+          f"{history}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="model latency before the first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    app = create_app()
+    services = app.extensions["services"]
+    ai_service = TrackingAIService("", model_factory=fake_model_factory(
+        latency=args.latency, token_delay=args.token_delay
+    ))
+    services.override("ai_service", ai_service)
+    client = app.test_client()
+
+    blocking, first_token, streamed_total = [], [], []
+    for i in range(args.requests):
+        body = {"message": "Which campuses does Metropolia have?", "session_id": f"bench_{i}"}
+
+        started = time.perf_counter()
+        client.post("/chat", json=body)
+        blocking.append(time.perf_counter() - started)
+
+        body["session_id"] = f"bench_stream_{i}"
+        started = time.perf_counter()
+        response = client.post("/chat/stream", json=body, buffered=False)
+        chunks = iter(response.response)
+        next(chunks)
+        first_token.append(time.perf_counter() - started)
+        for _ in chunks:
+            pass
+        streamed_total.append(time.perf_counter() - started)
+
+    ms = lambda values: statistics.median(values) * 1000
+    print(f"/chat total latency (median):        {ms(blocking):8.1f} ms")
+    print(f"/chat/stream time to first token:    {ms(first_token):8.1f} ms")
+    print(f"/chat/stream total (median):         {ms(streamed_total):8.1f} ms")
+
+    failures = []
+    print("\nSSE contract")
+    check_contract(services, client, ai_service, failures)
+    if failures:
+        print(f"{len(failures)} check(s) FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
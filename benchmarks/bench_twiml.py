@@ -0,0 +1,116 @@
+"""Precompiled TwiML templates: golden-output check and webhook render time.
+
+The rendered responses must match benchmarks/fixtures/twiml/golden.json byte
+for byte. The golden file was written by the original VoiceResponse-per-request
+code; --update-golden regenerates it from the builder functions.
+
+Run from the repository root:  python -m benchmarks.bench_twiml
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchmarks.stubs import offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.routes.voice import build_fallback_response, create_fallback_voice_response  # noqa: E402
+from app.services.voice_service import (  # noqa: E402
+    VoiceService, build_answer_response, build_greeting_response, build_hold_response,
+)
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "twiml", "golden.json")
+REDIRECT_URL = "/voice/answer?since=1700000000.000&x=1"
+
+
+def render_all(texts: dict, templated: bool) -> dict:
+    # Either through the templates (VoiceService and the voice blueprint) or
+    # by building the VoiceResponse graph as the original code did
+    app = create_app()
+    voice = VoiceService("", "", "")
+    rendered = {"greeting": voice.create_voice_response() if templated else str(build_greeting_response())}
+    for name, text in texts.items():
+        if templated:
+            rendered[f"answer_{name}"] = voice.create_voice_response("question", text)
+            rendered[f"hold_{name}"] = voice.create_hold_response(REDIRECT_URL, text or None)
+        else:
+            rendered[f"answer_{name}"] = str(build_answer_response(text))
+            rendered[f"hold_{name}"] = str(build_hold_response(REDIRECT_URL, text or None))
+    with app.test_request_context():
+        fallback = create_fallback_voice_response if templated else (
+            lambda prompt="Please ask your question.": str(build_fallback_response("/process_speech", prompt))
+        )
+        rendered["fallback_default"] = fallback()
+        for name, text in texts.items():
+            rendered[f"fallback_{name}"] = fallback(text)
+    return rendered
+
+
+def load_golden() -> dict:
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def update_golden():
+    golden = load_golden()
+    golden["expected"] = render_all(golden["texts"], templated=False)
+    with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1)
+    print(f"wrote {GOLDEN_PATH}")
+
+
+def check_golden() -> bool:
+    golden = load_golden()
+    rendered = render_all(golden["texts"], templated=True)
+    mismatches = [name for name, expected in golden["expected"].items()
+                  if rendered.get(name, "").encode("utf-8") != expected.encode("utf-8")]
+    for name in mismatches:
+        print(f"MISMATCH {name}")
+    print(f"golden TwiML: {len(golden['expected'])} responses,",
+          "byte-identical" if not mismatches else "FAILED")
+    return not mismatches
+
+
+def timed(render, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--update-golden", action="store_true")
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.update_golden:
+        update_golden()
+        return
+    if not check_golden():
+        sys.exit(1)
+
+    answer = load_golden()["texts"]["long"]
+    app = create_app()
+    voice = VoiceService("", "", "")
+    cases = [
+        ("greeting", lambda: str(build_greeting_response()), lambda: voice.create_voice_response()),
+        ("answer", lambda: str(build_answer_response(answer)),
+         lambda: voice.create_voice_response("question", answer)),
+        ("hold", lambda: str(build_hold_response(REDIRECT_URL, "One moment.")),
+         lambda: voice.create_hold_response(REDIRECT_URL, "One moment.")),
+    ]
+    with app.test_request_context():
+        cases.append(("fallback", lambda: str(build_fallback_response("/process_speech", answer)),
+                      lambda: create_fallback_voice_response(answer)))
+        print(f"\n{'response':10s} {'VoiceResponse':>14s} {'template':>10s}  speed-up")
+        for name, built, templated in cases:
+            before, after = timed(built, args.repeat), timed(templated, args.repeat)
+            print(f"{name:10s} {before:11.1f} us {after:7.1f} us  {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
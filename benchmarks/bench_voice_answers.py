@@ -0,0 +1,107 @@
+"""Voice answers: output-token budget and sentence trimming vs. cut at 500 chars.
+
+Runs a fixed set of questions against a fake model that writes long markdown
+answers at a fixed speed per token. The previous path generated the full
+answer, stripped '*' and cut it at 500 characters; the voice mode caps output
+tokens and trims to whole sentences.
+
+Run from the repository root:  python -m benchmarks.bench_voice_answers
+"""
+import argparse
+import statistics
+import time
+
+from app.services.ai_service import AIService
+from benchmarks.stubs import fake_model_factory
+
+SENTENCE = "The {topic} is handled by the study affairs office at {campus}, and you can also ask your tutor."
+DETAIL = "- **{n}.** Check the {topic} page in OMA for deadlines, forms and the latest instructions for {campus}."
+QUESTIONS = {
+    "When does the autumn semester start?": ("autumn semester", "Myllypuro"),
+    "How do I get a certificate of enrolment?": ("certificate of enrolment", "Arabia"),
+    "Where can I find my timetable?": ("timetable", "Karamalmi"),
+    "How do I register for a course?": ("course registration", "Myyrmäki"),
+    "Can I apply for a study right extension?": ("study right extension", "Myllypuro"),
+    "How does the student card work?": ("student card", "Arabia"),
+    "Who do I contact about a missing grade?": ("grade correction", "Karamalmi"),
+    "Where can I print on campus?": ("printing service", "Myyrmäki"),
+}
+
+
+def long_answer(contents) -> str:
+    # Answers like an unconstrained chat reply: a few sentences plus a list
+    question = contents[-1].parts[0].text
+    topic, campus = QUESTIONS.get(question, ("service", "Myllypuro"))
+    intro = " ".join(SENTENCE.format(topic=topic, campus=campus) for _ in range(3))
+    details = "\n".join(DETAIL.format(n=n, topic=topic, campus=campus) for n in range(1, 9))
+    return f"{intro}\n\n{details}"
+
+
+def legacy_voice_answer(ai_service: AIService, messages: list) -> str:
+    text = ai_service.generate_response(messages).strip()
+    text = text.replace('**', '').replace('*', '')
+    return text[:497] + "..." if len(text) > 500 else text
+
+
+def run(name: str, answer, ai_service: AIService, repeat: int) -> dict:
+    latencies, spoken, generated, mid_sentence = [], [], [], 0
+    model = ai_service.get_model("voice")
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            messages = [{"role": "system", "content": "voice"}, {"role": "user", "content": question}]
+            started = time.perf_counter()
+            text = answer(messages)
+            latencies.append(time.perf_counter() - started)
+            spoken.append(len(text))
+            generated.append(model.last_output_tokens)
+            mid_sentence += not text.rstrip().endswith((".", "!", "?")) or text.endswith("...")
+    turns = len(latencies)
+    return {
+        "name": name,
+        "latency_ms": statistics.mean(latencies) * 1000,
+        "output_tokens": statistics.mean(generated),
+        "spoken_chars": statistics.mean(spoken),
+        "mid_sentence": mid_sentence / turns,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="time per output token (s)")
+    parser.add_argument("--max-output-tokens", type=int, default=90)
+    parser.add_argument("--max-chars", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    factory = fake_model_factory(latency=args.latency, token_delay=args.token_delay, reply=long_answer)
+
+    def counting_factory(model_name, **kwargs):
+        # Remembers how many tokens the last call generated (what is billed)
+        model = factory(model_name, **kwargs)
+        generate = model.generate_content
+
+        def generate_content(contents, **options):
+            response = generate(contents, **options)
+            model.last_output_tokens = response.usage_metadata.candidates_token_count
+            return response
+        model.generate_content = generate_content
+        return model
+
+    ai_service = AIService("", model_factory=counting_factory)
+    results = [
+        run("full answer, cut at 500 chars", lambda m: legacy_voice_answer(ai_service, m), ai_service, args.repeat),
+        run(f"voice mode ({args.max_output_tokens} tokens)", lambda m: ai_service.generate_voice_response(
+            m, max_output_tokens=args.max_output_tokens, max_chars=args.max_chars
+        ), ai_service, args.repeat),
+    ]
+
+    print(f"{len(QUESTIONS)} questions x {args.repeat}, model {args.latency:.2f} s + {args.token_delay * 1000:.0f} ms/token")
+    print(f"{'':34s} {'latency':>9s} {'out tokens':>11s} {'spoken':>8s} {'cut mid-sentence':>17s}")
+    for r in results:
+        print(f"{r['name']:34s} {r['latency_ms']:6.0f} ms {r['output_tokens']:11.0f} "
+              f"{r['spoken_chars']:8.0f} {r['mid_sentence']:16.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Speculative voice answers: time from the caller's last word to the answer.
+
+Plays Twilio for several concurrent calls. Each caller speaks a question one
+word every --word-gap seconds. Every word posts the growing transcript to
+/voice/partial as UnstableSpeechResult. After the last word comes --silence
+seconds of silence (the Gather's speech_timeout), then /process_speech with
+the final SpeechResult. Holds are followed until the answer is ready. The
+fake model takes --latency seconds per call. Each scenario runs with
+VOICE_PREFETCH_ENABLED off and on. The report shows the time from the last
+word to the answer and the model calls made, including speculations that
+were thrown away. In "corrected", the final transcript differs from the
+partials, so the speculation must be discarded.
+
+Run from the repository root:  python -m benchmarks.bench_voice_prefetch
+"""
+import argparse
+import logging
+import threading
+import time
+
+from benchmarks.stubs import offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+from app.services.answer_cache import normalize_question  # noqa: E402
+from app.services.voice_prefetch import VoicePrefetcher  # noqa: E402
+
+SCENARIOS = {
+    # partial transcript words, final SpeechResult
+    "same words": ("When does the autumn semester start", "When does the autumn semester start?"),
+    "punctuation": ("how do I apply for a student card", "How do I apply for a student card?"),
+    "corrected": ("can I get the student cafe menu", "Can I get a student discount on HSL travel cards?"),
+}
+
+
+class CountingAIService:
+    # Stand-in for AIService: fixed latency, counts the questions it answers
+    context_cache = None
+    coalescer = None
+    client = None
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_voice_response(self, messages: list, **kwargs) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return f"Answer to: {messages[-1]['content']}"
+
+
+def play_call(services, client, call_sid: str, partial: str, final: str, args) -> tuple:
+    words = partial.split()
+    for i in range(len(words)):
+        client.post("/voice/partial", data={"CallSid": call_sid, "UnstableSpeechResult": " ".join(words[:i + 1])})
+        time.sleep(args.word_gap)
+    last_word = time.perf_counter()
+    time.sleep(args.silence)
+    body = client.post("/process_speech", data={"CallSid": call_sid, "SpeechResult": final})
+    if "<Redirect" in body.get_data(as_text=True):
+        services.voice_turns.wait(call_sid, 60, polled=True)
+    answer = services.conversation_store.get_messages(call_sid)[-1]["content"]
+    # A reused speculation answered the partial words, which must match the final ones
+    question = answer.replace("Answer to: ", "", 1)
+    return time.perf_counter() - last_word, normalize_question(question) == normalize_question(final)
+
+
+def run(services, client, args, name: str, prefetch: bool) -> dict:
+    config.VOICE_PREFETCH_ENABLED = prefetch
+    ai_service = CountingAIService(args.latency)
+    prefetcher = VoicePrefetcher(
+        stable_seconds=args.stable, min_words=config.VOICE_PREFETCH_MIN_WORDS,
+        min_similarity=config.VOICE_PREFETCH_SIMILARITY, max_speculations=config.VOICE_PREFETCH_MAX
+    )
+    services.override("ai_service", ai_service)
+    services.override("voice_prefetch", prefetcher)
+    partial, final = SCENARIOS[name]
+    results = [None] * args.calls
+
+    def call(i: int):
+        # Callers start a little apart, as real calls do
+        time.sleep(i * 0.05)
+        results[i] = play_call(services, client, f"{name}-{prefetch}-{i}", partial, final, args)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(args.calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Let discarded speculations finish so their model calls are counted
+    time.sleep(args.latency)
+    waits = sorted(seconds for seconds, _ in results)
+    return {
+        "mean": sum(waits) / len(waits), "max": waits[-1],
+        "correct": sum(correct for _, correct in results), "calls": ai_service.calls,
+        "stats": prefetcher.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds per Gemini call")
+    parser.add_argument("--word-gap", type=float, default=0.15, help="seconds between spoken words")
+    parser.add_argument("--silence", type=float, default=3.0, help="speech_timeout (s)")
+    parser.add_argument("--stable", type=float, default=config.VOICE_PREFETCH_STABLE_SECONDS,
+                        help="VOICE_PREFETCH_STABLE_SECONDS")
+    args = parser.parse_args()
+
+    config.ANSWER_CACHE_ENABLED = False
+    config.VOICE_RESPONSE_BUDGET = 1.0
+    app = create_app()
+    services = app.extensions["services"]
+    services.knowledge._publish("The autumn semester starts in late August. " * 50, "Website.")
+    client = app.test_client()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{args.calls} concurrent calls, a word every {args.word_gap * 1000:.0f} ms, {args.silence:.1f} s "
+          f"speech timeout, model latency {args.latency:.1f} s\n")
+    print(f"{'scenario':12s} {'prefetch':8s} {'mean s':>7s} {'max s':>6s} {'correct':>8s} {'calls':>6s}  speculation")
+    for name in SCENARIOS:
+        for prefetch in (False, True):
+            result = run(services, client, args, name, prefetch)
+            stats = result["stats"]
+            extra = ""
+            if prefetch:
+                extra = (f"  {stats['speculations']} started, {stats['reused']} reused, "
+                         f"{stats['discarded'] + stats['cancelled']} discarded")
+            print(f"{name:12s} {'on' if prefetch else 'off':8s} {result['mean']:7.2f} {result['max']:6.2f} "
+                  f"{result['correct']:4d}/{args.calls:<3d} {result['calls']:6d}{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Voice turns against a slow model: every webhook must return within budget.
+
+Plays Twilio for several concurrent calls, each asking --turns different
+questions: posts /process_speech and follows <Redirect> to /voice/answer
+until the answer is spoken. The fake AIService takes a different time for
+each turn (some beyond Twilio's 15 s webhook timeout when scaled up, and
+beyond --max-wait, so those callers are asked to repeat), and the script
+reports webhook durations, holds and the latency histograms exposed in /stats.
+
+It checks that every spoken answer belongs to the question just asked, never
+an earlier turn's, and that each call's history holds only what the caller
+heard: a late answer to a given-up turn is not stored. The script exits
+non-zero if a check fails.
+
+Run from the repository root:  python -m benchmarks.bench_voice_turns
+"""
+import argparse
+import itertools
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import offline_environment
+
+offline_environment()
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+from app.routes.voice import VOICE_TIMEOUT_REPLY  # noqa: E402
+
+REDIRECT = re.compile(r"<Redirect[^>]*>([^<]+)</Redirect>")
+
+
+class SlowAIService:
+    # Stand-in for AIService whose turns take the given latencies in turn
+    context_cache = None
+    coalescer = None
+    client = None
+
+    def __init__(self, latencies):
+        self._latencies = itertools.cycle(latencies)
+        self._lock = threading.Lock()
+
+    def generate_response(self, messages: list) -> str:
+        with self._lock:
+            latency = next(self._latencies)
+        time.sleep(latency)
+        return f"Answer to: {messages[-1]['content']} It took {latency:.1f} seconds to generate."
+
+    def generate_voice_response(self, messages: list, **kwargs) -> str:
+        return self.generate_response(messages)
+
+
+def question(call_sid: str, turn: int) -> str:
+    return f"Question {turn} on call {call_sid}: when does the autumn semester start?"
+
+
+def play_turn(client, call_sid: str, turn: int, webhook_times: list) -> tuple:
+    # (seconds to the answer, redirects, what the caller heard)
+    started = time.perf_counter()
+    hops = 0
+    form = {"CallSid": call_sid, "SpeechResult": question(call_sid, turn)}
+    url = "/process_speech"
+    while True:
+        request_started = time.perf_counter()
+        body = client.post(url, data=form).get_data(as_text=True)
+        webhook_times.append(time.perf_counter() - request_started)
+        redirect = REDIRECT.search(body)
+        if not redirect:
+            return time.perf_counter() - started, hops, body
+        url = redirect.group(1).replace("&amp;", "&")
+        form = {"CallSid": call_sid}
+        hops += 1
+
+
+def play_call(client, call_sid: str, turns: int, webhook_times: list) -> list:
+    return [play_turn(client, call_sid, turn, webhook_times) + (turn,) for turn in range(turns)]
+
+
+def check(failures: list, name: str, ok: bool, detail: str = ""):
+    print(f"  {'ok' if ok else 'FAILED':6s} {name}" + (f" ({detail})" if detail and not ok else ""))
+    if not ok:
+        failures.append(name)
+
+
+def heard(body: str, call_sid: str, turn: int) -> str:
+    if f"Answer to: {question(call_sid, turn)}" in body:
+        return "answer"
+    if VOICE_TIMEOUT_REPLY in body:
+        return "timeout"
+    return "other"
+
+
+def history_heard(history: list) -> bool:
+    # Alternating turns, each reply answering the question right before it
+    for asked, reply in zip(history[::2], history[1::2]):
+        if asked["role"] != "user" or reply["role"] != "assistant":
+            return False
+        if reply["content"] != VOICE_TIMEOUT_REPLY and not reply["content"].startswith(f"Answer to: {asked['content']}"):
+            return False
+    return len(history) % 2 == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=12)
+    parser.add_argument("--latencies", default="0.2,1.5,4,0.5,2.5,6",
+                        help="comma-separated model latencies (s), used in turn")
+    parser.add_argument("--budget", type=float, default=1.0, help="VOICE_RESPONSE_BUDGET (s)")
+    parser.add_argument("--poll-wait", type=float, default=1.0, help="VOICE_POLL_WAIT (s)")
+    parser.add_argument("--max-wait", type=float, default=3.0, help="VOICE_MAX_WAIT (s)")
+    parser.add_argument("--turns", type=int, default=2, help="questions per call")
+    args = parser.parse_args()
+
+    config.VOICE_RESPONSE_BUDGET = args.budget
+    config.VOICE_POLL_WAIT = args.poll_wait
+    config.VOICE_MAX_WAIT = args.max_wait
+    config.ANSWER_CACHE_ENABLED = False
+    app = create_app()
+    services = app.extensions["services"]
+    services.override("ai_service", SlowAIService([float(v) for v in args.latencies.split(",")]))
+    client = app.test_client()
+
+    webhook_times = []
+    calls = [f"CA{i:04d}" for i in range(args.calls)]
+    with ThreadPoolExecutor(max_workers=args.calls) as pool:
+        played = list(pool.map(lambda call_sid: play_call(client, call_sid, args.turns, webhook_times), calls))
+    results = [(call_sid,) + result for call_sid, turns in zip(calls, played) for result in turns]
+    outcomes = [heard(body, call_sid, turn) for call_sid, _, _, body, turn in results]
+
+    print(f"{args.calls} calls x {args.turns} turns, budget {args.budget:.1f} s, poll wait {args.poll_wait:.1f} s, "
+          f"max wait {args.max_wait:.1f} s: {outcomes.count('answer')} answered, "
+          f"{outcomes.count('timeout')} asked to repeat, {sum(r[2] for r in results)} redirects")
+    print(f"slowest webhook {max(webhook_times):.2f} s (Twilio allows 15 s)")
+    for seconds, hops, outcome in sorted((r[1], r[2], o) for r, o in zip(results, outcomes)):
+        print(f"  {outcome:7s} after {seconds:5.2f} s with {hops} redirect(s)")
+
+    stats = services.voice_turns.stats
+    print({k: v for k, v in stats.items() if not k.endswith("_seconds")})
+    for name in ("response_seconds", "generation_seconds", "answer_seconds"):
+        histogram = stats[name]
+        print(f"{name:19s} count {histogram['count']:3d}  p50 <= {histogram.get('p50')} s  "
+              f"p95 <= {histogram.get('p95')} s")
+
+    # Answers to given-up turns finish in the background; they must not be stored
+    time.sleep(max(float(v) for v in args.latencies.split(",")))
+    failures = []
+    print("\nchecks")
+    check(failures, "every turn heard its own answer or the timeout reply, never an earlier turn's",
+          "other" not in outcomes, f"{outcomes.count('other')} turns heard something else")
+    bad = [call_sid for call_sid in calls if not history_heard(services.conversation_store.get_messages(call_sid))]
+    check(failures, "each call's history holds only what the caller heard", not bad, f"calls {bad}")
+    if failures:
+        print(f"{len(failures)} check(s) FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
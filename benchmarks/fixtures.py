@@ -0,0 +1,125 @@
+"""Local HTTP fixture site used by the scraper benchmarks."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Page {n}</title><style>body {{ color: black; }}</style>
+<script>var tracking = {n};</script></head>
+<body><header><nav><a href="/">Home</a> <a href="/apply">Apply</a></nav></header>
+<main>
+<h1>Metropolia fixture page {n}</h1>
+{paragraphs}
+<ul>{items}</ul>
+</main>
+<footer>Metropolia University of Applied Sciences</footer>
+</body></html>
+"""
+
+
+def make_page(n: int, paragraphs: int = 30) -> bytes:
+    body = "\n".join(
+        f"<p>Paragraph {i} of page {n}: students can find information about admissions, "
+        f"enrolment deadlines, tuition fees and campus services in this section.</p>"
+        for i in range(paragraphs)
+    )
+    items = "".join(f"<li>Service number {i} for page {n}</li>" for i in range(10))
+    return PAGE_TEMPLATE.format(n=n, paragraphs=body, items=items).encode()
+
+
+class FixtureSite:
+    # Serves /page/<n> with an artificial per-request latency on 127.0.0.1
+    def __init__(self, latency: float = 0.1, paragraphs: int = 30):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                site.requests += 1
+                time.sleep(site.latency)
+                try:
+                    n = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+                except ValueError:
+                    n = 0
+                body = make_page(n, site.paragraphs)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def urls(self, count: int):
+        return [f"{self.base_url}/page/{n}" for n in range(count)]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+TOPICS = ("admissions", "enrolment deadlines", "tuition fees", "student card", "timetables",
+          "course registration", "thesis supervision", "exchange studies", "campus services")
+
+
+def pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path: str, pages: int = 200, lines: int = 40, title: str = "Metropolia synthetic manual",
+             broken_pages=()):
+    # Writes a plain PDF (Helvetica text, one content stream per page) that
+    # pypdf can extract; every page differs so none is deduplicated. Pages in
+    # broken_pages (0-based) have invalid resources and fail to extract.
+    bodies = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for p in range(pages):
+        text = [f"{title}, page {p + 1}"] + [
+            f"Section {p + 1}.{i}: students can find information about {TOPICS[(p + i) % len(TOPICS)]} "
+            f"at the study affairs office or in OMA."
+            for i in range(lines)
+        ]
+        stream = ("BT /F1 9 Tf 40 800 Td 12 TL " + " ".join(f"({pdf_escape(line)}) '" for line in text)
+                  + " ET").encode("latin-1")
+        content_id, page_id = 4 + 2 * p, 5 + 2 * p
+        bodies[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        resources = "0" if p in broken_pages else "<< /Font << /F1 3 0 R >> >>"
+        bodies[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources {resources} /Contents {content_id} 0 R >>"
+        ).encode()
+        kids.append(page_id)
+    bodies[2] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_id in range(1, len(bodies) + 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (object_id, bodies[object_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(bodies) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(bodies) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
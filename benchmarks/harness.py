@@ -0,0 +1,350 @@
+"""Offline benchmark harness for the full request path, with JSON results.
+
+Everything runs locally. Gemini is a fake model with a fixed latency, and
+Twilio is never contacted (no credentials). The website is the local fixture
+site and the manual is a synthetic PDF. Sections:
+
+  cold_start     process start -> create_app() -> knowledge ready, once with
+                 empty and once with warm PDF/HTTP caches (child processes)
+  endpoints      /chat and /process_speech throughput and p50/p95/p99 latency
+                 at several concurrency levels
+  conversations  ConversationStore traced memory over many sessions
+  ingest         WebScraper pages/s against the fixture site, HTML extractor
+                 and PDF text throughput
+
+Results are written as JSON (--output) and can be compared with the file of
+an earlier run (--compare) to spot regressions between commits.
+
+Run from the repository root:  python -m benchmarks.harness --output results.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import FixtureSite, make_page, make_pdf
+from benchmarks.stubs import fake_model_factory, offline_environment
+
+# The app is imported inside the sections: the cold-start child has to time
+# the import itself, and its environment decides the configuration.
+SECTIONS = ("cold_start", "endpoints", "conversations", "ingest")
+QUESTIONS = (
+    "When does the autumn semester start?",
+    "How do I get a certificate of enrolment?",
+    "Where can I find my timetable?",
+    "How do I register for a course?",
+    "How does the student card work?",
+)
+SCRAPER_LIMITS = {"SCRAPER_REQUESTS_PER_SECOND": "1000", "SCRAPER_PER_HOST_CONCURRENCY": "8"}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def latency_summary(latencies: list, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "throughput_rps": round(len(values) / elapsed, 2),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+def cold_start_child():
+    # Runs in a fresh interpreter configured by the parent's environment
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+    ready = app.extensions["services"].knowledge.wait_until_ready(300)
+    loaded = time.perf_counter()
+    print(json.dumps({
+        "import_seconds": round(imported - started, 4),
+        "create_app_seconds": round(created - imported, 4),
+        "knowledge_seconds": round(loaded - created, 4),
+        "ready": ready,
+    }))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def bench_cold_start(args, pdf_path: str, site: FixtureSite, workdir: str) -> dict:
+    env = dict(
+        os.environ, KNOWLEDGE_PRELOAD="true", WEB_REFRESH_TTL="0", GEMINI_API_KEY="",
+        WEBSITE_URLS=",".join(site.urls(args.pages)), PDF_PATH=pdf_path, PDF_DIR="",
+        PDF_CACHE_PATH=os.path.join(workdir, "pdf_cache.sqlite3"),
+        HTTP_CACHE_PATH=os.path.join(workdir, "http_cache.sqlite3"),
+        HTTP_CACHE_FRESH_SECONDS="3600", **SCRAPER_LIMITS,
+    )
+    results = {}
+    # The first run fills the caches the second one starts with
+    for name in ("empty_caches", "warm_caches"):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.harness", "--cold-start-child"],
+            env=env, capture_output=True, text=True, timeout=600, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["total_seconds"] = round(time.perf_counter() - started, 4)
+        results[name] = result
+        print(f"  cold start, {name:12s}: {result['total_seconds']:.2f} s total "
+              f"(import {result['import_seconds']:.2f} s, create_app {result['create_app_seconds']:.2f} s, "
+              f"knowledge {result['knowledge_seconds']:.2f} s)")
+    return results
+
+
+def load(post, concurrency: int, requests: int) -> dict:
+    counter = itertools.count()
+    latencies, errors = [], []
+
+    def worker():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            started = time.perf_counter()
+            status = post(i)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    summary = latency_summary(latencies, time.perf_counter() - started)
+    summary["errors"] = len(errors)
+    return summary
+
+
+def bench_endpoints(args, pdf_path: str, site: FixtureSite) -> dict:
+    from app import create_app
+    from app.config import config
+    from app.services.ai_service import AIService
+    from app.services.pdf_service import PDFService
+
+    config.ANSWER_CACHE_ENABLED = args.answer_cache
+    config.SCRAPER_REQUESTS_PER_SECOND = float(SCRAPER_LIMITS["SCRAPER_REQUESTS_PER_SECOND"])
+    config.SCRAPER_PER_HOST_CONCURRENCY = int(SCRAPER_LIMITS["SCRAPER_PER_HOST_CONCURRENCY"])
+    config.HTTP_CACHE_PATH = ""
+    app = create_app()
+    services = app.extensions["services"]
+    services.override("ai_service", AIService(
+        "", model_factory=fake_model_factory(latency=args.model_latency, token_delay=0)
+    ))
+    services.override("pdf_service", PDFService(pdf_path))
+    services.knowledge.urls = site.urls(args.pages)
+    services.knowledge.load()
+    client = app.test_client()
+
+    def chat(i: int) -> int:
+        return client.post("/chat", json={
+            "message": QUESTIONS[i % len(QUESTIONS)], "session_id": f"chat-{i % args.sessions}",
+        }).status_code
+
+    def voice(i: int) -> int:
+        return client.post("/process_speech", data={
+            "CallSid": f"CA{i % args.sessions:06d}", "SpeechResult": QUESTIONS[i % len(QUESTIONS)],
+        }).status_code
+
+    results = {}
+    for name, post in (("chat", chat), ("process_speech", voice)):
+        results[name] = {}
+        for concurrency in args.concurrency:
+            summary = load(post, concurrency, args.requests)
+            results[name][f"c{concurrency}"] = summary
+            print(f"  {name:14s} concurrency {concurrency:3d}: {summary['throughput_rps']:8.1f} req/s  "
+                  f"p50 {summary['p50_ms']:7.1f} ms  p95 {summary['p95_ms']:7.1f} ms  "
+                  f"p99 {summary['p99_ms']:7.1f} ms  errors {summary['errors']}")
+    return results
+
+
+def bench_conversations(args) -> dict:
+    from app.models import ConversationStore, MemoryBackend
+
+    question = "How do I apply for a student card and where can I pick it up on campus? " * 2
+    answer = "You can order the student card online and collect it from the campus service desk. " * 4
+    store = ConversationStore(MemoryBackend(max_sessions=args.max_sessions), max_turns=4)
+    checkpoints = []
+    step = max(1, args.long_run_sessions // 10)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(args.long_run_sessions):
+        session_id = f"web_{i}"
+        for _ in range(3):
+            store.add_message(session_id, "user", question)
+            store.get_messages(session_id)
+            store.add_message(session_id, "assistant", answer)
+        if (i + 1) % step == 0:
+            checkpoints.append({
+                "sessions_created": i + 1,
+                "live_sessions": store.stats["sessions"],
+                "traced_mib": round(tracemalloc.get_traced_memory()[0] / 2**20, 3),
+            })
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    half = checkpoints[len(checkpoints) // 2 - 1]["traced_mib"]
+    result = {
+        "sessions": args.long_run_sessions,
+        "max_sessions": args.max_sessions,
+        "messages_per_second": round(args.long_run_sessions * 6 / elapsed, 1),
+        "final_traced_mib": checkpoints[-1]["traced_mib"],
+        "growth_second_half_mib": round(checkpoints[-1]["traced_mib"] - half, 3),
+        "checkpoints": checkpoints,
+    }
+    print(f"  conversations: {args.long_run_sessions} sessions, {result['final_traced_mib']:.1f} MiB traced, "
+          f"{result['growth_second_half_mib']:+.2f} MiB over the second half")
+    return result
+
+
+def bench_ingest(args, pdf_path: str, site: FixtureSite) -> dict:
+    from app.services.html_extractor import EXTRACTORS
+    from app.services.pdf_service import PDFService
+    from app.services.web_scraper import WebScraper
+
+    scraper = WebScraper(max_workers=8, per_host_concurrency=8, requests_per_second=1000)
+    urls = site.urls(args.pages)
+    started = time.perf_counter()
+    text = scraper.scrape_multiple_urls(urls)
+    scrape_seconds = time.perf_counter() - started
+    result = {"scrape": {
+        "pages": len(urls),
+        "pages_per_second": round(len(urls) / scrape_seconds, 1),
+        "characters": len(text),
+    }}
+
+    pages = [make_page(n) for n in range(200)]
+    size = sum(len(page) for page in pages)
+    for name, extractor_cls in EXTRACTORS.items():
+        extractor = extractor_cls()
+        started = time.perf_counter()
+        for page in pages:
+            extractor.extract(page)
+        seconds = time.perf_counter() - started
+        result[f"extract_{name}"] = {
+            "pages_per_second": round(len(pages) / seconds, 1),
+            "mb_per_second": round(size / seconds / 1e6, 2),
+        }
+
+    started = time.perf_counter()
+    pdf_pages = PDFService(pdf_path).extract_pages()
+    seconds = time.perf_counter() - started
+    result["pdf"] = {"pages": len(pdf_pages), "pages_per_second": round(len(pdf_pages) / seconds, 1)}
+
+    print(f"  scrape {result['scrape']['pages_per_second']:.0f} pages/s, "
+          + ", ".join(f"{name} {result[f'extract_{name}']['pages_per_second']:.0f} pages/s" for name in EXTRACTORS)
+          + f", PDF {result['pdf']['pages_per_second']:.0f} pages/s")
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def compare(baseline_path: str, results: dict):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before, after = flatten(baseline["results"]), flatten(results)
+    print(f"\ncompared with {baseline['meta'].get('commit') or baseline_path}:")
+    for path in sorted(set(before) & set(after)):
+        if before[path]:
+            change = (after[path] - before[path]) / abs(before[path])
+            print(f"  {path:55s} {before[path]:>12} -> {after[path]:>12}  {change:+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", default=",".join(SECTIONS), help="comma-separated subset of sections")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a smoke run")
+    parser.add_argument("--pdf-pages", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=40, help="fixture site pages to scrape")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="fake Gemini latency (s)")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=400, help="requests per endpoint and concurrency level")
+    parser.add_argument("--sessions", type=int, default=200, help="distinct sessions/calls in the load test")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on in the load test")
+    parser.add_argument("--long-run-sessions", type=int, default=50_000)
+    parser.add_argument("--max-sessions", type=int, default=5_000)
+    parser.add_argument("--cold-start-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start_child:
+        cold_start_child()
+    if args.quick:
+        args.pdf_pages, args.pages, args.requests = 50, 10, 100
+        args.long_run_sessions, args.max_sessions = 10_000, 1_000
+    args.concurrency = [int(value) for value in args.concurrency.split(",")]
+    sections = [name for name in args.sections.split(",") if name]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    offline_environment()
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, FixtureSite(latency=0) as site:
+        pdf_path = make_pdf(os.path.join(workdir, "manual.pdf"), pages=args.pdf_pages)
+        print(f"synthetic manual: {args.pdf_pages} pages, fixture site {site.base_url}, "
+              f"fake model {args.model_latency * 1000:.0f} ms")
+        for name in sections:
+            print(f"[{name}]")
+            if name == "cold_start":
+                results[name] = bench_cold_start(args, pdf_path, site, workdir)
+            elif name == "endpoints":
+                results[name] = bench_endpoints(args, pdf_path, site)
+            elif name == "conversations":
+                results[name] = bench_conversations(args)
+            else:
+                results[name] = bench_ingest(args, pdf_path, site)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key != "cold_start_child"},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nwrote {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
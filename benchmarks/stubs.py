@@ -0,0 +1,305 @@
+"""Local stand-ins for Gemini and Redis used by the benchmarks."""
+import os
+import random
+import threading
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+
+class FakeCandidate:
+    def __init__(self, finish_reason: str):
+        self.finish_reason = finish_reason
+
+
+class FakeResponse:
+    def __init__(self, text: str, finish_reason: str = "STOP", output_tokens: int = 0):
+        self.text = text
+        self.candidates = [FakeCandidate(finish_reason)]
+        self.usage_metadata = FakeUsage(0, 0, output_tokens)
+
+
+class FakeModel:
+    # Mimics genai.GenerativeModel.generate_content: `latency` seconds before the
+    # first token, then `token_delay` per token (when streaming or not). Words
+    # count as tokens; generation_config's max_output_tokens cuts the reply
+    # off like Gemini does (finish reason MAX_TOKENS). `reply` may also be a
+    # callable receiving the request contents.
+    def __init__(self, model_name: str = "fake", latency: float = 0.3, token_delay: float = 0.02,
+                 reply=None, **kwargs):
+        self.model_name = model_name
+        self.latency = latency
+        self.token_delay = token_delay
+        self.reply = reply or (
+            "Metropolia has four campuses: Arabia, Karamalmi, Myllypuro and Myyrmäki. "
+            "You can find the study guide and your timetable in OMA. "
+            "Contact the study affairs office if you need a certificate of enrolment."
+        )
+        self.calls = 0
+
+    def _tokens(self, contents):
+        reply = self.reply(contents) if callable(self.reply) else self.reply
+        return [word + " " for word in reply.split(" ")]
+
+    def generate_content(self, contents, stream: bool = False, generation_config=None, **kwargs):
+        self.calls += 1
+        tokens = self._tokens(contents)
+        finish_reason = "STOP"
+        limit = (generation_config or {}).get("max_output_tokens")
+        if limit and len(tokens) > limit:
+            tokens, finish_reason = tokens[:limit], "MAX_TOKENS"
+        if stream:
+            return self._stream(tokens)
+        time.sleep(self.latency + self.token_delay * len(tokens))
+        return FakeResponse("".join(tokens).rstrip(" "), finish_reason, len(tokens))
+
+    def _stream(self, tokens):
+        time.sleep(self.latency)
+        for token in tokens:
+            yield FakeResponse(token)
+            time.sleep(self.token_delay)
+
+
+def fake_model_factory(**options):
+    return lambda model_name, **kwargs: FakeModel(model_name, **options, **kwargs)
+
+
+class Faults:
+    # What FaultyModels do on each call, shared by all of them so a benchmark
+    # can start or end an outage while requests run. Rates are fractions of
+    # calls: error_rate fail with 503 and quota_rate with 429 after
+    # error_latency seconds; hang_rate never answer, so the call ends with
+    # DeadlineExceeded when the request's timeout passes (after hang_seconds
+    # without one). Calls beyond `capacity` running at once get 429. During an
+    # outage every call fails with 503.
+    def __init__(self, error_rate: float = 0.0, quota_rate: float = 0.0, hang_rate: float = 0.0,
+                 outage: bool = False, error_latency: float = 0.05, hang_seconds: float = 30.0,
+                 capacity: int = 0, seed: int = 1):
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.hang_rate = hang_rate
+        self.outage = outage
+        self.error_latency = error_latency
+        self.hang_seconds = hang_seconds
+        self.capacity = capacity
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    def draw(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            if self.outage:
+                return "error"
+            if self.capacity and self.active > self.capacity:
+                return "quota"
+            roll = self._random.random()
+        for fault, rate in (("error", self.error_rate), ("quota", self.quota_rate), ("hang", self.hang_rate)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    def done(self):
+        with self._lock:
+            self.active -= 1
+
+
+class FaultyModel(FakeModel):
+    # FakeModel that fails like Gemini under load (see Faults) and honours
+    # request_options={"timeout": ...} like the real client
+    def __init__(self, model_name: str = "fake", faults: Faults = None, **kwargs):
+        super().__init__(model_name, **kwargs)
+        self.faults = faults or Faults()
+
+    def generate_content(self, contents, stream: bool = False, request_options=None, **kwargs):
+        timeout = (request_options or {}).get("timeout")
+        fault = self.faults.draw()
+        try:
+            if fault == "hang" or (timeout is not None and self.latency > timeout):
+                time.sleep(min(self.faults.hang_seconds, timeout if timeout is not None else float("inf")))
+                raise google_exceptions.DeadlineExceeded("Deadline Exceeded")
+            if fault == "quota":
+                time.sleep(self.faults.error_latency)
+                raise google_exceptions.ResourceExhausted("Resource has been exhausted (e.g. check quota).")
+            if fault == "error":
+                time.sleep(self.faults.error_latency)
+                raise google_exceptions.ServiceUnavailable("The model is overloaded. Please try again later.")
+            return super().generate_content(contents, stream=stream, **kwargs)
+        finally:
+            self.faults.done()
+
+
+def offline_environment():
+    # Must run before app.config is imported: no background network work
+    os.environ.setdefault("KNOWLEDGE_PRELOAD", "false")
+    os.environ.setdefault("WEB_REFRESH_TTL", "0")
+    os.environ.setdefault("WEBSITE_URLS", "")
+    os.environ.setdefault("FAQ_ENABLED", "false")
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, cached_tokens: int, output_tokens: int = 0):
+        self.prompt_token_count = prompt_tokens
+        self.cached_content_token_count = cached_tokens
+        self.candidates_token_count = output_tokens
+
+
+class FakeCachedContent:
+    # Stand-in for google.generativeai.caching.CachedContent
+    created = []
+    fail = False
+    latency = 0.0
+
+    def __init__(self, name: str, system_instruction: str):
+        self.name = name
+        self.system_instruction = system_instruction
+        self.updates = 0
+        self.deleted = False
+
+    @classmethod
+    def create(cls, model: str, display_name: str = None, system_instruction: str = None, ttl=None, **kwargs):
+        time.sleep(cls.latency)
+        if cls.fail:
+            raise RuntimeError("context caching is not available for this model")
+        handle = cls(f"cachedContents/{len(cls.created)}", system_instruction)
+        cls.created.append(handle)
+        return handle
+
+    def update(self, ttl=None, **kwargs):
+        self.updates += 1
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeCachedModel(FakeModel):
+    # Reports the cached prefix as cached_content_token_count like Gemini does
+    def __init__(self, handle: FakeCachedContent, **kwargs):
+        super().__init__("cached", **kwargs)
+        instruction = handle.system_instruction
+        parts = [instruction] if isinstance(instruction, str) else instruction
+        self.cached_tokens = sum(len(part) for part in parts) // 4
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        response = super().generate_content(contents, stream=False)
+        response.usage_metadata = FakeUsage(self.cached_tokens + 50, self.cached_tokens)
+        return response
+
+
+class FakeRedis:
+    # In-process stand-in for redis.Redis covering the commands RedisBackend
+    # uses, with redis-py's bytes replies and key expiry. `latency` is added
+    # once per round trip (a single command or a whole pipeline).
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self._data = {}
+        self._expires = {}
+
+    @staticmethod
+    def _bytes(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _get(self, key, kind):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key) if isinstance(self._data.get(key), kind) else None
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def pipeline(self, transaction: bool = True):
+        return FakePipeline(self)
+
+    def __getattr__(self, name):
+        # Direct calls are single-command round trips
+        command = getattr(FakeRedisCommands, name)
+
+        def call(*args, **kwargs):
+            self._round_trip()
+            return command(self, *args, **kwargs)
+        return call
+
+
+class FakeRedisCommands:
+    def delete(redis, *keys):
+        removed = sum(1 for key in keys if redis._get(key, object) is not None)
+        for key in keys:
+            redis._data.pop(key, None)
+            redis._expires.pop(key, None)
+        return removed
+
+    def expire(redis, key, seconds):
+        if redis._get(key, object) is None:
+            return 0
+        redis._expires[key] = time.time() + seconds
+        return 1
+
+    def rpush(redis, key, *values):
+        items = redis._get(key, list)
+        if items is None:
+            items = redis._data[key] = []
+        items.extend(FakeRedis._bytes(v) for v in values)
+        return len(items)
+
+    def lrange(redis, key, start, end):
+        items = redis._get(key, list) or []
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    def ltrim(redis, key, start, end):
+        items = redis._get(key, list)
+        if items is not None:
+            items[:] = items[start:] if end == -1 else items[start:end + 1]
+        return True
+
+    def hset(redis, key, field=None, value=None, mapping=None):
+        fields = redis._get(key, dict)
+        if fields is None:
+            fields = redis._data[key] = {}
+        mapping = dict(mapping or {})
+        if field is not None:
+            mapping[field] = value
+        for name, item in mapping.items():
+            fields[FakeRedis._bytes(name)] = FakeRedis._bytes(item)
+        return len(mapping)
+
+    def hsetnx(redis, key, field, value):
+        fields = redis._get(key, dict) or {}
+        if FakeRedis._bytes(field) in fields:
+            return 0
+        return FakeRedisCommands.hset(redis, key, field, value)
+
+    def hget(redis, key, field):
+        return (redis._get(key, dict) or {}).get(FakeRedis._bytes(field))
+
+    def hmget(redis, key, fields):
+        return [FakeRedisCommands.hget(redis, key, field) for field in fields]
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(FakeRedisCommands, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self.redis._round_trip()
+        results = [command(self.redis, *args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
@@ -1,9 +1,21 @@
-import logging
+import os
 
-from flask import send_from_directory
+from dotenv import load_dotenv
 
-from app import create_app
-from app.config import config
+# gevent has to patch the standard library before the app (and Flask,
+# requests, google-generativeai) are imported
+load_dotenv()
+if os.getenv("SERVER_MODE") == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+
+import logging  # noqa: E402
+
+from flask import send_from_directory  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config import config  # noqa: E402
+from app.server import serve  # noqa: E402
 
 app = create_app()
 logger = logging.getLogger(__name__)
@@ -17,7 +29,7 @@ def index(path):
 
 if __name__ == "__main__":
     logger.info(
-        "Starting Student Assistant AI backend (Gemini) on port %s",
-        config.PORT
+        "Starting Student Assistant AI backend (Gemini) on port %s (%s mode)",
+        config.PORT, config.SERVER_MODE
     )
-    app.run(host="0.0.0.0", port=config.PORT, debug=True)
+    serve(app, config)
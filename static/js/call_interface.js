@@ -33,6 +33,34 @@ function addMessage(content, isAI = true) {
    conversation.appendChild(messageDiv);
 
    conversation.scrollTop = conversation.scrollHeight;
+   return contentDiv;
+}
+
+// Read Server-Sent Events from a fetch response, calling onEvent(event, data)
+async function readEventStream(response, onEvent) {
+   const reader = response.body.getReader();
+   const decoder = new TextDecoder();
+   let buffer = '';
+
+   while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+         const rawEvent = buffer.slice(0, boundary);
+         buffer = buffer.slice(boundary + 2);
+
+         let event = 'message';
+         let data = '';
+         for (const line of rawEvent.split('\n')) {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+         }
+         if (data) onEvent(event, JSON.parse(data));
+      }
+   }
 }
 
 // Start call timer
@@ -165,7 +193,7 @@ async function sendMessage() {
       messageInput.value = '';
 
       try {
-         const response = await fetch(getApiUrl('/chat'), {
+         const response = await fetch(getApiUrl('/chat/stream'), {
             method: 'POST',
             headers: {
                'Content-Type': 'application/json'
@@ -180,12 +208,16 @@ async function sendMessage() {
             throw new Error(`HTTP error! status: ${response.status}`);
          }
 
-         const data = await response.json();
-         if (data.response) {
-            addMessage(data.response);
-         } else {
-            addMessage("Error: " + data.error);
-         }
+         // Show the reply as it is generated
+         const contentDiv = addMessage('');
+         await readEventStream(response, (event, data) => {
+            if (event === 'done') {
+               contentDiv.textContent = data.response;
+            } else if (data.delta) {
+               contentDiv.textContent += data.delta;
+            }
+            conversation.scrollTop = conversation.scrollHeight;
+         });
       } catch (error) {
          console.error('Send message error:', error);
          addMessage("Error sending message: " + error.message);